@@ -0,0 +1,102 @@
+"""
+Detection profiles: detector latency and results per detector input size
+(DETECTION_SIZE_<PIPELINE>), against the full-size (640) baseline.
+
+For each size it reports the detect() latency, the share of frames with a face,
+the mean det_score, the IoU of the best box with the full-size box, and the
+cosine similarity of the resulting embedding to the full-size embedding (what
+verify/identify actually compare). Frames are synthesised from a face photo
+(default: the repo's test-face.jpg) with small shifts. Needs InsightFace.
+
+    python benchmarks/bench_detection_profiles.py --sizes 320,480,640 --frames 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import DEFAULT_IMAGE, environment, latency_stats, synthetic_frames, write_report  # noqa: E402
+from inference import run_batch  # noqa: E402
+from utils import cosine_similarity  # noqa: E402
+
+
+def load_face_app(full_size):
+    try:
+        from insightface.app import FaceAnalysis
+    except ImportError:
+        sys.exit("bench_detection_profiles.py needs insightface (pip install -r requirements.txt)")
+    face_app = FaceAnalysis(name="buffalo_s", providers=["CPUExecutionProvider"],
+                            allowed_modules=["detection", "recognition"])
+    face_app.prepare(ctx_id=0, det_size=(full_size, full_size))
+    return face_app
+
+
+def best_face(faces):
+    return max(faces, key=lambda f: f.det_score) if faces else None
+
+
+def iou(a, b) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+def bench_size(face_app, images, size, full_size, reference):
+    durations = []
+    for img in images[:3]:
+        face_app.det_model.detect(img, input_size=(size, size), max_num=0, metric="default")
+    for img in images:
+        started = time.perf_counter()
+        face_app.det_model.detect(img, input_size=(size, size), max_num=0, metric="default")
+        durations.append(time.perf_counter() - started)
+
+    faces = [best_face(f) for f in run_batch(face_app, images, [size] * len(images))]
+    found = [(face, ref) for face, ref in zip(faces, reference) if face is not None]
+    compared = [(face, ref) for face, ref in found if ref is not None]
+    return {
+        "detect": latency_stats(durations),
+        "relative_pixels": (size / full_size) ** 2,
+        "face_found_rate": len(found) / len(images),
+        "mean_det_score": float(np.mean([face.det_score for face, _ in found])) if found else 0.0,
+        "mean_iou_vs_full": float(np.mean([iou(face.bbox, ref.bbox) for face, ref in compared])) if compared else 0.0,
+        "min_embedding_similarity_vs_full": min(
+            (cosine_similarity(face.embedding, ref.embedding) for face, ref in compared), default=0.0,
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="320,480,640")
+    parser.add_argument("--full-size", type=int, default=640, help="Baseline size (DETECTION_FULL_SIZE)")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    face_app = load_face_app(args.full_size)
+    images = [cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+              for raw in synthetic_frames(args.frames, args.width, args.height)]
+    reference = [best_face(f) for f in run_batch(face_app, images, [args.full_size] * len(images))]
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    report = {
+        "benchmark": "detection_profiles",
+        "environment": environment(),
+        "params": {"sizes": sizes, "full_size": args.full_size, "frames": args.frames,
+                   "image": DEFAULT_IMAGE, "frame_size": [args.width, args.height]},
+        "sizes": {str(size): bench_size(face_app, images, size, args.full_size, reference) for size in sizes},
+    }
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Throughput/latency of the micro-batching InferenceScheduler per max batch size.
+
+Uses the real InsightFace buffalo_s model when installed; otherwise a synthetic
+cost model (fixed per-call overhead + per-image cost) so the scheduler itself can
+still be exercised offline.
+
+    python benchmarks/bench_inference_batching.py --clients 16 --images 400
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference import InferenceScheduler, run_batch  # noqa: E402
+
+
+def build_batch_fn(call_overhead_ms: float, per_image_ms: float):
+    try:
+        from insightface.app import FaceAnalysis
+    except ImportError:
+        def synthetic(images, det_sizes=None, located=None):
+            time.sleep((call_overhead_ms + per_image_ms * len(images)) / 1000)
+            return [[] for _ in images]
+        return synthetic, "synthetic"
+
+    face_app = FaceAnalysis(name="buffalo_s", providers=["CPUExecutionProvider"])
+    face_app.prepare(ctx_id=0, det_size=(640, 640))
+    return (lambda images, det_sizes=None, located=None: run_batch(face_app, images, det_sizes, located)), "insightface"
+
+
+def run(batch_fn, batch_size: int, linger_ms: float, clients: int, images: int, image: np.ndarray) -> dict:
+    scheduler = InferenceScheduler(batch_fn, max_batch_size=batch_size, max_linger_ms=linger_ms)
+    scheduler.start()
+    latencies = []
+    lock = threading.Lock()
+    per_client = images // clients
+
+    def client():
+        for _ in range(per_client):
+            started = time.perf_counter()
+            scheduler.submit(image).result()
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    scheduler.stop()
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "max_batch_size": batch_size,
+        "images": len(latencies),
+        "images_per_second": len(latencies) / elapsed,
+        "latency_ms": {
+            "p50": float(np.percentile(lat_ms, 50)),
+            "p95": float(np.percentile(lat_ms, 95)),
+            "p99": float(np.percentile(lat_ms, 99)),
+        },
+        "scheduler": scheduler.stats()["batch_sizes"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16")
+    parser.add_argument("--linger-ms", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--images", type=int, default=320)
+    parser.add_argument("--synthetic-call-overhead-ms", type=float, default=8.0)
+    parser.add_argument("--synthetic-per-image-ms", type=float, default=2.0)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    batch_fn, backend = build_batch_fn(args.synthetic_call_overhead_ms, args.synthetic_per_image_ms)
+    image = (np.random.default_rng(0).random((480, 640, 3)) * 255).astype(np.uint8)
+
+    results = {
+        "benchmark": "inference_batching",
+        "backend": backend,
+        "clients": args.clients,
+        "linger_ms": args.linger_ms,
+        "runs": [
+            run(batch_fn, int(size), args.linger_ms, args.clients, args.images, image)
+            for size in args.batch_sizes.split(",")
+        ],
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+End-to-end load driver for the face-service API.
+
+By default the FastAPI app is driven in-process (httpx ASGI transport) against a
+throwaway SQLite database, with the rate limiter disabled and the mock
+FaceAnalysis used whenever InsightFace is not installed, so it runs fully
+offline. Pass --database-url to use a local Postgres instead, or --url to load
+an already running server.
+
+Each endpoint is driven in turn by --concurrency closed-loop clients until
+--requests requests have completed; the report has throughput, p50/p95/p99
+latency and status codes per endpoint.
+
+    python benchmarks/bench_load.py --requests 200 --concurrency 16 --output load.json
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import environment, latency_stats, synthetic_frames, write_report  # noqa: E402
+
+ENDPOINTS = [
+    "health",
+    "liveness-check",
+    "extract-vector",
+    "verify-face",
+    "faces/register",
+    "faces/identify",
+    "liveness-check/upload",
+    "faces/identify/upload",
+]
+
+
+def frame_stream(params: dict, raw_frames) -> bytes:
+    """Length-prefixed upload body (see uploads.py)."""
+    records = [json.dumps(params).encode()] + list(raw_frames)
+    return b"".join(struct.pack(">I", len(r)) + r for r in records)
+
+
+def build_request(endpoint: str, b64_frames, raw_frames, stored_vector):
+    """(method, path, kwargs) for one request to `endpoint`."""
+    path = "/" + endpoint
+    if endpoint == "health":
+        return "GET", path, {}
+    if endpoint == "liveness-check":
+        return "POST", path, {"json": {"challenge_passed": True, "frames": b64_frames}}
+    if endpoint == "extract-vector":
+        return "POST", path, {"json": {"frames": b64_frames}}
+    if endpoint == "verify-face":
+        body = {"challenge_passed": True, "stored_vector": stored_vector, "frames": b64_frames}
+        return "POST", path, {"json": body}
+    if endpoint == "faces/register":
+        body = {"external_id": f"bench-{uuid.uuid4().hex}", "type": "USER", "frames": b64_frames}
+        return "POST", path, {"json": body}
+    if endpoint == "faces/identify":
+        return "POST", path, {"json": {"challenge_passed": True, "frames": b64_frames}}
+    if endpoint in ("liveness-check/upload", "faces/identify/upload"):
+        body = frame_stream({"challenge_passed": True}, raw_frames)
+        return "POST", path, {"content": body, "headers": {"content-type": "application/x-face-frames"}}
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+async def drive(client, endpoint, requests, concurrency, b64_frames, raw_frames, stored_vector) -> dict:
+    latencies, statuses = [], Counter()
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            method, path, kwargs = build_request(endpoint, b64_frames, raw_frames, stored_vector)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                statuses[str(response.status_code)] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = latency_stats(latencies)
+    result["requests_per_second"] = requests / elapsed if elapsed else 0.0
+    result["status_codes"] = dict(statuses)
+    result["error_rate"] = 1 - statuses.get("200", 0) / requests if requests else 0.0
+    return result
+
+
+def seed_gallery(size: int) -> None:
+    """Insert `size` random embeddings so identify searches a realistic gallery."""
+    if size <= 0:
+        return
+    from sqlalchemy import or_
+
+    import db_models
+    from database import SessionLocal
+
+    rng = np.random.default_rng(0)
+    db = SessionLocal()
+    try:
+        # Drop faces left by previous runs (seeded and registered by the driver)
+        stale = or_(db_models.Face.external_id.like("seed-%"), db_models.Face.external_id.like("bench-%"))
+        db.query(db_models.Face).filter(stale).delete(synchronize_session=False)
+        for start in range(0, size, 1000):
+            batch = rng.standard_normal((min(1000, size - start), 512)).astype(np.float32)
+            db.bulk_save_objects([
+                db_models.Face(external_id=f"seed-{start + i}", type="USER", embedding=vector.tolist())
+                for i, vector in enumerate(batch)
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run(args) -> dict:
+    import httpx
+
+    raw_frames = synthetic_frames(args.frames)
+    b64_frames = [base64.b64encode(f).decode() for f in raw_frames]
+    stored_vector = np.random.default_rng(1).standard_normal(512).tolist()
+    endpoints = args.endpoints.split(",") if args.endpoints else ENDPOINTS
+
+    app = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        target = args.url
+    else:
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+        os.environ["DATABASE_URL"] = args.database_url
+        from main import app  # creates the tables
+
+        seed_gallery(args.gallery_size)
+
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout)
+        target = "in-process"
+
+    results = {}
+    try:
+        for endpoint in endpoints:
+            warmup = min(args.warmup, args.requests)
+            await drive(client, endpoint, warmup, args.concurrency, b64_frames, raw_frames, stored_vector)
+            results[endpoint] = await drive(
+                client, endpoint, args.requests, args.concurrency, b64_frames, raw_frames, stored_vector,
+            )
+            print(f"{endpoint}: {results[endpoint]['requests_per_second']:.1f} req/s", file=sys.stderr)
+    finally:
+        await client.aclose()
+        if app is not None:
+            await app.router.shutdown()
+
+    return {
+        "benchmark": "load",
+        "environment": environment(),
+        "params": {
+            "target": target,
+            "database": None if args.url else args.database_url.split("://")[0],
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "frames": args.frames,
+            "gallery_size": 0 if args.url else args.gallery_size,
+        },
+        "endpoints": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Load a running server instead of the in-process app")
+    parser.add_argument("--database-url",
+                        default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'face-service-bench.db')}",
+                        help="Database for the in-process app (SQLite file or a local Postgres URL)")
+    parser.add_argument("--gallery-size", type=int, default=1000, help="Random faces enrolled before the run")
+    parser.add_argument("--endpoints", help=f"Comma-separated subset of: {','.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=100, help="Timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=12, help="Frames per request")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    # The service logs every request to stdout; keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run(args))
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
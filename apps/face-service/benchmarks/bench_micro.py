@@ -0,0 +1,154 @@
+"""
+Micro-benchmarks of the face-service hot paths:
+
+  - frame decoding: decode_base64_frame, decode_image_bytes, decode_thumbnails
+  - cosine_similarity between two 512-d embeddings
+  - LivenessDetector.check_liveness on full frames and on precomputed thumbnails
+  - tracking.propagate: optical-flow tracking of a face's landmarks across a frame set
+    (what FACE_TRACKING=1 runs instead of the detector on non-keyframes)
+  - identify matching against 1k / 10k / 100k enrolled faces (FaceIndex.search,
+    FaceIndex.search_many for a batch of probes, plus the original per-row
+    cosine_similarity scan up to --scan-max faces)
+
+Everything runs offline on synthetic data.
+
+    python benchmarks/bench_micro.py --output micro.json
+"""
+import argparse
+import base64
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import environment, synthetic_frames, time_calls, write_report  # noqa: E402
+from face_index import EMBEDDING_DIM, FaceIndex  # noqa: E402
+from frames import decode_frames, decode_thumbnails  # noqa: E402
+from liveness import LivenessDetector  # noqa: E402
+from tracking import propagate  # noqa: E402
+from utils import cosine_similarity, decode_base64_frame, decode_image_bytes  # noqa: E402
+
+
+def bench_decode(raw, repeat):
+    b64 = base64.b64encode(raw[0]).decode()
+    return {
+        "decode_base64_frame": time_calls(lambda: decode_base64_frame(b64), repeat),
+        "decode_image_bytes": time_calls(lambda: decode_image_bytes(raw[0]), repeat),
+        "decode_thumbnails_12_frames": time_calls(lambda: decode_thumbnails(raw), max(1, repeat // 10)),
+    }
+
+
+def bench_cosine(repeat):
+    rng = np.random.default_rng(0)
+    v1 = rng.standard_normal(EMBEDDING_DIM).tolist()
+    v2 = rng.standard_normal(EMBEDDING_DIM).tolist()
+    return {"cosine_similarity": time_calls(lambda: cosine_similarity(v1, v2), repeat * 10)}
+
+
+def bench_liveness(raw, repeat):
+    detector = LivenessDetector()
+    images = [f.image for f in decode_frames(raw)]
+    thumbnails = decode_thumbnails(raw)
+    quiet = io.StringIO()
+
+    def check(frames):
+        # check_liveness logs every call; keep that out of the timings and the report
+        with contextlib.redirect_stdout(quiet):
+            detector.check_liveness(frames, True)
+        quiet.seek(0)
+        quiet.truncate()
+
+    return {
+        "check_liveness_full_frames": time_calls(lambda: check(images), repeat),
+        "check_liveness_thumbnails": time_calls(lambda: check(thumbnails), repeat),
+    }
+
+
+def bench_tracking(raw, repeat):
+    frames = decode_frames(raw)
+    h, w = frames[0].image.shape[:2]
+    # Landmarks/box of a centred face (the synthetic frames are the same photo, shifted)
+    kps = np.array([[0.42, 0.4], [0.58, 0.4], [0.5, 0.52], [0.44, 0.64], [0.56, 0.64]], dtype=np.float32) * [w, h]
+    bbox = np.array([0.3 * w, 0.25 * h, 0.7 * w, 0.8 * h], dtype=np.float32)
+    for f in frames:
+        f.gray  # decoded and converted once, as in a request
+    keyframe = frames[len(frames) // 2].index
+    return {
+        f"propagate_{len(frames)}_frames": time_calls(lambda: propagate(frames, keyframe, bbox, kps, 0.9), repeat),
+    }
+
+
+def bench_identify(sizes, repeat, scan_max):
+    rng = np.random.default_rng(1)
+    results = {}
+    for size in sizes:
+        embeddings = rng.standard_normal((size, EMBEDDING_DIM)).astype(np.float32)
+        rows = [(f"user-{i}", "USER", embeddings[i]) for i in range(size)]
+        index = FaceIndex()
+        index.load(rows)
+        probes = embeddings[rng.integers(0, size, size=repeat)] + 0.1 * rng.standard_normal((repeat, EMBEDDING_DIM))
+        probe_iter = iter(np.concatenate([probes, probes]))
+
+        entry = {
+            "index_top1": time_calls(lambda: index.search(next(probe_iter), 1), repeat, warmup=1),
+        }
+        probe_iter = iter(np.concatenate([probes, probes]))
+        entry["index_top5"] = time_calls(lambda: index.search(next(probe_iter), 5), repeat, warmup=1)
+
+        # /faces/identify-batch: all probes scored with blocked matrix-matrix products
+        batch = time_calls(lambda: index.search_many(probes, 1), max(1, repeat // 20), warmup=1)
+        batch["probes"] = len(probes)
+        batch["ms_per_probe"] = batch["mean_ms"] / len(probes)
+        entry["index_batch_top1"] = batch
+
+        if size <= scan_max:
+            # What /faces/identify did before the in-memory index: one Python-level
+            # cosine_similarity per enrolled face (DB fetch cost not included)
+            stored = [(ext_id, embedding.tolist()) for ext_id, _, embedding in rows]
+            probe = probes[0].tolist()
+
+            def scan():
+                best, best_sim = None, -1.0
+                for ext_id, embedding in stored:
+                    sim = cosine_similarity(probe, embedding)
+                    if sim > best_sim:
+                        best, best_sim = ext_id, sim
+                return best
+
+            entry["linear_scan_top1"] = time_calls(scan, max(1, repeat // 20), warmup=1)
+        results[str(size)] = entry
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Timed calls per benchmark")
+    parser.add_argument("--frames", type=int, default=12, help="Frames per liveness/decode request")
+    parser.add_argument("--gallery-sizes", default="1000,10000,100000")
+    parser.add_argument("--scan-max", type=int, default=10000,
+                        help="Largest gallery the per-row scan baseline is run against")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    raw = synthetic_frames(args.frames)
+    sizes = [int(s) for s in args.gallery_sizes.split(",") if s]
+
+    report = {
+        "benchmark": "micro",
+        "environment": environment(),
+        "params": {"repeat": args.repeat, "frames": args.frames, "gallery_sizes": sizes},
+        "decode": bench_decode(raw, args.repeat),
+        "similarity": bench_cosine(args.repeat),
+        "liveness": bench_liveness(raw, args.repeat),
+        "tracking": bench_tracking(raw, max(1, args.repeat // 4)),
+        "identify": bench_identify(sizes, args.repeat, args.scan_max),
+    }
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Accuracy and cost of the quantized FaceIndex precisions (FACE_INDEX_PRECISION)
+against the float32 baseline on a synthetic gallery:
+
+  - memory held by the embeddings
+  - single-probe and batched search latency on the compact form
+  - recall@k of the approximate top-k vs. the exact float32 top-k, before and
+    after re-ranking a shortlist of --rerank-candidates in float32 (what
+    vector_store.NumpyGallery does with the embeddings from the database)
+  - top-1 agreement and the largest similarity error of the approximate scores
+
+The gallery is clustered (faces share a cluster direction) so nearest neighbours
+are close together and quantization errors can actually reorder them.
+
+    python benchmarks/bench_quantization.py --output quantization.json
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import environment, time_calls, write_report  # noqa: E402
+from face_index import EMBEDDING_DIM, FaceIndex  # noqa: E402
+
+
+def synthetic_gallery(size, probes, rng, clusters=200):
+    centers = rng.standard_normal((clusters, EMBEDDING_DIM)).astype(np.float32)
+    members = centers[rng.integers(0, clusters, size)] + 0.8 * rng.standard_normal((size, EMBEDDING_DIM))
+    gallery = (members / np.linalg.norm(members, axis=1, keepdims=True)).astype(np.float32)
+    # Probes are noisy captures of enrolled faces (cosine ~0.6-0.7 to their match)
+    targets = rng.integers(0, size, probes)
+    queries = gallery[targets] + 0.045 * rng.standard_normal((probes, EMBEDDING_DIM))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return gallery, queries.astype(np.float32)
+
+
+def exact_top_k(gallery, queries, k):
+    scores = queries @ gallery.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    return top, np.take_along_axis(scores, top, axis=1)
+
+
+def rerank(gallery, queries, shortlists, k):
+    results = []
+    for query, shortlist in zip(queries, shortlists):
+        rows = [int(match.external_id) for match in shortlist]
+        scores = gallery[rows] @ query
+        order = np.argsort(-scores)[:k]
+        results.append([rows[i] for i in order])
+    return results
+
+
+def recall(expected, found, k):
+    hits = [len(set(e[:k]) & set(f[:k])) / k for e, f in zip(expected, found)]
+    return float(np.mean(hits))
+
+
+def bench_precision(precision, gallery, queries, expected, expected_scores, args):
+    index = FaceIndex(precision=precision)
+    index.load((str(row), "USER", gallery[row]) for row in range(len(gallery)))
+    k = args.k
+    shortlist_k = max(k, args.rerank_candidates)
+
+    approx = index.search_many(queries, shortlist_k)
+    approx_rows = [[int(m.external_id) for m in matches] for matches in approx]
+    approx_scores = np.array([[m.similarity for m in matches[:1]] for matches in approx]).reshape(-1)
+    reranked = rerank(gallery, queries, approx, k)
+
+    probe_iter = iter(np.concatenate([queries] * 3))
+    entry = {
+        "index_bytes": index.nbytes(),
+        "bytes_per_face": index.nbytes() / len(gallery),
+        "search_top1": time_calls(lambda: index.search(next(probe_iter), 1), args.repeat, warmup=1),
+        "search_many_top1": time_calls(lambda: index.search_many(queries, 1), max(1, args.repeat // 20), warmup=1),
+        f"recall_at_{k}": recall(expected, approx_rows, k),
+        f"recall_at_{k}_reranked": recall(expected, reranked, k),
+        "top1_agreement": float(np.mean([a[0] == e[0] for a, e in zip(approx_rows, expected)])),
+        "top1_agreement_reranked": float(np.mean([r[0] == e[0] for r, e in zip(reranked, expected)])),
+        "max_similarity_error": float(np.abs(approx_scores - expected_scores[:, 0]).max()),
+    }
+    entry["search_many_top1"]["ms_per_probe"] = entry["search_many_top1"]["mean_ms"] / len(queries)
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gallery-size", type=int, default=100000)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rerank-candidates", type=int, default=32,
+                        help="Shortlist re-ranked in float32 (FACE_INDEX_RERANK_CANDIDATES)")
+    parser.add_argument("--repeat", type=int, default=100, help="Timed single-probe searches")
+    parser.add_argument("--precisions", default="float32,float16,int8")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    gallery, queries = synthetic_gallery(args.gallery_size, args.probes, rng)
+    expected, expected_scores = exact_top_k(gallery, queries, args.k)
+    expected = expected.tolist()
+
+    results = {
+        precision: bench_precision(precision, gallery, queries, expected, expected_scores, args)
+        for precision in args.precisions.split(",") if precision
+    }
+    baseline = results.get("float32")
+    if baseline:
+        for entry in results.values():
+            entry["memory_ratio"] = baseline["index_bytes"] / entry["index_bytes"]
+
+    report = {
+        "benchmark": "quantization",
+        "environment": environment(),
+        "params": {
+            "gallery_size": args.gallery_size, "probes": args.probes, "k": args.k,
+            "rerank_candidates": args.rerank_candidates, "repeat": args.repeat,
+        },
+        "precisions": results,
+    }
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
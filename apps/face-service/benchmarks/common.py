@@ -0,0 +1,88 @@
+"""
+Shared helpers for the benchmark scripts: timing statistics, environment capture
+and JSON report output (the format benchmarks/compare.py reads).
+"""
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_IMAGE = os.path.join(SERVICE_DIR, "..", "..", "test-face.jpg")
+
+
+def latency_stats(seconds: Sequence[float]) -> Dict[str, float]:
+    """Mean and tail latencies (ms) of a list of durations in seconds."""
+    if not len(seconds):
+        return {"count": 0}
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def time_calls(fn: Callable[[], object], repeat: int, warmup: int = 3) -> Dict[str, float]:
+    """Call fn() `repeat` times after `warmup` untimed calls and report latency and ops/s."""
+    for _ in range(warmup):
+        fn()
+    durations: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+    stats = latency_stats(durations)
+    stats["ops_per_second"] = repeat / sum(durations) if sum(durations) else 0.0
+    return stats
+
+
+def environment() -> dict:
+    import cv2
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def write_report(report: dict, output: Optional[str]) -> None:
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+def synthetic_frames(count: int, width: int = 640, height: int = 480, seed: int = 0) -> List[bytes]:
+    """JPEG frames of the repo's face photo with small shifts, or noise when it is missing."""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    base = cv2.imread(DEFAULT_IMAGE)
+    if base is not None:
+        base = cv2.resize(base, (width, height))
+    frames = []
+    for _ in range(count):
+        if base is None:
+            img = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        else:
+            dx, dy = rng.integers(-6, 7, size=2)
+            m = np.float32([[1, 0, dx], [0, 1, dy]])
+            img = cv2.warpAffine(base, m, (width, height), borderMode=cv2.BORDER_REFLECT)
+        ok, buf = cv2.imencode(".jpg", img)
+        if not ok:
+            sys.exit("cv2.imencode failed")
+        frames.append(buf.tobytes())
+    return frames
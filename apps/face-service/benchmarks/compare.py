@@ -0,0 +1,96 @@
+"""
+Compare two benchmark JSON reports (any of the bench_*.py outputs) and flag regressions.
+
+Numeric results are matched by their path in the report. Keys ending in `_ms` are
+lower-is-better, keys containing `per_second` are higher-is-better and `error_rate`
+may not grow by more than --max-error-rate-increase; everything else is ignored.
+Exits with status 1 when any metric regressed by more than --threshold.
+
+    python benchmarks/compare.py baseline.json candidate.json --threshold 0.10
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, Tuple
+
+SKIPPED_SECTIONS = {"environment", "params"}
+
+
+def flatten(node, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if not prefix and key in SKIPPED_SECTIONS:
+                continue
+            yield from flatten(value, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield prefix, float(node)
+
+
+def direction(path: str) -> int:
+    """+1 when higher is better, -1 when lower is better, 0 when not compared."""
+    key = path.rsplit(".", 1)[-1]
+    if "per_second" in key:
+        return 1
+    if key.endswith("_ms"):
+        return -1
+    return 0
+
+
+def compare(baseline: Dict[str, float], candidate: Dict[str, float], threshold: float,
+            max_error_rate_increase: float) -> dict:
+    rows, regressions = [], []
+    for path, before in baseline.items():
+        after = candidate.get(path)
+        if after is None:
+            continue
+        key = path.rsplit(".", 1)[-1]
+        if key == "error_rate":
+            regressed = after - before > max_error_rate_increase
+            change = after - before
+        else:
+            sign = direction(path)
+            if sign == 0 or before == 0:
+                continue
+            change = (after - before) / abs(before)
+            regressed = -sign * change > threshold
+        row = {"metric": path, "baseline": before, "candidate": after, "change": change, "regressed": regressed}
+        rows.append(row)
+        if regressed:
+            regressions.append(row)
+    return {"compared": len(rows), "regressions": regressions, "metrics": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed relative slowdown / throughput drop (0.10 = 10%%)")
+    parser.add_argument("--max-error-rate-increase", type=float, default=0.0)
+    parser.add_argument("--metric", action="append", default=[],
+                        help="Only compare metrics whose path contains this substring (repeatable)")
+    parser.add_argument("--output", help="Write the JSON comparison to this file")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = dict(flatten(json.load(f)))
+    with open(args.candidate) as f:
+        candidate = dict(flatten(json.load(f)))
+    if args.metric:
+        baseline = {k: v for k, v in baseline.items() if any(m in k for m in args.metric)}
+
+    result = compare(baseline, candidate, args.threshold, args.max_error_rate_increase)
+    for row in result["metrics"]:
+        flag = "REGRESSED" if row["regressed"] else "ok"
+        print(f"{flag:>9}  {row['metric']}: {row['baseline']:.3f} -> {row['candidate']:.3f} ({row['change']:+.1%})",
+              file=sys.stderr)
+    print(f"{len(result['regressions'])} regression(s) in {result['compared']} metrics", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    sys.exit(1 if result["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,27 @@
 from enum import Enum
 
+class FaceType(str, Enum):
+    USER = "USER"
+    ADMIN = "ADMIN"
+
+class MatchThreshold(float, Enum):
+    SAME_PERSON = 0.35  # Cosine distance below this is a match
+    STEP_UP = 0.45      # Up to this distance verification asks for a step-up instead of denying
+
 class LivenessThreshold(float, Enum):
     PASS_SCORE = 0.7
     MIN_VARIANCE = 3.0    # Increased from 3.0 - require more natural movement
     HIGH_VARIANCE = 10.0  # Increased from 8.0
+    MIN_FRAMES = 10       # Frames needed before liveness can pass
 
 class LivenessScore(float, Enum):
     BASE_PASS = 0.6
     BOOST_HIGH = 0.3
     BOOST_MODERATE = 0.15
     STATIC_PENALTY = 0.1
+
+class FrameQuality(float, Enum):
+    EXPOSURE_CLIP_MAX = 0.25    # Fraction of clipped (near black/white) pixels that zeroes the exposure score
+    MOTION_WEIGHT = 0.5         # How strongly directional blur lowers the frame score
+    EARLY_STOP_SCORE = 0.5      # Stop detecting once a face is found on a frame scoring at least this...
+    EARLY_STOP_DET_SCORE = 0.75 # ...with at least this detection score
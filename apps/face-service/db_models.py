@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, ARRAY, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean
 from sqlalchemy.sql import func
 from database import Base
+from vector_store import EmbeddingType
 import uuid
 
 class Face(Base):
@@ -9,7 +10,7 @@ class Face(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     external_id = Column(String, unique=True, index=True, nullable=False) # ID from Auth Service (User/Admin ID)
     type = Column(String, nullable=False) # 'USER' or 'ADMIN'
-    embedding = Column(ARRAY(Float), nullable=False) # Face Vector (512 dims)
+    embedding = Column(EmbeddingType, nullable=False) # Face Vector (512 dims), vector(512) with pgvector
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -0,0 +1,98 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+from metrics import STAGE_WAIT_SECONDS
+
+CPU_COUNT = os.cpu_count() or 1
+
+# 'thread' (default) or 'process'. Only the CPU-bound stages (decode, liveness) honour 'process'.
+EXECUTOR_KIND = os.getenv("EXECUTOR_KIND", "thread").lower()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+class Stage:
+    """
+    A pipeline stage with its own worker pool and a cap on concurrent in-flight calls.
+
+    Blocking work submitted through run() executes on the stage's pool so the event
+    loop stays free; callers beyond the concurrency cap wait on the semaphore instead
+    of piling work onto the pool queue. A stage with workers=0 has no pool and only
+    exposes the semaphore (used to bound work that already runs elsewhere).
+    """
+
+    def __init__(self, name: str, workers: int, concurrency: int, use_processes: bool = False):
+        self.name = name
+        self.workers = workers
+        self.concurrency = max(1, concurrency)
+        self.use_processes = use_processes
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self._pool: Optional[Executor] = None
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            if self.use_processes:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-stage")
+        return self._pool
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        started = time.perf_counter()
+        async with self.semaphore:
+            STAGE_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+            loop = asyncio.get_running_loop()
+            call = partial(fn, *args, **kwargs)
+            if not self.use_processes:
+                # Carry the request context (per-request stage timings) into the worker thread
+                call = partial(contextvars.copy_context().run, call)
+            return await loop.run_in_executor(self.pool, call)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Hold one of the stage's concurrency slots (for stages without a pool)."""
+        started = time.perf_counter()
+        async with self.semaphore:
+            STAGE_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+            yield
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _stage(name: str, workers: int, concurrency: int, cpu_bound: bool = False) -> Stage:
+    key = name.upper()
+    return Stage(
+        name,
+        workers=_env_int(f"EXECUTOR_{key}_WORKERS", workers),
+        concurrency=_env_int(f"EXECUTOR_{key}_CONCURRENCY", concurrency),
+        use_processes=cpu_bound and EXECUTOR_KIND == "process",
+    )
+
+
+# base64 + cv2.imdecode of request frames
+decode_stage = _stage("decode", workers=min(4, CPU_COUNT), concurrency=min(4, CPU_COUNT) * 2, cpu_bound=True)
+# LivenessDetector.check_liveness
+liveness_stage = _stage("liveness", workers=min(2, CPU_COUNT), concurrency=min(2, CPU_COUNT) * 2, cpu_bound=True)
+# Requests allowed to have frames queued on the InferenceScheduler (which has its own worker)
+inference_stage = _stage("inference", workers=0, concurrency=16)
+# Synchronous SQLAlchemy calls and gallery lookups (sized to the connection pool)
+db_stage = _stage("db", workers=_env_int("DB_POOL_SIZE", 5), concurrency=_env_int("DB_POOL_SIZE", 5))
+
+STAGES = (decode_stage, liveness_stage, inference_stage, db_stage)
+
+
+def shutdown() -> None:
+    for stage in STAGES:
+        stage.shutdown()
@@ -0,0 +1,310 @@
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDING_DIM = 512
+# Gallery rows scored per matrix-matrix product in search_many (bounds the score buffer)
+SEARCH_BLOCK_ROWS = int(os.getenv("FACE_INDEX_SEARCH_BLOCK_ROWS", "65536"))
+# Storage of the resident embeddings: 'float32', 'float16' (2x smaller) or 'int8'
+# (4x smaller, one float32 scale per vector)
+INDEX_PRECISION = os.getenv("FACE_INDEX_PRECISION", "float32").lower()
+# Rows converted between float32 and the stored precision at a time, when loading
+# and when scoring quantized segments (sized to stay in cache)
+QUANTIZED_BLOCK_ROWS = int(os.getenv("FACE_INDEX_QUANTIZED_BLOCK_ROWS", "4096"))
+
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+if INDEX_PRECISION not in _DTYPES:
+    raise ValueError(f"FACE_INDEX_PRECISION must be one of {sorted(_DTYPES)}")
+
+
+class IndexMatch(NamedTuple):
+    external_id: str
+    type: str
+    similarity: float
+
+
+def normalize_embedding(vector: Sequence[float]) -> np.ndarray:
+    """
+    Convert a vector to a unit-length float32 array (zero vectors stay zero).
+    """
+    v = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(v)
+    if norm > 0:
+        v = v / norm
+    return v
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class _Segment:
+    """
+    The faces of one type: a contiguous matrix of pre-normalized embeddings (float32,
+    float16, or int8 codes with a per-row scale) plus the external_id of each row.
+    Rows are replaced in place and removed by swapping in the last row, so the
+    matrix stays dense.
+    """
+
+    def __init__(self, face_type: str, dim: int, precision: str = INDEX_PRECISION, initial_capacity: int = 1024):
+        self.type = face_type
+        self.precision = precision
+        self.matrix = np.zeros((initial_capacity, dim), dtype=_DTYPES[precision])
+        self.scales = np.ones(initial_capacity, dtype=np.float32) if precision == "int8" else None
+        self.external_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.external_ids)
+
+    @property
+    def nbytes(self) -> int:
+        size = len(self.external_ids)
+        return self.matrix[:size].nbytes + (self.scales[:size].nbytes if self.scales is not None else 0)
+
+    def extend(self, external_ids: List[str], vectors: np.ndarray) -> None:
+        """Append a block of new faces (float32 rows, normalized here)."""
+        start = len(self.external_ids)
+        self._ensure_capacity(start + len(external_ids))
+        self._store(slice(start, start + len(external_ids)), _normalize_rows(vectors))
+        for row, external_id in enumerate(external_ids, start):
+            self.rows[external_id] = row
+        self.external_ids.extend(external_ids)
+
+    def _store(self, rows, vectors: np.ndarray) -> None:
+        if self.precision == "int8":
+            # Symmetric per-vector quantization: code = round(v / scale), scale = max|v| / 127
+            scales = np.abs(vectors).max(axis=-1) / 127.0
+            scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+            self.matrix[rows] = np.rint(vectors / scales[..., None]).astype(np.int8)
+            self.scales[rows] = scales
+        else:
+            self.matrix[rows] = vectors
+
+    def set(self, external_id: str, vector: np.ndarray) -> None:
+        row = self.rows.get(external_id)
+        if row is None:
+            row = len(self.external_ids)
+            self._ensure_capacity(row + 1)
+            self.external_ids.append(external_id)
+            self.rows[external_id] = row
+        self._store(row, vector)
+
+    def remove(self, external_id: str) -> bool:
+        row = self.rows.pop(external_id, None)
+        if row is None:
+            return False
+        last = len(self.external_ids) - 1
+        if row != last:
+            # Move the last row into the hole to keep the matrix dense
+            moved_id = self.external_ids[last]
+            self.matrix[row] = self.matrix[last]
+            if self.scales is not None:
+                self.scales[row] = self.scales[last]
+            self.external_ids[row] = moved_id
+            self.rows[moved_id] = row
+        self.external_ids.pop()
+        return True
+
+    def top_k(self, probes: np.ndarray, k: int, block_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Unordered top-k (scores, rows) per probe, scoring block_rows rows per
+        matrix-matrix product and keeping a running top-k. Quantized rows are
+        widened to float32 one cache-sized block at a time (NumPy has no
+        float16/int8 BLAS), so scores are approximate for them.
+        """
+        size = len(self.external_ids)
+        k = min(k, size)
+        if self.precision != "float32":
+            block_rows = min(block_rows, QUANTIZED_BLOCK_ROWS)
+        best_scores = np.full((len(probes), k), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(probes), k), dtype=np.int64)
+        for start in range(0, size, max(1, block_rows)):
+            end = min(start + block_rows, size)
+            block = self.matrix[start:end]
+            if self.precision == "float32":
+                scores = probes @ block.T
+            else:
+                scores = probes @ block.astype(np.float32).T
+                if self.scales is not None:
+                    scores *= self.scales[start:end]
+            block_k = min(k, block.shape[0])
+            top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+            merged_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            merged_rows = np.concatenate([best_rows, top + start], axis=1)
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+        return best_scores, best_rows
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = self.matrix.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2)
+        matrix = np.zeros((new_capacity, self.matrix.shape[1]), dtype=self.matrix.dtype)
+        matrix[:len(self.external_ids)] = self.matrix[:len(self.external_ids)]
+        self.matrix = matrix
+        if self.scales is not None:
+            scales = np.ones(new_capacity, dtype=np.float32)
+            scales[:len(self.external_ids)] = self.scales[:len(self.external_ids)]
+            self.scales = scales
+
+
+class FaceIndex:
+    """
+    Resident gallery of registered face embeddings, partitioned by face type.
+
+    Each type is a separate segment (one contiguous matrix of pre-normalized
+    embeddings stored as float32, float16, or int8 codes with a float32 scale per
+    row, per `precision`) so identification is a matrix product instead of a table
+    scan, and a search scoped to one type (e.g. the few ADMIN faces) only touches
+    that segment. With a float16/int8 precision the scores are approximate;
+    callers that need exact scores re-rank a shortlist (see vector_store.NumpyGallery).
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, precision: str = INDEX_PRECISION):
+        if precision not in _DTYPES:
+            raise ValueError(f"precision must be one of {sorted(_DTYPES)}")
+        self.dim = dim
+        self.precision = precision
+        self._lock = threading.RLock()
+        self._segments: Dict[str, _Segment] = {}
+        self._types: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def __contains__(self, external_id: str) -> bool:
+        return external_id in self._types
+
+    @property
+    def quantized(self) -> bool:
+        return self.precision != "float32"
+
+    def nbytes(self) -> int:
+        """Memory held by the embeddings (and int8 scales)."""
+        with self._lock:
+            return sum(segment.nbytes for segment in self._segments.values())
+
+    def counts(self) -> Dict[str, int]:
+        """Number of faces per type."""
+        with self._lock:
+            return {face_type: len(segment) for face_type, segment in self._segments.items()}
+
+    def load(self, rows: Iterable[Tuple[str, str, Sequence[float]]],
+             sizes: Optional[Dict[str, int]] = None) -> int:
+        """
+        Replace the whole index with (external_id, type, embedding) rows.
+        Rows are stored QUANTIZED_BLOCK_ROWS at a time as they stream in, so the
+        gallery is never held as float32 in full; `sizes` (faces per type)
+        preallocates the segments. Returns the number of faces loaded.
+        """
+        sizes = sizes or {}
+        segments: Dict[str, _Segment] = {}
+        blocks: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        types: Dict[str, str] = {}
+        for external_id, face_type, embedding in rows:
+            segment = segments.get(face_type)
+            if segment is None:
+                size = sizes.get(face_type) or 0
+                segment = segments[face_type] = _Segment(face_type, self.dim, self.precision,
+                                                         initial_capacity=size or 1024)
+                block_rows = min(size, QUANTIZED_BLOCK_ROWS) if size else QUANTIZED_BLOCK_ROWS
+                blocks[face_type] = ([], np.empty((block_rows, self.dim), dtype=np.float32))
+            external_ids, block = blocks[face_type]
+            block[len(external_ids)] = embedding
+            external_ids.append(external_id)
+            types[external_id] = face_type
+            if len(external_ids) == len(block):
+                segment.extend(external_ids, block)
+                external_ids.clear()
+        for face_type, (external_ids, block) in blocks.items():
+            if external_ids:
+                segments[face_type].extend(external_ids, block[:len(external_ids)])
+
+        with self._lock:
+            self._segments = segments
+            self._types = types
+        return len(types)
+
+    def upsert(self, external_id: str, face_type: str, embedding: Sequence[float]) -> None:
+        """
+        Add a face, or replace its embedding/type if already indexed.
+        """
+        vector = normalize_embedding(embedding)
+        with self._lock:
+            previous = self._types.get(external_id)
+            if previous is not None and previous != face_type:
+                self._segments[previous].remove(external_id)
+            segment = self._segments.get(face_type)
+            if segment is None:
+                segment = self._segments[face_type] = _Segment(face_type, self.dim, self.precision)
+            segment.set(external_id, vector)
+            self._types[external_id] = face_type
+
+    def remove(self, external_id: str) -> bool:
+        """
+        Drop a face from the index. Returns False if it was not indexed.
+        """
+        with self._lock:
+            face_type = self._types.pop(external_id, None)
+            if face_type is None:
+                return False
+            return self._segments[face_type].remove(external_id)
+
+    def search(self, vector: Sequence[float], k: int = 1, face_type: Optional[str] = None) -> List[IndexMatch]:
+        """
+        Return the k most similar faces (cosine similarity), best first,
+        optionally only among faces of face_type.
+        """
+        return self.search_many([vector], k, face_type)[0]
+
+    def search_many(self, vectors: Sequence[Sequence[float]], k: int = 1, face_type: Optional[str] = None,
+                    block_rows: int = SEARCH_BLOCK_ROWS) -> List[List[IndexMatch]]:
+        """
+        Top-k faces for each probe, best first, optionally only among faces of face_type.
+
+        Probes are scored against block_rows gallery rows at a time with one
+        matrix-matrix product per block, keeping a running per-probe top-k, so the
+        score buffer is probes x block_rows regardless of the gallery size.
+        """
+        if not len(vectors):
+            return []
+        probes = np.stack([normalize_embedding(v) for v in vectors])
+        with self._lock:
+            if face_type is None:
+                segments = [s for s in self._segments.values() if len(s)]
+            else:
+                segments = [s for s in [self._segments.get(face_type)] if s is not None and len(s)]
+            if not segments or k <= 0:
+                return [[] for _ in range(len(probes))]
+
+            scores, rows, owners = [], [], []
+            for i, segment in enumerate(segments):
+                segment_scores, segment_rows = segment.top_k(probes, k, block_rows)
+                scores.append(segment_scores)
+                rows.append(segment_rows)
+                owners.append(np.full(segment_rows.shape, i))
+            scores = np.concatenate(scores, axis=1)
+            rows = np.concatenate(rows, axis=1)
+            owners = np.concatenate(owners, axis=1)
+
+            order = np.argsort(-scores, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, order, axis=1).tolist()
+            rows = np.take_along_axis(rows, order, axis=1).tolist()
+            owners = np.take_along_axis(owners, order, axis=1).tolist()
+            return [
+                [
+                    IndexMatch(segments[owner].external_ids[row], segments[owner].type, score)
+                    for score, row, owner in zip(probe_scores, probe_rows, probe_owners)
+                ]
+                for probe_scores, probe_rows, probe_owners in zip(scores, rows, owners)
+            ]
+
+
+face_index = FaceIndex()
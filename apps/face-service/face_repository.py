@@ -0,0 +1,69 @@
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import db_models
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def save_face(db: Session, external_id: str, face_type: str, embedding: List[float]) -> db_models.Face:
+    """
+    Insert a face, or update the embedding/type of an existing one.
+    """
+    face = db.query(db_models.Face).filter(db_models.Face.external_id == external_id).first()
+    if face:
+        face.embedding = embedding
+        face.type = face_type
+    else:
+        face = db_models.Face(external_id=external_id, type=face_type, embedding=embedding)
+        db.add(face)
+    db.commit()
+    db.refresh(face)
+    return face
+
+
+def save_faces(db: Session, faces: Sequence[Dict]) -> int:
+    """
+    Upsert many faces ({external_id, type, embedding} dicts) in one transaction.
+    Uses INSERT ... ON CONFLICT (external_id) DO UPDATE, sent as multi-row batches,
+    instead of a SELECT + INSERT/UPDATE + commit per face. When an external_id appears
+    more than once the last entry wins. Returns the number of rows written.
+    """
+    rows = list({face["external_id"]: face for face in faces}.values())
+    if not rows:
+        return 0
+
+    insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        for face in rows:
+            save_face(db, face["external_id"], face["type"], face["embedding"])
+        return len(rows)
+
+    stmt = insert(db_models.Face)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[db_models.Face.external_id],
+        set_={"type": stmt.excluded.type, "embedding": stmt.excluded.embedding, "updated_at": func.now()},
+    )
+    try:
+        db.execute(stmt, rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+
+def delete_face(db: Session, external_id: str) -> Optional[str]:
+    """
+    Delete a face by external_id. Returns the deleted external_id, or None if not found.
+    """
+    face = db.query(db_models.Face).filter(db_models.Face.external_id == external_id).first()
+    if not face:
+        return None
+    db.delete(face)
+    db.commit()
+    return external_id
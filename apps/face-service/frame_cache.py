@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from frames import RawFrame
+from metrics import FRAME_CACHE_LOOKUPS
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Max cached frames (0 disables the cache) and how long an entry stays valid
+FRAME_CACHE_SIZE = int(os.getenv("FRAME_CACHE_SIZE", "1024"))
+FRAME_CACHE_TTL_SECONDS = float(os.getenv("FRAME_CACHE_TTL_SECONDS", "60"))
+
+
+def frame_key(raw: RawFrame) -> bytes:
+    """Content hash of a frame exactly as received (base64 text or encoded bytes)."""
+    data = raw.encode() if isinstance(raw, str) else raw
+    if xxhash is not None:
+        return xxhash.xxh3_128_digest(data)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class CacheEntry:
+    __slots__ = ("thumbnail", "faces", "expires_at")
+
+    def __init__(self, expires_at: float):
+        self.thumbnail: Optional[np.ndarray] = None
+        # Detector output for the full frame per detector input size
+        self.faces: Dict[int, list] = {}
+        self.expires_at = expires_at
+
+
+class FrameCache:
+    """
+    Bounded LRU of per-frame results keyed by frame_key().
+
+    Clients typically send the same frame set to /liveness-check and then to
+    /verify-face or /faces/identify; cached thumbnails skip decoding for liveness
+    and ranking, cached detections skip inference. Entries expire after ttl_seconds
+    and the least recently used entry is evicted beyond max_entries.
+    """
+
+    def __init__(self, max_entries: int = FRAME_CACHE_SIZE, ttl_seconds: float = FRAME_CACHE_TTL_SECONDS):
+        self.max_entries = max(0, max_entries)
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[bytes, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {"thumbnail": 0, "faces": 0}
+        self.misses = {"thumbnail": 0, "faces": 0}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def keys(self, frames: Sequence[RawFrame]) -> List[Optional[bytes]]:
+        if not self.enabled:
+            return [None] * len(frames)
+        return [frame_key(raw) for raw in frames]
+
+    def _get(self, key: Optional[bytes]) -> Optional[CacheEntry]:
+        entry = self._entries.get(key) if key is not None else None
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _entry(self, key: bytes) -> CacheEntry:
+        entry = self._get(key)
+        if entry is None:
+            entry = self._entries[key] = CacheEntry(time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def _count(self, kind: str, hit: bool) -> None:
+        (self.hits if hit else self.misses)[kind] += 1
+        FRAME_CACHE_LOOKUPS.labels(kind, "hit" if hit else "miss").inc()
+
+    def get_thumbnail(self, key: Optional[bytes]) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._get(key)
+            thumbnail = entry.thumbnail if entry else None
+            self._count("thumbnail", thumbnail is not None)
+        return thumbnail
+
+    def get_faces(self, key: Optional[bytes], det_size: int) -> Optional[list]:
+        """Detections at det_size, or at the closest larger size (at least as accurate)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._get(key)
+            sizes = sorted(size for size in entry.faces if size >= det_size) if entry else []
+            faces = entry.faces[sizes[0]] if sizes else None
+            self._count("faces", faces is not None)
+        return faces
+
+    def put_thumbnail(self, key: Optional[bytes], thumbnail: np.ndarray) -> None:
+        if self.enabled and key is not None:
+            with self._lock:
+                self._entry(key).thumbnail = thumbnail
+
+    def put_faces(self, key: Optional[bytes], faces: list, det_size: int) -> None:
+        if self.enabled and key is not None:
+            with self._lock:
+                self._entry(key).faces[det_size] = faces
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "evictions": self.evictions,
+            }
+
+
+frame_cache = FrameCache()
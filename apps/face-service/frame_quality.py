@@ -0,0 +1,78 @@
+import os
+from typing import List, NamedTuple, Sequence
+
+import cv2
+import numpy as np
+
+from constants import FrameQuality
+from utils import calculate_frame_sharpness
+
+# Frames sent to the detector first (best quality first), and how many per inference wave
+PREFILTER_ENABLED = os.getenv("FRAME_PREFILTER", "1") != "0"
+PREFILTER_TOP_K = int(os.getenv("FRAME_PREFILTER_TOP_K", "4"))
+PREFILTER_WAVE_SIZE = int(os.getenv("FRAME_PREFILTER_WAVE_SIZE", "2"))
+
+
+class QualityScore(NamedTuple):
+    sharpness: float  # Laplacian variance (absolute, only comparable within a frame set)
+    exposure: float   # [0, 1], 1 = mid-tone mean and no clipped pixels
+    motion: float     # [0, 1], 1 = no directional (motion) blur
+
+
+def score_thumbnail(gray: np.ndarray) -> QualityScore:
+    """
+    Cheap image quality measurements on a small grayscale view.
+    """
+    sharpness = float(calculate_frame_sharpness(gray))
+
+    mean = float(gray.mean()) / 255.0
+    clipped = float(np.count_nonzero((gray < 10) | (gray > 245))) / gray.size
+    exposure = max(0.0, 1.0 - 2.0 * abs(mean - 0.5)) * max(0.0, 1.0 - clipped / FrameQuality.EXPOSURE_CLIP_MAX.value)
+
+    # Motion blur removes gradient energy along one direction only
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    ex, ey = float(np.mean(gx * gx)), float(np.mean(gy * gy))
+    anisotropy = abs(ex - ey) / (ex + ey) if ex + ey > 0 else 1.0
+    motion = 1.0 - FrameQuality.MOTION_WEIGHT.value * anisotropy
+
+    return QualityScore(sharpness, exposure, motion)
+
+
+def rank_frames(frames: Sequence) -> List:
+    """
+    Score every frame (sharpness x exposure x motion) relative to the best frame in the
+    set and return them best first. Sets frame.rank_score in [0, 1] on each frame.
+    """
+    raw = [f.quality.sharpness * f.quality.exposure * f.quality.motion for f in frames]
+    best = max(raw, default=0.0)
+    for f, score in zip(frames, raw):
+        f.rank_score = score / best if best > 0 else 0.0
+    return sorted(frames, key=lambda f: -f.rank_score)
+
+
+def detection_waves(frames: Sequence) -> List[List]:
+    """
+    Split frames into the waves the detector should run on, best candidates first.
+    The top-K frames come first in waves of PREFILTER_WAVE_SIZE; the remaining frames
+    follow as a last wave that only runs if no face was found in the top-K.
+    """
+    if not frames:
+        return []
+    if not PREFILTER_ENABLED:
+        return [list(frames)]
+    ranked = rank_frames(frames)
+    top, rest = ranked[:PREFILTER_TOP_K], ranked[PREFILTER_TOP_K:]
+    size = max(1, PREFILTER_WAVE_SIZE)
+    waves = [top[i:i + size] for i in range(0, len(top), size)]
+    if rest:
+        waves.append(rest)
+    return waves
+
+
+def is_good_enough(frame, face) -> bool:
+    """Whether a detected face is good enough to stop running the detector on more frames."""
+    return (
+        face.det_score >= FrameQuality.EARLY_STOP_DET_SCORE.value
+        and frame.rank_score >= FrameQuality.EARLY_STOP_SCORE.value
+    )
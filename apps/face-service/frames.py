@@ -0,0 +1,105 @@
+import os
+from functools import cached_property
+from typing import List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from frame_quality import QualityScore, score_thumbnail
+from utils import REDUCED_GRAYSCALE_FLAGS, decode_base64_frame, decode_image_bytes, make_thumbnail
+
+# A frame as received: base64 string (JSON API) or raw encoded bytes (upload API)
+RawFrame = Union[str, bytes, memoryview]
+
+# Downscale factor used when decoding frames only for liveness (1, 2, 4 or 8)
+LIVENESS_DECODE_SCALE = int(os.getenv("LIVENESS_DECODE_SCALE", "4"))
+if LIVENESS_DECODE_SCALE not in REDUCED_GRAYSCALE_FLAGS:
+    raise ValueError(f"LIVENESS_DECODE_SCALE must be one of {sorted(REDUCED_GRAYSCALE_FLAGS)}")
+
+
+class Frame:
+    """
+    A request frame decoded exactly once, with cheap derived views computed on first use.
+    Frames restored from the frame cache start without an image (only the thumbnail);
+    `raw` is kept so the image can still be decoded if inference needs it.
+    """
+
+    def __init__(self, index: int, image: Optional[np.ndarray] = None, raw: Optional[RawFrame] = None,
+                 key: Optional[bytes] = None, thumbnail: Optional[np.ndarray] = None):
+        self.index = index
+        self.image = image
+        self.raw = raw
+        self.key = key
+        self.rank_score = 1.0
+        if thumbnail is not None:
+            self.thumbnail = thumbnail
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        return cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def thumbnail(self) -> np.ndarray:
+        """Downscaled grayscale view (used by liveness and frame ranking)."""
+        return make_thumbnail(self.gray)
+
+    @cached_property
+    def quality(self) -> QualityScore:
+        return score_thumbnail(self.thumbnail)
+
+
+def decode_image(raw: RawFrame) -> np.ndarray:
+    return decode_base64_frame(raw) if isinstance(raw, str) else decode_image_bytes(raw)
+
+
+def decode_frames(frames: Sequence[RawFrame], skip_invalid: bool = False, thumbnails: bool = False) -> List[Frame]:
+    """
+    Decode base64 or raw image frames once for the whole request.
+    Invalid frames raise ValueError unless skip_invalid is set, in which case they are
+    dropped (remaining frames keep their original index). With thumbnails=True the
+    thumbnail is computed here too, so it is built on the decode worker.
+    """
+    decoded = []
+    for idx, raw in enumerate(frames):
+        try:
+            frame = Frame(idx, decode_image(raw))
+        except ValueError:
+            if not skip_invalid:
+                raise
+            continue
+        if thumbnails:
+            frame.thumbnail  # cached on the Frame
+        decoded.append(frame)
+    return decoded
+
+
+def decode_images(frames: Sequence[RawFrame]) -> List[np.ndarray]:
+    return [decode_image(raw) for raw in frames]
+
+
+def decode_thumbnails(frames: Sequence[RawFrame], scale: int = LIVENESS_DECODE_SCALE) -> List[np.ndarray]:
+    """
+    Decode frames straight to liveness thumbnails, for requests that never need the
+    full-resolution image. JPEGs are decoded to grayscale at 1/scale resolution, which
+    skips most of the decode work on large frames.
+    """
+    flags = REDUCED_GRAYSCALE_FLAGS[scale]
+    thumbnails = []
+    for raw in frames:
+        image = decode_base64_frame(raw, flags) if isinstance(raw, str) else decode_image_bytes(raw, flags)
+        thumbnails.append(make_thumbnail(image))
+    return thumbnails
+
+
+def select_best_face(frames: Sequence[Frame], detections: Sequence[list]) -> Optional[Tuple[Frame, object]]:
+    """
+    Pick the face with the highest det_score given each frame's detections.
+    Returns (frame, face) or None if no face was found.
+    """
+    best = None
+    for frame, faces in zip(frames, detections):
+        if len(faces) >= 1:
+            face = faces[0]
+            if best is None or face.det_score > best[1].det_score:
+                best = (frame, face)
+    return best
@@ -0,0 +1,54 @@
+"""
+Gunicorn settings for running several uvicorn workers that share one preloaded model:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The master imports main once (preload_app) with FACE_MODEL_PRELOAD=1, so the ONNX
+weights are loaded and warmed before forking and the workers share those pages
+copy-on-write. Each worker then starts its own inference worker thread, executor
+pools, DB connections and gallery in the FastAPI startup event.
+
+Several workers need FACE_VECTOR_BACKEND=pgvector: the NumPy gallery is per
+worker, so a face registered or deleted through one worker would never reach
+the others. Without pgvector the default is one worker and more are refused.
+"""
+import gc
+import os
+
+os.environ.setdefault("FACE_MODEL_PRELOAD", "1")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+_shared_gallery = os.getenv("FACE_VECTOR_BACKEND", "numpy").lower() == "pgvector"
+workers = int(os.getenv("WEB_CONCURRENCY", "2" if _shared_gallery else "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Model loading happens before the workers fork, so they boot in well under this
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+
+def on_starting(server):
+    # main is preloaded by now, so this sees the backend actually in use (pgvector
+    # falls back to NumPy when the extension is missing)
+    import vector_store
+
+    if workers > 1 and not vector_store.pgvector_enabled():
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={workers} needs the pgvector gallery: with the in-memory "
+            "NumPy gallery each worker would miss the faces registered through the others"
+        )
+
+
+def when_ready(server):
+    # Move everything allocated so far (model, modules) out of the collector's reach:
+    # gc passes in the workers would otherwise write to those objects and un-share their pages
+    gc.collect()
+    gc.freeze()
+    server.log.info("Model preloaded, forking %s workers", workers)
+
+
+def post_fork(server, worker):
+    # Connections opened by the master (table creation, migrations) must not be shared
+    from database import engine
+
+    engine.dispose(close=False)
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from insightface.app.common import Face as InsightFace
+    from insightface.utils import face_align
+except ImportError:
+    InsightFace = None
+    face_align = None
+
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+MAX_LINGER_MS = float(os.getenv("INFERENCE_MAX_LINGER_MS", "5"))
+
+# Detector input size (square) the model is prepared with, and the fallback size
+DETECTION_FULL_SIZE = int(os.getenv("DETECTION_FULL_SIZE", "640"))
+# Detector input size per pipeline (DETECTION_SIZE_<PIPELINE> overrides). Every pipeline
+# defaults to the full size: a 320 default for verify/identify (~4x fewer FLOPs) is deferred
+# until benchmarks/bench_detection_profiles.py has measured its accuracy on real frames.
+DETECTION_SIZES = {
+    pipeline: int(os.getenv(f"DETECTION_SIZE_{pipeline.upper()}", str(DETECTION_FULL_SIZE)))
+    for pipeline in ("verify", "identify", "identify_batch", "extract", "register", "bulk_enroll")
+}
+
+
+def detection_size(pipeline: str) -> int:
+    return DETECTION_SIZES.get(pipeline, DETECTION_FULL_SIZE)
+
+
+def run_batch(face_app, images: Sequence[np.ndarray], det_sizes: Optional[Sequence[Optional[int]]] = None,
+              located: Optional[Sequence[Optional[list]]] = None) -> List[list]:
+    """
+    Detect faces in every image (at its det_sizes entry, or the prepared size when None),
+    then embed all detected faces with one recognition call. Images with a `located`
+    entry (faces already placed, e.g. tracking.Track) skip detection and are only embedded.
+    Only detection and recognition are run (landmark/gender-age models are not needed here).
+    Falls back to face_app.get per image when the model internals are not available (mock).
+    """
+    det_model = getattr(face_app, "det_model", None)
+    rec_model = getattr(face_app, "models", {}).get("recognition")
+    if det_model is None or rec_model is None or InsightFace is None:
+        return [face_app.get(img) for img in images]
+
+    if det_sizes is None:
+        det_sizes = [None] * len(images)
+    if located is None:
+        located = [None] * len(images)
+    results, crops, owners = [], [], []
+    for img, det_size, known in zip(images, det_sizes, located):
+        if known is not None:
+            candidates = [InsightFace(bbox=f.bbox, kps=f.kps, det_score=f.det_score) for f in known]
+        else:
+            input_size = (det_size, det_size) if det_size else None
+            bboxes, kpss = det_model.detect(img, input_size=input_size, max_num=0, metric="default")
+            candidates = [
+                InsightFace(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+                for i in range(bboxes.shape[0])
+            ]
+        faces = []
+        for face in candidates:
+            if face.kps is not None:
+                crops.append(face_align.norm_crop(img, landmark=face.kps, image_size=rec_model.input_size[0]))
+                owners.append(face)
+            faces.append(face)
+        results.append(faces)
+
+    if crops:
+        try:
+            embeddings = rec_model.get_feat(crops)
+        except Exception:
+            # Model exported with a fixed batch dimension
+            embeddings = np.concatenate([rec_model.get_feat(crop) for crop in crops])
+        for face, embedding in zip(owners, embeddings):
+            face.embedding = embedding.flatten()
+
+    # Faces without landmarks cannot be aligned for recognition
+    return [[face for face in faces if face.get("embedding") is not None] for faces in results]
+
+
+class _Job:
+    __slots__ = ("image", "det_size", "located", "future", "enqueued_at")
+
+    def __init__(self, image: np.ndarray, det_size: Optional[int] = None, located: Optional[list] = None):
+        self.image = image
+        self.det_size = det_size
+        self.located = located
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class _BatchStats:
+    __slots__ = ("batches", "images", "compute_seconds", "latency_seconds")
+
+    def __init__(self):
+        self.batches = 0
+        self.images = 0
+        self.compute_seconds = 0.0
+        self.latency_seconds = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "images": self.images,
+            "images_per_second": self.images / self.compute_seconds if self.compute_seconds else 0.0,
+            "avg_batch_ms": 1000 * self.compute_seconds / self.batches if self.batches else 0.0,
+            "avg_latency_ms": 1000 * self.latency_seconds / self.images if self.images else 0.0,
+        }
+
+
+class InferenceScheduler:
+    """
+    Cross-request micro-batching for face inference.
+
+    Requests submit images to a shared queue; a dedicated worker thread drains it in
+    batches of up to max_batch_size images, waiting at most max_linger_ms for a batch
+    to fill, and resolves each request's future with that image's faces. Jobs carry
+    their own detector input size (or already located faces to embed only), so
+    requests of different pipelines share batches.
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_fn: Callable[[Sequence[np.ndarray], Sequence[Optional[int]], Sequence[Optional[list]]], List[list]],
+                 max_batch_size: int = MAX_BATCH_SIZE, max_linger_ms: float = MAX_LINGER_MS):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_linger = max(0.0, max_linger_ms) / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._stats: Dict[int, _BatchStats] = {}
+        self._stats_lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="inference-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, image: np.ndarray, det_size: Optional[int] = None, located: Optional[list] = None) -> Future:
+        job = _Job(image, det_size, located)
+        self._queue.put(job)
+        return job.future
+
+    async def detect(self, image: np.ndarray, det_size: Optional[int] = None) -> list:
+        return await asyncio.wrap_future(self.submit(image, det_size))
+
+    async def detect_many(self, images: Sequence[np.ndarray], return_exceptions: bool = False,
+                          det_size: Optional[int] = None) -> List[list]:
+        """
+        Submit all images at once (so they can share batches) and wait for every result.
+        Images that fail inference yield an empty face list, or their exception when
+        return_exceptions is set.
+        """
+        futures = [asyncio.wrap_future(self.submit(img, det_size)) for img in images]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        if return_exceptions:
+            return results
+        return [[] if isinstance(r, Exception) else r for r in results]
+
+    async def embed_many(self, images: Sequence[np.ndarray], located: Sequence[list]) -> List[list]:
+        """Recognition only: embed the given faces of each image (no detector run)."""
+        futures = [asyncio.wrap_future(self.submit(img, located=faces)) for img, faces in zip(images, located)]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        return [[] if isinstance(r, Exception) else r for r in results]
+
+    def stats(self) -> dict:
+        """Throughput and latency per observed batch size."""
+        with self._stats_lock:
+            per_size = {size: s.to_dict() for size, s in sorted(self._stats.items())}
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_linger_ms": self.max_linger * 1000,
+            "queue_depth": self._queue.qsize(),
+            "batch_sizes": per_size,
+        }
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is self._STOP:
+                return
+            batch = [job]
+            stop = False
+            deadline = time.perf_counter() + self.max_linger
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is self._STOP:
+                    stop = True
+                    break
+                batch.append(job)
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch: List[_Job]) -> None:
+        # Skip jobs whose request was cancelled (e.g. client disconnected) while queued
+        batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            results = self.batch_fn(
+                [job.image for job in batch], [job.det_size for job in batch], [job.located for job in batch],
+            )
+        except Exception:
+            # Isolate the failing image instead of failing the whole batch
+            results = []
+            for job in batch:
+                try:
+                    results.append(self.batch_fn([job.image], [job.det_size], [job.located])[0])
+                except Exception as e:
+                    results.append(e)
+        finished = time.perf_counter()
+
+        for job, result in zip(batch, results):
+            if isinstance(result, Exception):
+                job.future.set_exception(result)
+            else:
+                job.future.set_result(result)
+
+        with self._stats_lock:
+            stats = self._stats.setdefault(len(batch), _BatchStats())
+            stats.batches += 1
+            stats.images += len(batch)
+            stats.compute_seconds += finished - started
+            stats.latency_seconds += sum(finished - job.enqueued_at for job in batch)
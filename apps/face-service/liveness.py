@@ -1,7 +1,6 @@
 import numpy as np
-import cv2
-from typing import List, Tuple
-from utils import calculate_frame_sharpness
+from typing import List, Optional, Sequence, Tuple, Union
+from utils import THUMBNAIL_SIZE, make_thumbnail
 
 from constants import LivenessThreshold, LivenessScore
 
@@ -11,9 +10,11 @@ class LivenessDetector:
         self.LIVENESS_THRESHOLD = LivenessThreshold.PASS_SCORE.value
         self.VARIANCE_THRESHOLD = LivenessThreshold.MIN_VARIANCE.value
         
-    def check_liveness(self, frames: List[np.ndarray], challenge_passed: bool) -> Tuple[bool, float]:
+    def check_liveness(self, frames: Union[Sequence[np.ndarray], np.ndarray], challenge_passed: bool) -> Tuple[bool, float]:
         """
         Perform liveness detection on a sequence of frames.
+        Frames may be full images (BGR or grayscale), precomputed 100x100 grayscale
+        thumbnails, or a stacked (T, 100, 100) uint8 array.
         Returns: (is_live, score)
         """
         print(f"[Liveness] Checking liveness: challenge_passed={challenge_passed}, num_frames={len(frames)}")
@@ -22,13 +23,20 @@ class LivenessDetector:
             print("[Liveness] FAILED: challenge_passed is False")
             return False, 0.0
             
-        if len(frames) < 10:
-            print(f"[Liveness] FAILED: Not enough frames ({len(frames)} < 10)")
+        if len(frames) < LivenessThreshold.MIN_FRAMES:
+            print(f"[Liveness] FAILED: Not enough frames ({len(frames)} < {LivenessThreshold.MIN_FRAMES.value:.0f})")
             return False, 0.0
             
         # 1. Variance Check (Anti-static photo)
         # Check if frames are identical (screen replay / static photo)
         variance_score = self._calculate_sequence_variance(frames)
+        return self.score(variance_score, challenge_passed)
+
+    def score(self, variance_score: float, challenge_passed: bool) -> Tuple[bool, float]:
+        """
+        Liveness decision from the sequence variance of enough frames.
+        Returns: (is_live, score)
+        """
         print(f"[Liveness] Variance score: {variance_score:.2f} (threshold: {self.VARIANCE_THRESHOLD})")
         
         if variance_score < self.VARIANCE_THRESHOLD:
@@ -59,28 +67,66 @@ class LivenessDetector:
         
         return is_live, score
         
-    def _calculate_sequence_variance(self, frames: List[np.ndarray]) -> float:
+    def _calculate_sequence_variance(self, frames: Union[Sequence[np.ndarray], np.ndarray]) -> float:
         """
         Calculate pixel variance across frames to detect static images.
+        Mean absolute difference between consecutive (subsampled) thumbnails,
+        computed for the whole sequence in one NumPy operation.
         """
         # subsample frames to save partial processing time
         selected_frames = frames[::2] 
         if len(selected_frames) < 2:
             return 0.0
             
-        diffs = []
-        for i in range(len(selected_frames) - 1):
-            f1 = cv2.cvtColor(selected_frames[i], cv2.COLOR_BGR2GRAY)
-            f2 = cv2.cvtColor(selected_frames[i+1], cv2.COLOR_BGR2GRAY)
-            
-            # Resize for speed
-            f1 = cv2.resize(f1, (100, 100))
-            f2 = cv2.resize(f2, (100, 100))
-            
-            diff = cv2.absdiff(f1, f2)
-            diffs.append(np.mean(diff))
-            
-        return sum(diffs) / len(diffs) if diffs else 0.0
+        stack = thumbnail_stack(selected_frames)
+        diffs = np.abs(np.diff(stack.astype(np.int16), axis=0))
+        return float(diffs.mean())
+
+class LivenessAccumulator:
+    """
+    Incremental version of LivenessDetector.check_liveness for frames arriving one
+    at a time: keeps the same every-other-frame thumbnail differences as a running
+    mean, so the result equals check_liveness on all frames received so far.
+    """
+
+    def __init__(self, detector: Optional[LivenessDetector] = None):
+        self.detector = detector or liveness_detector
+        self.frames = 0
+        self._previous: Optional[np.ndarray] = None
+        self._diff_sum = 0.0
+        self._pairs = 0
+
+    def add(self, frame: np.ndarray) -> None:
+        """Add the next frame (full image or 100x100 grayscale thumbnail)."""
+        if self.frames % 2 == 0:
+            thumbnail = thumbnail_stack([frame])[0].astype(np.int16)
+            if self._previous is not None:
+                self._diff_sum += float(np.abs(thumbnail - self._previous).mean())
+                self._pairs += 1
+            self._previous = thumbnail
+        self.frames += 1
+
+    @property
+    def variance(self) -> float:
+        return self._diff_sum / self._pairs if self._pairs else 0.0
+
+    @property
+    def enough_frames(self) -> bool:
+        return self.frames >= LivenessThreshold.MIN_FRAMES
+
+    def result(self, challenge_passed: bool) -> Tuple[bool, float]:
+        """Liveness of the frames so far (fails until MIN_FRAMES frames arrived)."""
+        if not challenge_passed or not self.enough_frames:
+            return False, 0.0
+        return self.detector.score(self.variance, challenge_passed)
+
+def thumbnail_stack(frames: Union[Sequence[np.ndarray], np.ndarray]) -> np.ndarray:
+    """
+    Stack frames into a (T, 100, 100) uint8 grayscale array, converting each frame once.
+    """
+    if isinstance(frames, np.ndarray) and frames.ndim == 3 and frames.shape[1:] == THUMBNAIL_SIZE[::-1]:
+        return frames
+    return np.stack([make_thumbnail(f) for f in frames])
 
 liveness_detector = LivenessDetector()
 
@@ -1,49 +1,76 @@
 import os
-import cv2
-import numpy as np
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
-from fastapi.responses import JSONResponse
+import asyncio
+import copy
+import json
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from limits import parse as parse_rate_limit
 
 # Import local modules
 from models import (
-    LivenessCheckRequest, LivenessCheckResponse,
-    ExtractVectorRequest, ExtractVectorResponse,
+    LivenessCheckParams, LivenessCheckRequest, LivenessCheckResponse,
+    ExtractVectorParams, ExtractVectorRequest, ExtractVectorResponse,
     CompareVectorsRequest, CompareVectorsResponse,
-    VerifyFaceRequest, VerifyFaceResponse,
-    RegisterFaceRequest, RegisterFaceResponse,
-    IdentifyFaceRequest, IdentifyFaceResponse
+    VerifyFaceParams, VerifyFaceRequest, VerifyFaceResponse,
+    RegisterFaceParams, RegisterFaceRequest, RegisterFaceResponse,
+    IdentifyFaceParams, IdentifyFaceRequest, IdentifyFaceResponse,
+    IdentifyBatchRequest, IdentifyBatchResult, IdentifyCandidate,
+    BulkEnrollRecord, BulkEnrollResult
 )
-from database import engine, get_db
+import database
+from database import engine, get_async_db, get_db, SessionLocal
 import db_models
+import face_repository
+import vector_store
 from sqlalchemy.orm import Session
 from fastapi import Depends
 
-# Create tables
+# Pick the gallery backend before the faces table is touched, then create tables
+vector_store.configure(engine)
 db_models.Base.metadata.create_all(bind=engine)
-from liveness import anti_spoof_check
-from utils import decode_base64_frame, calculate_frame_sharpness, cosine_similarity
-
-try:
-    from insightface.app import FaceAnalysis
-except ImportError:
-    print("⚠️ InsightFace not found. Using MockModel.")
-    class FaceAnalysis:
-        def __init__(self, name, providers): pass
-        def prepare(self, ctx_id, det_size): pass
-        def get(self, img):
-            # Return dummy face with embedding
-            class Face:
-                def __init__(self):
-                    self.embedding = np.random.rand(512).astype(np.float32)
-                    self.det_score = 0.99
-            return [Face()]
-
-# Initialize Rate Limiter
-limiter = Limiter(key_func=get_remote_address)
+if vector_store.pgvector_enabled():
+    vector_store.migrate_embeddings(engine)
+# Session for the register/identify/delete endpoints: AsyncSession with DB_ASYNC=1
+db_session = get_async_db if database.DB_ASYNC else get_db
+from liveness import LivenessAccumulator, anti_spoof_check
+from constants import MatchThreshold
+from utils import cosine_similarity
+from frames import Frame, decode_frames, decode_images, decode_thumbnails, select_best_face
+from frame_cache import frame_cache
+from frame_quality import detection_waves, is_good_enough
+import tracking
+from uploads import IngestStreamingResponse, iter_ndjson, read_frame_upload
+from pydantic import ValidationError
+from inference import DETECTION_FULL_SIZE, InferenceScheduler, detection_size, run_batch
+import executor
+from executor import decode_stage, liveness_stage, inference_stage, db_stage
+import metrics
+from metrics import timed
+from face_index import EMBEDDING_DIM, face_index
+import model
+
+# Probes embedded and matched together per streamed block of /faces/identify-batch
+IDENTIFY_BATCH_BLOCK_SIZE = int(os.getenv("IDENTIFY_BATCH_BLOCK_SIZE", "64"))
+IDENTIFY_BATCH_MAX_PROBES = int(os.getenv("IDENTIFY_BATCH_MAX_PROBES", "1000"))
+# Records per batched upsert of /faces/register-bulk
+BULK_ENROLL_BATCH_SIZE = int(os.getenv("BULK_ENROLL_BATCH_SIZE", "500"))
+
+# Streaming sessions (/verify-face/stream, /faces/identify/stream): frames accepted per
+# session, seconds to wait for the next message, and frames detected at the same time
+STREAM_MAX_FRAMES = int(os.getenv("STREAM_MAX_FRAMES", "30"))
+STREAM_IDLE_TIMEOUT_SECONDS = float(os.getenv("STREAM_IDLE_TIMEOUT_SECONDS", "10"))
+STREAM_MAX_PENDING_DETECTIONS = int(os.getenv("STREAM_MAX_PENDING_DETECTIONS", "2"))
+
+# Frame sets of batch/bulk requests being decoded and embedded at the same time
+# (bounds the decoded frames held in memory)
+batch_extract_slots = asyncio.Semaphore(inference_stage.concurrency)
+
+# Initialize Rate Limiter (RATE_LIMIT_ENABLED=0 disables it, e.g. for load tests)
+limiter = Limiter(key_func=get_remote_address, enabled=os.getenv("RATE_LIMIT_ENABLED", "1") != "0")
 
 app = FastAPI(
     title="Face Service API",
@@ -53,7 +80,13 @@ app = FastAPI(
 
 # Register Rate Limit Exception handler
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app.add_middleware(metrics.MetricsMiddleware)
+
+def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    metrics.RATE_LIMITED.labels(metrics.route_name(request.scope)).inc()
+    return _rate_limit_exceeded_handler(request, exc)
+
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -72,37 +105,272 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": errors},
     )
 
-# Initialize face analysis model
-face_app = None
+# Initialize face analysis model (here when preloaded, shared by the forked workers)
+face_app = model.load_face_app(for_fork=True) if model.PRELOAD else None
+inference_scheduler = None
+# Set once the model, inference worker and gallery of this process are up
+ready = False
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the face analysis model on startup."""
-    global face_app
-    face_app = FaceAnalysis(
-        name="buffalo_s",  # Lightweight model (~30MB)
-        providers=['CPUExecutionProvider']
+    global face_app, inference_scheduler, ready
+    if face_app is None:
+        face_app = model.load_face_app()
+
+    # Threads do not survive fork, so every worker starts its own inference worker
+    inference_scheduler = InferenceScheduler(
+        lambda images, det_sizes, located: run_batch(face_app, images, det_sizes, located)
+    )
+    inference_scheduler.start()
+
+    load_face_gallery()
+    ready = True
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global ready
+    ready = False
+    if inference_scheduler is not None:
+        inference_scheduler.stop()
+    executor.shutdown()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
+async def run_db(fn, db, *args, **kwargs):
+    """
+    Run a repository function taking a Session: on the async engine's connection
+    (db is an AsyncSession from db_session) with DB_ASYNC=1, otherwise on the db
+    stage's threads.
+    """
+    if database.DB_ASYNC:
+        return await db.run_sync(fn, *args, **kwargs)
+    return await db_stage.run(fn, db, *args, **kwargs)
+
+def load_face_gallery():
+    """Load registered embeddings into the gallery backend (no-op for pgvector)."""
+    db = SessionLocal()
+    try:
+        count = vector_store.gallery.load(db, db_models.Face)
+    finally:
+        db.close()
+    if vector_store.gallery.name == "numpy":
+        metrics.INDEX_SIZE.set_function(lambda: len(face_index))
+        metrics.INDEX_BYTES.set_function(face_index.nbytes)
+        print(f"✅ Face gallery ready (numpy/{face_index.precision}, {count} faces, "
+              f"{face_index.nbytes() / 2**20:.1f} MiB)")
+        return
+    metrics.INDEX_SIZE.set(count)
+    print(f"✅ Face gallery ready ({vector_store.gallery.name}, {count} faces)")
+
+async def load_frames(raw_frames, skip_invalid: bool = False):
+    """
+    Frames of a request with thumbnails taken from the frame cache; only frames not
+    seen recently are decoded (on the decode stage) and their thumbnails cached.
+    """
+    keys = frame_cache.keys(raw_frames)
+    frames, missing = [], []
+    for idx, (raw, key) in enumerate(zip(raw_frames, keys)):
+        thumbnail = frame_cache.get_thumbnail(key)
+        if thumbnail is None:
+            missing.append(idx)
+        else:
+            frames.append(Frame(idx, raw=raw, key=key, thumbnail=thumbnail))
+
+    if missing:
+        with timed("decode"):
+            decoded = await decode_stage.run(
+                decode_frames, [raw_frames[i] for i in missing], skip_invalid=skip_invalid, thumbnails=True,
+            )
+        for frame in decoded:
+            frame.index = missing[frame.index]
+            frame.raw, frame.key = raw_frames[frame.index], keys[frame.index]
+            frame_cache.put_thumbnail(frame.key, frame.thumbnail)
+            frames.append(frame)
+        frames.sort(key=lambda f: f.index)
+    return frames
+
+async def load_thumbnails(raw_frames):
+    """Liveness thumbnails of a request, from the frame cache or decoded at reduced scale."""
+    keys = frame_cache.keys(raw_frames)
+    thumbnails = [frame_cache.get_thumbnail(key) for key in keys]
+    missing = [idx for idx, thumbnail in enumerate(thumbnails) if thumbnail is None]
+    if missing:
+        with timed("decode"):
+            decoded = await decode_stage.run(decode_thumbnails, [raw_frames[i] for i in missing])
+        for idx, thumbnail in zip(missing, decoded):
+            thumbnails[idx] = thumbnail
+            frame_cache.put_thumbnail(keys[idx], thumbnail)
+    return thumbnails
+
+async def detect_faces(frames, det_size: int = DETECTION_FULL_SIZE):
+    """
+    Detections for each frame at det_size: cached results first, the rest through the
+    batching scheduler (decoding frames restored from the cache without their image).
+    """
+    detections = [frame_cache.get_faces(f.key, det_size) for f in frames]
+    pending = [f for f, faces in zip(frames, detections) if faces is None]
+    if not pending:
+        return detections
+
+    await decode_missing_images(pending)
+
+    with timed("inference"):
+        results = await inference_scheduler.detect_many(
+            [f.image for f in pending], return_exceptions=True, det_size=det_size,
+        )
+    metrics.FACES_DETECTED.inc(sum(len(r) for r in results if not isinstance(r, Exception)))
+
+    by_frame = {}
+    for frame, result in zip(pending, results):
+        if isinstance(result, Exception):
+            # Not cached, so a transient failure is retried by the next request
+            result = []
+        else:
+            frame_cache.put_faces(frame.key, result, det_size)
+        by_frame[id(frame)] = result
+    return [faces if faces is not None else by_frame[id(f)] for f, faces in zip(frames, detections)]
+
+async def decode_missing_images(frames):
+    """Decode the full images of frames restored from the frame cache without one."""
+    undecoded = [f for f in frames if f.image is None]
+    if undecoded:
+        with timed("decode"):
+            images = await decode_stage.run(decode_images, [f.raw for f in undecoded])
+        for frame, image in zip(undecoded, images):
+            frame.image = image
+
+async def detect_best_face(frames, pipeline: str):
+    """
+    Run inference on the best-quality frames first (through the batching scheduler)
+    and keep the best face, stopping as soon as a good enough face is found.
+    Detection runs at the pipeline's detection size; when that finds no face in any
+    frame, the frames are searched again at DETECTION_FULL_SIZE.
+    """
+    det_size = detection_size(pipeline)
+    async with inference_stage.slot():
+        best = None
+        if tracking.TRACKING_ENABLED and len(frames) >= tracking.TRACKING_MIN_FRAMES:
+            best = await track_best_face(frames, det_size)
+        if best is None:
+            best = await detect_best_face_at(frames, det_size)
+        if best is None and det_size < DETECTION_FULL_SIZE:
+            metrics.DETECTION_FALLBACKS.labels(pipeline).inc()
+            best = await detect_best_face_at(frames, DETECTION_FULL_SIZE)
+    return best
+
+async def track_best_face(frames, det_size: int):
+    """
+    Detect only on the first wave of frames (the keyframes), track that face into
+    the other frames with optical flow and embed the best-ranked tracked frames with
+    the recognition model alone. Frames tracking could not reach are detected
+    instead. Returns the keyframe and its face with the fused embedding, or None
+    when the keyframes have no trackable face.
+    """
+    keyframes = detection_waves(frames)[0]
+    key = select_best_face(keyframes, await detect_faces(keyframes, det_size))
+    if key is None or getattr(key[1], "kps", None) is None:
+        return key
+    keyframe, face = key
+
+    await decode_missing_images(frames)
+    with timed("tracking"):
+        tracks, lost = await decode_stage.run(
+            tracking.propagate, frames, keyframe.index, face.bbox, face.kps, float(face.det_score),
+        )
+    metrics.FRAMES_TRACKED.labels("tracked").inc(len(tracks))
+    metrics.FRAMES_TRACKED.labels("lost").inc(len(lost))
+
+    # Embed the best-ranked other frames: tracked ones with recognition only; lost ones
+    # are re-detected (the other keyframes are already detected and cached)
+    tracked = {t.index: t for t in tracks}
+    others = sorted((f for f in frames if f is not keyframe), key=lambda f: -f.rank_score)
+    chosen = others[:max(0, tracking.TRACKING_EMBED_FRAMES - 1)]
+    to_embed = [f for f in chosen if f.index in tracked and f not in keyframes]
+    to_detect = [f for f in chosen if f not in to_embed]
+
+    embedded, detected = await asyncio.gather(
+        inference_scheduler.embed_many([f.image for f in to_embed], [[tracked[f.index]] for f in to_embed]),
+        detect_faces(to_detect, det_size),
     )
-    face_app.prepare(ctx_id=0, det_size=(640, 640))
-    print("✅ Face analysis model loaded successfully")
+    embeddings = [faces[0].embedding for faces in embedded + detected if faces]
+    fused, _ = tracking.fuse_embeddings(face.embedding, embeddings)
+
+    fused_face = copy.copy(face)  # the keyframe face may be the frame cache's object
+    fused_face.embedding = fused
+    return keyframe, fused_face
+
+async def detect_best_face_at(frames, det_size: int):
+    best = None
+    for wave in detection_waves(frames):
+        detections = await detect_faces(wave, det_size)
+        candidate = select_best_face(wave, detections)
+        if candidate and (best is None or candidate[1].det_score > best[1].det_score):
+            best = candidate
+        if best and is_good_enough(*best):
+            break
+    return best
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "ok", "model": "buffalo_s"}
+    """Liveness: the process is up (see /ready for serving traffic)."""
+    return {"status": "ok", "model": model.MODEL_NAME, "ready": ready}
 
-@app.post("/liveness-check", response_model=LivenessCheckResponse)
-@limiter.limit("5/minute")
-async def liveness_check_endpoint(request: Request, body: LivenessCheckRequest):
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 503 until the model, inference worker and gallery are loaded."""
+    if not ready:
+        raise HTTPException(status_code=503, detail="Starting")
+    return {"status": "ready", "model": model.MODEL_NAME, "pid": os.getpid()}
+
+@app.get("/inference/stats")
+async def inference_stats():
+    """Throughput and latency of the inference worker per batch size."""
+    if inference_scheduler is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    stats = inference_scheduler.stats()
+    stats["frame_cache"] = frame_cache.stats()
+    return stats
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics (stage latency histograms, frame/face/rate-limit counters, index size)."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=503, detail="prometheus_client not installed")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.post("/compare-vectors", response_model=CompareVectorsResponse)
+async def compare_vectors_endpoint(body: CompareVectorsRequest):
+    """
+    Compare two face vectors.
+    """
+    similarity = cosine_similarity(body.vector1, body.vector2)
+    distance = 1.0 - similarity
+    
+    # Thresholds: < SAME_PERSON Same, SAME_PERSON-STEP_UP Uncertain, > STEP_UP Different
+    match = distance < MatchThreshold.SAME_PERSON
+    
+    return {
+        "similarity": float(similarity),
+        "distance": float(distance),
+        "match": match,
+        "is_same_person": match
+    }
+
+# --- Pipelines shared by the JSON and upload endpoints ---
+
+async def run_liveness_check(raw_frames, challenge_passed: bool):
     """
     Perform liveness detection on a sequence of frames.
     """
+    metrics.FRAMES_PROCESSED.labels("liveness").inc(len(raw_frames))
     try:
-        # Decode frames
-        decoded_frames = [decode_base64_frame(f) for f in body.frames]
+        # Liveness only needs thumbnails, so decode straight to reduced grayscale
+        thumbnails = await load_thumbnails(raw_frames)
         
         # Run anti-spoof check
-        is_live, score = anti_spoof_check(decoded_frames, body.challenge_passed)
+        with timed("liveness"):
+            is_live, score = await liveness_stage.run(anti_spoof_check, thumbnails, challenge_passed)
         
         return {
             "is_live": is_live,
@@ -111,86 +379,52 @@ async def liveness_check_endpoint(request: Request, body: LivenessCheckRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/extract-vector", response_model=ExtractVectorResponse)
-async def extract_vector_endpoint(body: ExtractVectorRequest):
+async def run_extract_vector(raw_frames):
     """
     Extract face embedding from the best quality frame in the list.
     """
     if face_app is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
         
-    best_vector = None
-    best_score = -1.0
-    best_idx = -1
-    
-    for idx, b64_frame in enumerate(body.frames):
-        try:
-            img = decode_base64_frame(b64_frame)
-            faces = face_app.get(img)
+    metrics.FRAMES_PROCESSED.labels("extract").inc(len(raw_frames))
+    frames = await load_frames(raw_frames, skip_invalid=True)
+    best = await detect_best_face(frames, "extract")
             
-            if len(faces) >= 1: # Modified to allow >=1 for mock
-                 # Mock returns list of 1 face
-                face = faces[0]
-                
-                # Calculate score based on detection score and image sharpness
-                # sharpness = calculate_frame_sharpness(img) 
-                # For mock, we skip sharpness or make it safe if img is dummy
-                sharpness = 100.0
-                
-                det_score = face.det_score
-                
-                # Combined quality score
-                quality_score = det_score * 100 + sharpness
-                
-                if quality_score > best_score:
-                    best_score = quality_score
-                    best_vector = face.embedding.tolist()
-                    best_idx = idx
-        except Exception as e:
-            # print(f"Extraction error: {e}") 
-            continue
-            
-    if best_vector is None:
+    if best is None:
         raise HTTPException(status_code=400, detail="No valid face detected in any frame")
         
+    frame, face = best
     return {
-        "vector": best_vector,
-        "frame_index": best_idx
-    }
-
-@app.post("/compare-vectors", response_model=CompareVectorsResponse)
-async def compare_vectors_endpoint(body: CompareVectorsRequest):
-    """
-    Compare two face vectors.
-    """
-    similarity = cosine_similarity(body.vector1, body.vector2)
-    distance = 1.0 - similarity
-    
-    # Thresholds: < 0.35 Same, 0.35-0.45 Uncertain, > 0.45 Different
-    match = distance < 0.35
-    
-    return {
-        "similarity": float(similarity),
-        "distance": float(distance),
-        "match": match,
-        "is_same_person": match
+        "vector": face.embedding.tolist(),
+        "frame_index": frame.index
     }
 
-@app.post("/verify-face", response_model=VerifyFaceResponse)
-@limiter.limit("5/minute")
-async def verify_face_endpoint(request: Request, body: VerifyFaceRequest):
+async def run_verify_face(raw_frames, challenge_passed: bool, stored_vector):
     """
     Full verification pipeline: Liveness + Recognition.
     """
+    metrics.FRAMES_PROCESSED.labels("verify").inc(len(raw_frames))
     # 1. Liveness Check
-    decoded_frames = []
     try:
-        decoded_frames = [decode_base64_frame(f) for f in body.frames]
+        frames = await load_frames(raw_frames)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Frame decode error: {str(e)}")
         
-    is_live, liveness_score = anti_spoof_check(decoded_frames, body.challenge_passed)
+    with timed("liveness"):
+        is_live, liveness_score = await liveness_stage.run(anti_spoof_check, [f.thumbnail for f in frames], challenge_passed)
     
+    if not is_live:
+        return verify_response(False, liveness_score, None, stored_vector)
+        
+    # 2. Extract Vector from the best face (reusing the frames decoded above)
+    if face_app is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    best = await detect_best_face(frames, "verify")
+    return verify_response(True, liveness_score, best, stored_vector)
+
+def verify_response(is_live: bool, liveness_score: float, best, stored_vector) -> dict:
+    """Verification decision for the liveness result and best face (or None) of a frame set."""
     if not is_live:
         return {
             "is_live": False,
@@ -200,30 +434,8 @@ async def verify_face_endpoint(request: Request, body: VerifyFaceRequest):
             "match": False,
             "decision": "DENY"
         }
-        
-    # 2. Extract Vector
-    if face_app is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
 
-    # Find best face in frames
-    best_vector = None
-    best_score = -1.0
-    
-    for b64_frame in body.frames:
-        try:
-            img = decode_base64_frame(b64_frame)
-            faces = face_app.get(img)
-            if len(faces) >= 1:
-                face = faces[0]
-                sharpness = 100.0 # calculate_frame_sharpness(img)
-                quality = face.det_score * 100 + sharpness
-                if quality > best_score:
-                    best_score = quality
-                    best_vector = face.embedding.tolist()
-        except:
-            continue
-            
-    if best_vector is None:
+    if best is None:
         return {
             "is_live": True,
             "liveness_score": liveness_score,
@@ -232,18 +444,20 @@ async def verify_face_endpoint(request: Request, body: VerifyFaceRequest):
             "match": False,
             "decision": "DENY"
         }
+    best_vector = best[1].embedding.tolist()
 
     # 3. Compare Vectors
-    similarity = cosine_similarity(best_vector, body.stored_vector)
+    with timed("similarity"):
+        similarity = cosine_similarity(best_vector, stored_vector)
     distance = 1.0 - similarity
     
     # 4. Decision Engine
-    match = distance < 0.35
+    match = distance < MatchThreshold.SAME_PERSON
     decision = "DENY"
     
     if match:
         decision = "LOGIN_SUCCESS"
-    elif 0.35 <= distance <= 0.45:
+    elif MatchThreshold.SAME_PERSON <= distance <= MatchThreshold.STEP_UP:
         decision = "REQUIRE_STEP_UP"
     else:
         decision = "DENY"
@@ -257,122 +471,93 @@ async def verify_face_endpoint(request: Request, body: VerifyFaceRequest):
         "decision": decision
     }
 
-@app.post("/faces/register", response_model=RegisterFaceResponse)
-async def register_face(body: RegisterFaceRequest, db: Session = Depends(get_db)):
+async def run_register_face(raw_frames, external_id: str, face_type: str, db: Session):
     """
     Register a face for a user/admin.
     """
     if face_app is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
 
+    metrics.FRAMES_PROCESSED.labels("register").inc(len(raw_frames))
     # 1. Extract vector from frames
-    best_vector = None
-    best_score = -1.0
-    
-    for b64_frame in body.frames:
-        try:
-            img = decode_base64_frame(b64_frame)
-            faces = face_app.get(img)
-            if len(faces) >= 1:
-                face = faces[0]
-                quality = face.det_score * 100 + 100.0 # simplified quality
-                if quality > best_score:
-                    best_score = quality
-                    best_vector = face.embedding.tolist()
-        except:
-            continue
+    frames = await load_frames(raw_frames, skip_invalid=True)
+    best = await detect_best_face(frames, "register")
             
-    if best_vector is None:
+    if best is None:
         raise HTTPException(status_code=400, detail="No face detected in registration frames")
+    best_vector = best[1].embedding.tolist()
 
-    # 2. Check if already exists
-    existing_face = db.query(db_models.Face).filter(db_models.Face.external_id == body.external_id).first()
-    if existing_face:
-        # Update existing
-        existing_face.embedding = best_vector
-        existing_face.type = body.type
-        db.commit()
-        db.refresh(existing_face)
-        return {"success": True, "face_id": existing_face.id, "external_id": existing_face.external_id}
-
-    # 3. Save new face
-    new_face = db_models.Face(
-        external_id=body.external_id,
-        type=body.type,
-        embedding=best_vector
-    )
-    db.add(new_face)
-    db.commit()
-    db.refresh(new_face)
+    # 2. Insert or update the stored face
+    with timed("db"):
+        face = await run_db(face_repository.save_face, db, external_id, face_type, best_vector)
+    vector_store.gallery.upsert(face.external_id, face.type, best_vector)
     
-    return {"success": True, "face_id": new_face.id, "external_id": new_face.external_id}
+    return {"success": True, "face_id": face.id, "external_id": face.external_id}
 
-@app.post("/faces/identify", response_model=IdentifyFaceResponse)
-async def identify_face(body: IdentifyFaceRequest, db: Session = Depends(get_db)):
+def identify_candidates(matches) -> list:
+    return [
+        IdentifyCandidate(external_id=m.external_id, type=m.type, similarity=m.similarity, distance=1.0 - m.similarity)
+        for m in matches
+    ]
+
+async def run_identify_face(raw_frames, challenge_passed: bool, db: Session,
+                            face_type: str = None, k: int = 1, threshold: float = None):
     """
-    Identify a user from frames by comparing against ALL registered faces.
+    Identify a user from frames by comparing against the registered faces
+    (only those of face_type when given). Returns the k best candidates.
     """
     if face_app is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
         
+    metrics.FRAMES_PROCESSED.labels("identify").inc(len(raw_frames))
     # 1. Liveness Check (Optional but recommended)
-    decoded_frames = []
     try:
-        decoded_frames = [decode_base64_frame(f) for f in body.frames]
-        is_live, liveness_score = anti_spoof_check(decoded_frames, body.challenge_passed)
+        frames = await load_frames(raw_frames)
+        with timed("liveness"):
+            is_live, liveness_score = await liveness_stage.run(anti_spoof_check, [f.thumbnail for f in frames], challenge_passed)
         if not is_live:
-             return {
-                "success": False,
-                "is_live": False,
-                "similarity": 0.0,
-                "distance": 1.0
-            }
+            return await identify_response(False, None, db)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
     # 2. Extract Vector
-    best_vector = None
-    best_score = -1.0
-    
-    for idx, img in enumerate(decoded_frames):
-        try:
-            faces = face_app.get(img)
-            if len(faces) >= 1:
-                face = faces[0]
-                quality = face.det_score
-                if quality > best_score:
-                    best_score = quality
-                    best_vector = face.embedding.tolist()
-        except:
-            continue
+    best = await detect_best_face(frames, "identify")
+    return await identify_response(True, best, db, face_type, k, threshold)
+
+async def identify_response(is_live: bool, best, db: Session, face_type: str = None, k: int = 1,
+                            threshold: float = None) -> dict:
+    """Identification result for the liveness result and best face (or None) of a frame set."""
+    if not is_live:
+        return {
+            "success": False,
+            "is_live": False,
+            "similarity": 0.0,
+            "distance": 1.0
+        }
 
-    if best_vector is None:
+    if best is None:
         return {
             "success": False,
             "is_live": True,
             "similarity": 0.0,
             "distance": 1.0
         }
+    best_vector = best[1].embedding.tolist()
 
-    # 3. Match against DB (Linear Scan for now)
-    # TODO: Use PgVector for efficiency
-    all_faces = db.query(db_models.Face).all()
-    
-    best_match = None
-    min_dist = 1.0
-    max_sim = 0.0
+    # 3. Nearest neighbours in the gallery (in-memory segments or pgvector ANN index)
+    with timed("gallery_search"):
+        if database.DB_ASYNC:
+            matches = await vector_store.gallery.search_async(db, best_vector, k=k, face_type=face_type)
+        else:
+            matches = await db_stage.run(vector_store.gallery.search, db, best_vector, k=k, face_type=face_type)
+    best_match = matches[0] if matches else None
     
-    for face in all_faces:
-        sim = cosine_similarity(best_vector, face.embedding)
-        dist = 1.0 - sim
-        
-        if dist < min_dist:
-            min_dist = dist
-            max_sim = sim
-            best_match = face
+    max_sim = best_match.similarity if best_match and best_match.similarity > 0 else 0.0
+    min_dist = 1.0 - max_sim
             
     # Thresholds
-    threshold = 0.35 # SAME_PERSON_THRESHOLD from constants (can be passed in)
+    if threshold is None:
+        threshold = MatchThreshold.SAME_PERSON.value
     
     if best_match and min_dist < threshold:
         return {
@@ -381,24 +566,443 @@ async def identify_face(body: IdentifyFaceRequest, db: Session = Depends(get_db)
             "type": best_match.type,
             "similarity": float(max_sim),
             "distance": float(min_dist),
-            "is_live": True
+            "is_live": True,
+            "candidates": identify_candidates(matches)
         }
         
     return {
         "success": False,
         "similarity": float(max_sim),
         "distance": float(min_dist),
-        "is_live": True
+        "is_live": True,
+        "candidates": identify_candidates(matches)
     }
 
+# --- JSON API (base64 frames) ---
+
+@app.post("/liveness-check", response_model=LivenessCheckResponse)
+@limiter.limit("5/minute")
+async def liveness_check_endpoint(request: Request, body: LivenessCheckRequest):
+    """Perform liveness detection on a sequence of frames."""
+    return await run_liveness_check(body.frames, body.challenge_passed)
+
+@app.post("/extract-vector", response_model=ExtractVectorResponse)
+async def extract_vector_endpoint(body: ExtractVectorRequest):
+    """Extract face embedding from the best quality frame in the list."""
+    return await run_extract_vector(body.frames)
+
+@app.post("/verify-face", response_model=VerifyFaceResponse)
+@limiter.limit("5/minute")
+async def verify_face_endpoint(request: Request, body: VerifyFaceRequest):
+    """Full verification pipeline: Liveness + Recognition."""
+    return await run_verify_face(body.frames, body.challenge_passed, body.stored_vector)
+
+@app.post("/faces/register", response_model=RegisterFaceResponse)
+async def register_face(body: RegisterFaceRequest, db: Session = Depends(db_session)):
+    """Register a face for a user/admin."""
+    return await run_register_face(body.frames, body.external_id, body.type, db)
+
+@app.post("/faces/identify", response_model=IdentifyFaceResponse)
+async def identify_face(body: IdentifyFaceRequest, db: Session = Depends(db_session)):
+    """Identify a user from frames by comparing against all registered faces."""
+    return await run_identify_face(body.frames, body.challenge_passed, db, body.type, body.k, body.threshold)
+
+# --- Batch API ---
+
+async def record_embedding(record, pipeline: str):
+    """Embedding of a batch/bulk record: its `vector`, or extracted from its `frames`."""
+    if record.vector is not None:
+        if len(record.vector) != EMBEDDING_DIM:
+            raise ValueError(f"vector must have {EMBEDDING_DIM} dimensions")
+        return record.vector
+    if record.frames:
+        metrics.FRAMES_PROCESSED.labels(pipeline).inc(len(record.frames))
+        async with batch_extract_slots:
+            frames = await load_frames(record.frames, skip_invalid=True)
+            best = await detect_best_face(frames, pipeline)
+        if best is None:
+            raise ValueError("No valid face detected in any frame")
+        return best[1].embedding.tolist()
+    raise ValueError("record needs a vector or frames")
+
+def identify_batch_result(index: int, probe, matches, threshold: float) -> IdentifyBatchResult:
+    candidates = identify_candidates(matches)
+    result = IdentifyBatchResult(probe=index, id=probe.id, success=False, candidates=candidates)
+    if candidates:
+        best = candidates[0]
+        result.similarity, result.distance = best.similarity, best.distance
+        if best.distance < threshold:
+            result.success, result.external_id, result.type = True, best.external_id, best.type
+    return result
+
+@app.post("/faces/identify-batch", response_class=StreamingResponse)
+async def identify_batch(body: IdentifyBatchRequest):
+    """
+    Identify many probes (embeddings or frame sets) against the gallery.
+    Probes are processed in blocks of IDENTIFY_BATCH_BLOCK_SIZE: embeddings are
+    extracted concurrently and the whole block is scored with one blocked matrix
+    product. Results stream back as NDJSON (one IdentifyBatchResult per probe, in
+    request order) as each block finishes. No liveness check is done.
+    """
+    if len(body.probes) > IDENTIFY_BATCH_MAX_PROBES:
+        raise HTTPException(status_code=413, detail=f"At most {IDENTIFY_BATCH_MAX_PROBES} probes per request")
+    if face_app is None and any(p.vector is None for p in body.probes):
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    threshold = body.threshold if body.threshold is not None else MatchThreshold.SAME_PERSON.value
+
+    async def results():
+        db = SessionLocal()
+        try:
+            for start in range(0, len(body.probes), IDENTIFY_BATCH_BLOCK_SIZE):
+                block = body.probes[start:start + IDENTIFY_BATCH_BLOCK_SIZE]
+                embeddings = await asyncio.gather(
+                    *(record_embedding(p, "identify_batch") for p in block), return_exceptions=True,
+                )
+                valid = [i for i, e in enumerate(embeddings) if not isinstance(e, Exception)]
+                matches = []
+                if valid:
+                    with timed("gallery_search"):
+                        matches = await db_stage.run(
+                            vector_store.gallery.search_many, db, [embeddings[i] for i in valid],
+                            k=body.k, face_type=body.type,
+                        )
+                found = dict(zip(valid, matches))
+
+                lines = []
+                for i, probe in enumerate(block):
+                    if i in found:
+                        result = identify_batch_result(start + i, probe, found[i], threshold)
+                    else:
+                        result = IdentifyBatchResult(probe=start + i, id=probe.id, success=False, error=str(embeddings[i]))
+                    lines.append(result.model_dump_json() + "\n")
+                yield "".join(lines)
+        finally:
+            db.close()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+def validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc']) or 'record'}: {err['msg']}" for err in e.errors())
+
+async def parse_enroll_record(line: bytes):
+    """
+    (record, embedding) for one NDJSON line; the embedding is the exception when it
+    could not be obtained. Raises ValueError for lines that are not a valid record.
+    """
+    try:
+        record = BulkEnrollRecord.model_validate_json(line)
+    except ValidationError as e:
+        raise ValueError(validation_message(e))
+    try:
+        return record, await record_embedding(record, "bulk_enroll")
+    except Exception as e:
+        return record, e
+
+async def write_enroll_batch(db: Session, first: int, parsed: list, counts: dict) -> str:
+    """Upsert the valid records of a batch in one transaction; returns its NDJSON status lines."""
+    results, rows = [], []
+    for i, item in enumerate(parsed):
+        if isinstance(item, Exception):
+            results.append(BulkEnrollResult(record=first + i, status="error", error=str(item)))
+            continue
+        record, embedding = item
+        if isinstance(embedding, Exception):
+            results.append(BulkEnrollResult(
+                record=first + i, external_id=record.external_id, status="error", error=str(embedding),
+            ))
+            continue
+        results.append(BulkEnrollResult(record=first + i, external_id=record.external_id, status="registered"))
+        rows.append({"external_id": record.external_id, "type": record.type, "embedding": embedding})
+    if rows:
+        try:
+            with timed("db"):
+                await db_stage.run(face_repository.save_faces, db, rows)
+            for row in rows:
+                vector_store.gallery.upsert(row["external_id"], row["type"], row["embedding"])
+        except Exception as e:
+            for result in results:
+                if result.status == "registered":
+                    result.status, result.error = "error", f"Database error: {str(e)}"
+
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    return "".join(result.model_dump_json() + "\n" for result in results)
+
+@app.post("/faces/register-bulk", response_class=IngestStreamingResponse)
+async def register_faces_bulk(request: Request):
+    """
+    Bulk enrollment from a streamed NDJSON body, one BulkEnrollRecord per line.
+    Embeddings of a batch of BULK_ENROLL_BATCH_SIZE records are extracted concurrently
+    while the previous batch is upserted in a single transaction. Streams one
+    BulkEnrollResult per record (in input order), then a final summary line.
+    """
+    if face_app is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+
+    async def results():
+        db = SessionLocal()
+        counts, write, first = {}, None, 0
+        lines = iter_ndjson(request)
+        try:
+            while True:
+                batch = []
+                async for line in lines:
+                    batch.append(line)
+                    if len(batch) == BULK_ENROLL_BATCH_SIZE:
+                        break
+                if not batch:
+                    break
+                parsed = await asyncio.gather(*(parse_enroll_record(line) for line in batch), return_exceptions=True)
+                # The previous batch was being written while this one was extracted
+                if write is not None:
+                    yield await write
+                write = asyncio.create_task(write_enroll_batch(db, first, parsed, counts))
+                first += len(batch)
+            if write is not None:
+                yield await write
+                write = None
+            summary = {"done": True, "records": first, **counts}
+            yield json.dumps(summary) + "\n"
+        finally:
+            if write is not None:
+                # Client went away: let the in-flight transaction finish before closing the session
+                await asyncio.wait([write])
+            db.close()
+
+    return IngestStreamingResponse(results(), media_type="application/x-ndjson")
+
+# --- Upload API (binary frames: multipart parts or length-prefixed body) ---
+
+async def read_upload(request: Request, params_model):
+    params, raw_frames = await read_frame_upload(request, params_model)
+    if decode_stage.use_processes:
+        # Frames must be picklable to reach the decode processes
+        raw_frames = [bytes(f) for f in raw_frames]
+    return params, raw_frames
+
+@app.post("/liveness-check/upload", response_model=LivenessCheckResponse)
+@limiter.limit("5/minute")
+async def liveness_check_upload_endpoint(request: Request):
+    """Liveness check with binary frames (multipart or length-prefixed body)."""
+    params, raw_frames = await read_upload(request, LivenessCheckParams)
+    return await run_liveness_check(raw_frames, params.challenge_passed)
+
+@app.post("/extract-vector/upload", response_model=ExtractVectorResponse)
+async def extract_vector_upload_endpoint(request: Request):
+    """Vector extraction with binary frames (multipart or length-prefixed body)."""
+    _, raw_frames = await read_upload(request, ExtractVectorParams)
+    return await run_extract_vector(raw_frames)
+
+@app.post("/verify-face/upload", response_model=VerifyFaceResponse)
+@limiter.limit("5/minute")
+async def verify_face_upload_endpoint(request: Request):
+    """Face verification with binary frames (multipart or length-prefixed body)."""
+    params, raw_frames = await read_upload(request, VerifyFaceParams)
+    return await run_verify_face(raw_frames, params.challenge_passed, params.stored_vector)
+
+@app.post("/faces/register/upload", response_model=RegisterFaceResponse)
+async def register_face_upload(request: Request, db: Session = Depends(db_session)):
+    """Face registration with binary frames (multipart or length-prefixed body)."""
+    params, raw_frames = await read_upload(request, RegisterFaceParams)
+    return await run_register_face(raw_frames, params.external_id, params.type, db)
+
+@app.post("/faces/identify/upload", response_model=IdentifyFaceResponse)
+async def identify_face_upload(request: Request, db: Session = Depends(db_session)):
+    """Face identification with binary frames (multipart or length-prefixed body)."""
+    params, raw_frames = await read_upload(request, IdentifyFaceParams)
+    return await run_identify_face(raw_frames, params.challenge_passed, db, params.type, params.k, params.threshold)
+
+# --- Streaming API (WebSocket: frames sent one by one, decision as soon as it is certain) ---
+
+def stream_rate_limited(websocket: WebSocket, limit: str) -> bool:
+    """Apply an HTTP endpoint's rate limit to a streaming session (slowapi only covers HTTP routes)."""
+    if not limiter.enabled:
+        return False
+    route = metrics.route_name(websocket.scope)
+    if limiter.limiter.hit(parse_rate_limit(limit), route, get_remote_address(websocket)):
+        return False
+    metrics.RATE_LIMITED.labels(route).inc()
+    return True
+
+async def receive_stream_params(websocket: WebSocket, params_model):
+    """The JSON parameters a session starts with, or None (session closed) when invalid."""
+    try:
+        return params_model.model_validate_json(await websocket.receive_text())
+    except (ValidationError, KeyError) as e:
+        detail = validation_message(e) if isinstance(e, ValidationError) else "First message must be the JSON parameters"
+        await websocket.send_json({"event": "error", "detail": detail})
+        await websocket.close(code=1003)
+        return None
+
+async def stream_frames(websocket: WebSocket):
+    """
+    Frames of a session as they arrive: binary messages are encoded images, text
+    messages base64 frames. Ends on {"end": true}, after STREAM_MAX_FRAMES frames
+    or when no message comes for STREAM_IDLE_TIMEOUT_SECONDS.
+    """
+    for _ in range(STREAM_MAX_FRAMES):
+        try:
+            message = await asyncio.wait_for(websocket.receive(), STREAM_IDLE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            return
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            yield message["bytes"]
+            continue
+        text = message.get("text") or ""
+        if text.lstrip().startswith("{"):
+            try:
+                control = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(control, dict) and control.get("end"):
+                return
+        elif text:
+            yield text
+
+async def run_stream_session(websocket: WebSocket, challenge_passed: bool, pipeline: str, respond):
+    """
+    Liveness and detection of a streamed frame set, frame by frame: each frame's
+    liveness thumbnail goes into a LivenessAccumulator and, until a good enough face
+    is found, the frame is detected while the next ones arrive. The session is decided
+    as soon as liveness passes with a good enough face (or can never pass, when the
+    challenge failed); otherwise once the stream ends, exactly like the HTTP endpoint
+    would decide the same frames. respond(is_live, liveness_score, best) builds the result.
+    """
+    accumulator = LivenessAccumulator()
+    det_size = detection_size(pipeline)
+    frames, pending = [], set()
+    best = None
+    decided = asyncio.Event()
+
+    def check_decided():
+        if best is not None and is_good_enough(*best) and accumulator.enough_frames:
+            if accumulator.result(challenge_passed)[0]:
+                decided.set()
+
+    async def detect(frame):
+        nonlocal best
+        try:
+            async with inference_stage.slot():
+                detections = await detect_faces([frame], det_size)
+        finally:
+            # The raw frame is kept; the final fallback re-decodes it if it has to
+            frame.image = None
+        candidate = select_best_face([frame], detections)
+        if candidate and (best is None or candidate[1].det_score > best[1].det_score):
+            best = candidate
+        check_decided()
+
+    async def consume():
+        async for raw in stream_frames(websocket):
+            metrics.FRAMES_PROCESSED.labels(pipeline).inc()
+            loaded = await load_frames([raw], skip_invalid=True)
+            if not loaded:
+                continue
+            frame = loaded[0]
+            frame.index = len(frames)
+            frames.append(frame)
+            with timed("liveness"):
+                accumulator.add(frame.thumbnail)
+            if (best is None or not is_good_enough(*best)) and len(pending) < STREAM_MAX_PENDING_DETECTIONS:
+                task = asyncio.create_task(detect(frame))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            else:
+                frame.image = None
+            check_decided()
+
+    consumer = asyncio.create_task(consume())
+    waiter = asyncio.create_task(decided.wait())
+    try:
+        if challenge_passed:
+            await asyncio.wait({consumer, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        early = not consumer.done()
+        if early:
+            consumer.cancel()
+        else:
+            consumer.result()  # client disconnects surface here
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        is_live, liveness_score = accumulator.result(challenge_passed)
+        if is_live and not decided.is_set():
+            # Frames skipped while detections were pending, then the full-size fallback
+            best = await detect_best_face(frames, pipeline)
+        return await respond(is_live, liveness_score, best), len(frames), early
+    finally:
+        tasks = [consumer, waiter, *pending]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def send_stream_decision(websocket: WebSocket, response_model, result):
+    response, frame_count, early = result
+    await websocket.send_json({
+        "event": "decision",
+        **response_model(**response).model_dump(mode="json"),
+        "frames_received": frame_count,
+        "early": early,
+    })
+    await websocket.close()
+
+@app.websocket("/verify-face/stream")
+async def verify_face_stream(websocket: WebSocket):
+    """
+    Face verification over a WebSocket: first message VerifyFaceParams as JSON, then
+    one frame per message; a decision event is sent (and the socket closed) as soon as
+    the frames received so far settle it.
+    """
+    if stream_rate_limited(websocket, "5/minute"):
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    params = await receive_stream_params(websocket, VerifyFaceParams)
+    if params is None:
+        return
+    if face_app is None:
+        await websocket.close(code=1013)
+        return
+
+    async def respond(is_live, liveness_score, best):
+        return verify_response(is_live, liveness_score, best, params.stored_vector)
+
+    try:
+        result = await run_stream_session(websocket, params.challenge_passed, "verify", respond)
+        await send_stream_decision(websocket, VerifyFaceResponse, result)
+    except WebSocketDisconnect:
+        pass
+
+@app.websocket("/faces/identify/stream")
+async def identify_face_stream(websocket: WebSocket, db: Session = Depends(db_session)):
+    """Face identification over a WebSocket (same protocol as /verify-face/stream, IdentifyFaceParams)."""
+    await websocket.accept()
+    params = await receive_stream_params(websocket, IdentifyFaceParams)
+    if params is None:
+        return
+    if face_app is None:
+        await websocket.close(code=1013)
+        return
+
+    async def respond(is_live, liveness_score, best):
+        return await identify_response(is_live, best, db, params.type, params.k, params.threshold)
+
+    try:
+        result = await run_stream_session(websocket, params.challenge_passed, "identify", respond)
+        await send_stream_decision(websocket, IdentifyFaceResponse, result)
+    except WebSocketDisconnect:
+        pass
+
 @app.delete("/faces/{external_id}")
-async def delete_face(external_id: str, db: Session = Depends(get_db)):
-    face = db.query(db_models.Face).filter(db_models.Face.external_id == external_id).first()
-    if not face:
+async def delete_face(external_id: str, db: Session = Depends(db_session)):
+    with timed("db"):
+        deleted = await run_db(face_repository.delete_face, db, external_id)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Face not found")
     
-    db.delete(face)
-    db.commit()
+    vector_store.gallery.remove(external_id)
     return {"success": True, "deleted_id": external_id}
 
 if __name__ == "__main__":
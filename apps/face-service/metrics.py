@@ -0,0 +1,130 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+except ImportError:
+    print("⚠️ prometheus_client not found. Metrics are disabled.")
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    generate_latest = None
+
+    class _NoopMetric:
+        def __init__(self, *args, **kwargs): pass
+        def labels(self, *args, **kwargs): return self
+        def observe(self, amount): pass
+        def inc(self, amount=1): pass
+        def dec(self, amount=1): pass
+        def set(self, value): pass
+        def set_function(self, fn): pass
+
+    Counter = Gauge = Histogram = _NoopMetric
+
+METRICS_ENABLED = generate_latest is not None
+# Add a Server-Timing header with the per-stage breakdown to every response
+SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "0") == "1"
+
+# 1ms .. 10s, the range between a cached lookup and a slow batch on CPU
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_SECONDS = Histogram(
+    "face_service_request_seconds", "Request latency per route",
+    ["route", "method", "status"], buckets=_LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "face_service_stage_seconds", "Time spent in each pipeline stage",
+    ["stage"], buckets=_LATENCY_BUCKETS,
+)
+STAGE_WAIT_SECONDS = Histogram(
+    "face_service_stage_wait_seconds", "Time spent waiting for a free slot on an executor stage",
+    ["stage"], buckets=_LATENCY_BUCKETS,
+)
+FRAMES_PROCESSED = Counter("face_service_frames_processed_total", "Frames received per pipeline", ["pipeline"])
+FACES_DETECTED = Counter("face_service_faces_detected_total", "Faces returned by the detector")
+FRAMES_TRACKED = Counter(
+    "face_service_frames_tracked_total", "Frames the keyframe face was tracked into (or lost)", ["result"],
+)
+DETECTION_FALLBACKS = Counter(
+    "face_service_detection_fallbacks_total", "Frame sets re-detected at full size after the pipeline's size found no face",
+    ["pipeline"],
+)
+RATE_LIMITED = Counter("face_service_rate_limited_total", "Requests rejected by the rate limiter", ["route"])
+FRAME_CACHE_LOOKUPS = Counter(
+    "face_service_frame_cache_lookups_total", "Frame cache lookups", ["kind", "result"],
+)
+INDEX_SIZE = Gauge("face_service_index_size", "Faces in the identification gallery")
+INDEX_BYTES = Gauge("face_service_index_bytes", "Memory held by the in-memory gallery embeddings")
+
+# Stage durations of the current request (None outside a request)
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str):
+    """Record the duration of the enclosed block under `stage`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route and, with
+    METRICS_SERVER_TIMING=1, returning the stage breakdown as a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if SERVER_TIMING:
+                    header = server_timing_header(timings, time.perf_counter() - started)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_timings.reset(token)
+            REQUEST_SECONDS.labels(route_name(scope), scope["method"], str(status[0])).observe(
+                time.perf_counter() - started
+            )
+
+
+def route_name(scope) -> str:
+    # Route template (e.g. /faces/{external_id}) keeps the label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def render() -> bytes:
+    return generate_latest()
@@ -0,0 +1,123 @@
+import os
+import time
+
+import numpy as np
+
+from inference import DETECTION_FULL_SIZE, DETECTION_SIZES
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    from insightface.app import FaceAnalysis
+except ImportError:
+    print("⚠️ InsightFace not found. Using MockModel.")
+    class FaceAnalysis:
+        def __init__(self, name, providers, **kwargs): pass
+        def prepare(self, ctx_id, det_size): pass
+        def get(self, img):
+            # Return dummy face with embedding
+            class Face:
+                def __init__(self):
+                    self.embedding = np.random.rand(512).astype(np.float32)
+                    self.det_score = 0.99
+            return [Face()]
+
+MODEL_NAME = os.getenv("FACE_MODEL_NAME", "buffalo_s")  # Lightweight model (~30MB)
+# Only the models run_batch uses; landmark/gender-age weights are never loaded
+MODEL_MODULES = [m for m in os.getenv("FACE_MODEL_MODULES", "detection,recognition").split(",") if m]
+# FACE_MODEL_PRELOAD=1 loads the model when main is imported, i.e. once in the gunicorn
+# master with preload_app (see gunicorn.conf.py), so workers share the weights copy-on-write
+PRELOAD = os.getenv("FACE_MODEL_PRELOAD", "0") == "1"
+
+# ONNX Runtime session options (0 = ORT default)
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "0"))
+# 'disable', 'basic', 'extended' or 'all'
+ORT_GRAPH_OPTIMIZATION = os.getenv("ORT_GRAPH_OPTIMIZATION", "all").lower()
+# 'sequential' or 'parallel' (parallel runs independent graph branches on the inter-op pool)
+ORT_EXECUTION_MODE = os.getenv("ORT_EXECUTION_MODE", "sequential").lower()
+
+
+def session_options(for_fork: bool = False):
+    """
+    ONNX Runtime SessionOptions from the ORT_* settings (None without onnxruntime).
+    ORT thread pools do not survive fork(), so sessions created before forking
+    run single-threaded and sequential; parallelism comes from the workers.
+    """
+    if ort is None:
+        return None
+    levels = {
+        "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }
+    options = ort.SessionOptions()
+    options.graph_optimization_level = levels.get(ORT_GRAPH_OPTIMIZATION, ort.GraphOptimizationLevel.ORT_ENABLE_ALL)
+    intra, inter, mode = ORT_INTRA_OP_THREADS, ORT_INTER_OP_THREADS, ORT_EXECUTION_MODE
+    if for_fork:
+        if intra > 1 or mode != "sequential":
+            print("⚠️ Preloaded model: using 1 intra-op thread and sequential execution (ORT pools are not fork-safe)")
+        intra, mode = 1, "sequential"
+    if intra:
+        options.intra_op_num_threads = intra
+    if inter:
+        options.inter_op_num_threads = inter
+    options.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL if mode == "parallel" else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    return options
+
+
+def apply_session_options(face_app, options) -> None:
+    """
+    Rebuild the ORT session of every loaded model with `options`. insightface's
+    model_zoo only forwards providers/provider_options, so SessionOptions passed
+    to FaceAnalysis never reach the sessions.
+    """
+    for model in getattr(face_app, "models", {}).values():
+        session = getattr(model, "session", None)
+        if session is None:
+            continue
+        model.session = type(session)(model.model_file, sess_options=options, providers=session.get_providers())
+
+
+def check_session_options(face_app, options) -> None:
+    """Raise if a model session runs with other thread/graph settings than `options`."""
+    for name, model in getattr(face_app, "models", {}).items():
+        session = getattr(model, "session", None)
+        if session is None:
+            continue
+        actual = session.get_session_options()
+        for setting in ("intra_op_num_threads", "inter_op_num_threads", "execution_mode", "graph_optimization_level"):
+            if getattr(actual, setting) != getattr(options, setting):
+                raise RuntimeError(
+                    f"{name} session has {setting}={getattr(actual, setting)}, expected {getattr(options, setting)}"
+                )
+
+
+def load_face_app(for_fork: bool = False):
+    """
+    Build, prepare (at DETECTION_FULL_SIZE) and warm up the FaceAnalysis model,
+    including the detector at every per-pipeline detection size.
+    """
+    det_size = (DETECTION_FULL_SIZE, DETECTION_FULL_SIZE)
+    started = time.perf_counter()
+    face_app = FaceAnalysis(name=MODEL_NAME, providers=['CPUExecutionProvider'], allowed_modules=MODEL_MODULES)
+    options = session_options(for_fork)
+    if options is not None:
+        apply_session_options(face_app, options)
+        check_session_options(face_app, options)
+    face_app.prepare(ctx_id=0, det_size=det_size)
+    # First run allocates the ORT buffers; do it now rather than on the first request
+    blank = np.zeros((DETECTION_FULL_SIZE, DETECTION_FULL_SIZE, 3), dtype=np.uint8)
+    face_app.get(blank)
+    det_model = getattr(face_app, "det_model", None)
+    if det_model is not None:
+        for size in sorted(set(DETECTION_SIZES.values()) - {DETECTION_FULL_SIZE}):
+            det_model.detect(blank, input_size=(size, size), max_num=0, metric="default")
+    print(f"✅ Face analysis model loaded successfully ({time.perf_counter() - started:.1f}s)")
+    return face_app
@@ -1,17 +1,27 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
+# Endpoints that take frames exist twice: a JSON API with base64 `frames`
+# (the *Request models) and an upload API where frames travel as binary
+# multipart parts or a length-prefixed body and only the *Params are sent
+# as form fields / JSON metadata.
+
 # --- Liveness Schemas ---
-class LivenessCheckRequest(BaseModel):
-    frames: List[str]
+class LivenessCheckParams(BaseModel):
     challenge_passed: bool
 
+class LivenessCheckRequest(LivenessCheckParams):
+    frames: List[str]
+
 class LivenessCheckResponse(BaseModel):
     is_live: bool
     liveness_score: float
 
 # --- Vector Schemas ---
-class ExtractVectorRequest(BaseModel):
+class ExtractVectorParams(BaseModel):
+    pass
+
+class ExtractVectorRequest(ExtractVectorParams):
     frames: List[str]
 
 class ExtractVectorResponse(BaseModel):
@@ -29,11 +39,13 @@ class CompareVectorsResponse(BaseModel):
     is_same_person: bool
 
 # --- Verification Schemas ---
-class VerifyFaceRequest(BaseModel):
-    frames: List[str]
+class VerifyFaceParams(BaseModel):
     challenge_passed: bool
     stored_vector: List[float]
 
+class VerifyFaceRequest(VerifyFaceParams):
+    frames: List[str]
+
 class VerifyFaceResponse(BaseModel):
     is_live: bool
     liveness_score: float
@@ -43,19 +55,32 @@ class VerifyFaceResponse(BaseModel):
     decision: str
 
 # --- NEW: Stateful Schemas ---
-class RegisterFaceRequest(BaseModel):
-    frames: List[str]
+class RegisterFaceParams(BaseModel):
     external_id: str
     type: str  # 'USER' or 'ADMIN'
 
+class RegisterFaceRequest(RegisterFaceParams):
+    frames: List[str]
+
 class RegisterFaceResponse(BaseModel):
     success: bool
     face_id: str
     external_id: str
 
-class IdentifyFaceRequest(BaseModel):
-    frames: List[str]
+class IdentifyFaceParams(BaseModel):
     challenge_passed: bool = True # Default to True for simple identify, or require liveness
+    type: Optional[str] = None  # Only search faces of this type ('USER' or 'ADMIN')
+    k: int = Field(1, ge=1, le=100)  # Candidates to return
+    threshold: Optional[float] = Field(None, ge=0.0, le=2.0)  # Max match distance (default MatchThreshold.SAME_PERSON)
+
+class IdentifyFaceRequest(IdentifyFaceParams):
+    frames: List[str]
+
+class IdentifyCandidate(BaseModel):
+    external_id: str
+    type: str
+    similarity: float
+    distance: float
 
 class IdentifyFaceResponse(BaseModel):
     success: bool
@@ -64,3 +89,43 @@ class IdentifyFaceResponse(BaseModel):
     similarity: float
     distance: float
     is_live: bool
+    candidates: List[IdentifyCandidate] = []  # Top-k gallery faces, best first
+
+# --- Batch Identification Schemas ---
+class IdentifyProbe(BaseModel):
+    id: Optional[str] = None  # Echoed back to correlate results
+    vector: Optional[List[float]] = None  # Precomputed embedding, or
+    frames: Optional[List[str]] = None  # base64 frames to extract it from
+
+class IdentifyBatchRequest(BaseModel):
+    probes: List[IdentifyProbe]
+    type: Optional[str] = None
+    k: int = Field(1, ge=1, le=100)
+    threshold: Optional[float] = Field(None, ge=0.0, le=2.0)
+
+class IdentifyBatchResult(BaseModel):
+    """One NDJSON line of the /faces/identify-batch response."""
+    probe: int
+    id: Optional[str] = None
+    success: bool
+    external_id: Optional[str] = None
+    type: Optional[str] = None
+    similarity: float = 0.0
+    distance: float = 1.0
+    candidates: List[IdentifyCandidate] = []
+    error: Optional[str] = None
+
+# --- Bulk Enrollment Schemas ---
+class BulkEnrollRecord(BaseModel):
+    """One NDJSON line of the /faces/register-bulk request."""
+    external_id: str
+    type: str  # 'USER' or 'ADMIN'
+    vector: Optional[List[float]] = None  # Precomputed embedding, or
+    frames: Optional[List[str]] = None  # base64 frames to extract it from
+
+class BulkEnrollResult(BaseModel):
+    """One NDJSON line of the /faces/register-bulk response."""
+    record: int
+    external_id: Optional[str] = None
+    status: str  # 'registered' or 'error'
+    error: Optional[str] = None
@@ -1,6 +1,7 @@
 import requests
 import base64
 import json
+import struct
 import time
 
 BASE_URL = "http://localhost:8000"
@@ -45,8 +46,44 @@ def test_extract():
     except Exception as e:
         print(f"Extract Failed: {e}")
 
+def test_liveness_upload():
+    dummy_img = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAoAAAAKCAQAAAAnOwc2AAAAEUlEQVR42mNk+M+AARiHjAAAtx8F/mZ9TtUAAAAASUVORK5CYII=")
+    # Length-prefixed body: JSON params record, then one record per frame
+    records = [json.dumps({"challenge_passed": True}).encode()] + [dummy_img] * 10
+    body = b"".join(struct.pack(">I", len(r)) + r for r in records)
+    try:
+        r = requests.post(
+            f"{BASE_URL}/liveness-check/upload",
+            data=body,
+            headers={"Content-Type": "application/x-face-frames"}
+        )
+        print(f"Liveness Upload ({r.url}): {r.status_code}")
+        print(f"Response: {r.text if r.status_code != 200 else r.json()}")
+    except Exception as e:
+        print(f"Liveness Upload Failed: {e}")
+
+def test_register_bulk():
+    # NDJSON body, one record per line; the response streams one status line per record
+    records = [
+        {"external_id": f"bulk-test-{i}", "type": "USER", "vector": [0.01 * (i + 1)] * 512}
+        for i in range(3)
+    ]
+    body = "\n".join(json.dumps(r) for r in records)
+    try:
+        r = requests.post(
+            f"{BASE_URL}/faces/register-bulk",
+            data=body,
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        print(f"Register Bulk ({r.url}): {r.status_code}")
+        print(f"Response: {r.text}")
+    except Exception as e:
+        print(f"Register Bulk Failed: {e}")
+
 if __name__ == "__main__":
     print("Running tests...")
     test_health()
     test_liveness()
     test_extract()
+    test_liveness_upload()
+    test_register_bulk()
@@ -0,0 +1,116 @@
+"""
+Embedding round trip through the async engine (DB_ASYNC=1), the way the
+register/identify endpoints use it:
+
+    cd apps/face-service && python -m pytest test_database.py
+
+Runs against a temporary SQLite file (aiosqlite); set FACE_TEST_DATABASE_URL to a
+Postgres database with the pgvector extension to exercise asyncpg and the
+pgvector gallery (test rows are written to its faces table and removed after).
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+EXTERNAL_IDS = ["test-database-0", "test-database-1", "test-database-2"]
+
+
+@pytest.fixture(scope="module")
+def modules():
+    url = os.getenv("FACE_TEST_DATABASE_URL")
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp()}/faces.db"
+    elif url.startswith("postgres"):
+        pytest.importorskip("asyncpg")
+    # database and vector_store read their settings on import
+    os.environ.update(DATABASE_URL=url, DB_ASYNC="1", FACE_VECTOR_BACKEND="pgvector")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import database
+    import db_models
+    import face_repository
+    import vector_store
+
+    vector_store.configure(database.engine)
+    db_models.Base.metadata.create_all(bind=database.engine)
+    if vector_store.pgvector_enabled():
+        vector_store.migrate_embeddings(database.engine)
+    yield database, db_models, face_repository, vector_store
+
+    with database.SessionLocal() as db:
+        db.query(db_models.Face).filter(db_models.Face.external_id.in_(EXTERNAL_IDS)).delete()
+        db.commit()
+
+
+def test_embedding_round_trips_through_async_engine(modules):
+    database, db_models, face_repository, vector_store = modules
+    rng = np.random.default_rng(0)
+    embeddings = [rng.standard_normal(512).astype(np.float32) for _ in EXTERNAL_IDS]
+    embeddings = [(e / np.linalg.norm(e)).tolist() for e in embeddings]
+
+    async def round_trip():
+        async with database.AsyncSessionLocal() as db:
+            # /faces/register and /faces/register-bulk
+            await db.run_sync(face_repository.save_face, EXTERNAL_IDS[0], "USER", embeddings[0])
+            await db.run_sync(face_repository.save_faces, [
+                {"external_id": external_id, "type": "ADMIN", "embedding": embedding}
+                for external_id, embedding in zip(EXTERNAL_IDS[1:], embeddings[1:])
+            ])
+            stored = dict((await db.execute(
+                db_models.Face.__table__.select()
+                .with_only_columns(db_models.Face.external_id, db_models.Face.embedding)
+                .where(db_models.Face.external_id.in_(EXTERNAL_IDS))
+            )).all())
+            matches = None
+            if vector_store.pgvector_enabled():
+                # /faces/identify
+                matches = await vector_store.gallery.search_async(db, embeddings[1], k=1, face_type="ADMIN")
+        await database.async_engine.dispose()
+        return stored, matches
+
+    stored, matches = asyncio.run(round_trip())
+
+    assert sorted(stored) == EXTERNAL_IDS
+    for external_id, embedding in zip(EXTERNAL_IDS, embeddings):
+        np.testing.assert_allclose(np.asarray(stored[external_id], dtype=np.float32), embedding, atol=1e-6)
+    if matches is not None:
+        assert [match.external_id for match in matches] == [EXTERNAL_IDS[1]]
+        assert matches[0].similarity == pytest.approx(1.0, abs=1e-5)
+
+
+class RecordingSession:
+    """Session stand-in that keeps the SQL and parameters of every statement."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append((str(statement), params or {}))
+        return self
+
+    def all(self):
+        return []
+
+
+def test_pgvector_type_filter_is_inlined_for_known_types(modules):
+    vector_store = modules[3]
+    pytest.importorskip("pgvector")
+    probe = np.ones(512, dtype=np.float32)
+
+    db = RecordingSession()
+    vector_store.PgVectorGallery().search(db, probe, k=5, face_type="ADMIN")
+    sql, params = db.statements[-1]
+    # A literal lets the planner pick the partial index ix_faces_embedding_*_admin
+    assert "WHERE type = 'ADMIN'" in sql and "face_type" not in params
+
+    db = RecordingSession()
+    vector_store.PgVectorGallery().search(db, probe, k=5, face_type="x' OR '1'='1")
+    sql, params = db.statements[-1]
+    assert "WHERE type = :face_type" in sql and params["face_type"] == "x' OR '1'='1"
+
+    db = RecordingSession()
+    vector_store.PgVectorGallery().search(db, probe, k=5)
+    assert "WHERE" not in db.statements[-1][0]
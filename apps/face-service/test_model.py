@@ -0,0 +1,76 @@
+"""
+ONNX Runtime session options of the loaded models, checked on a one-node ONNX
+graph standing in for the insightface models (their sessions are rebuilt the
+same way):
+
+    cd apps/face-service && python -m pytest test_model.py
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ort = pytest.importorskip("onnxruntime")
+onnx = pytest.importorskip("onnx")
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import model  # noqa: E402
+
+
+class FakeModel:
+    def __init__(self, model_file):
+        self.model_file = model_file
+        self.session = ort.InferenceSession(model_file, providers=["CPUExecutionProvider"])
+
+
+class FakeFaceApp:
+    def __init__(self, model_file):
+        self.models = {"detection": FakeModel(model_file), "recognition": FakeModel(model_file)}
+
+
+@pytest.fixture
+def face_app(tmp_path):
+    from onnx import TensorProto, helper
+
+    graph = helper.make_graph(
+        [helper.make_node("Relu", ["x"], ["y"])], "relu",
+        [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 4])],
+        [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1, 4])],
+    )
+    onnx_model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    onnx_model.ir_version = 8
+    path = tmp_path / "relu.onnx"
+    onnx.save(onnx_model, str(path))
+    return FakeFaceApp(str(path))
+
+
+def test_preloaded_sessions_run_single_threaded_and_sequential(face_app, monkeypatch):
+    monkeypatch.setattr(model, "ORT_INTRA_OP_THREADS", 4)
+    monkeypatch.setattr(model, "ORT_EXECUTION_MODE", "parallel")
+    monkeypatch.setattr(model, "ORT_GRAPH_OPTIMIZATION", "basic")
+    options = model.session_options(for_fork=True)
+
+    with pytest.raises(RuntimeError):
+        model.check_session_options(face_app, options)
+    model.apply_session_options(face_app, options)
+    model.check_session_options(face_app, options)
+
+    for loaded in face_app.models.values():
+        actual = loaded.session.get_session_options()
+        assert actual.intra_op_num_threads == 1
+        assert actual.execution_mode == ort.ExecutionMode.ORT_SEQUENTIAL
+        assert actual.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        assert loaded.session.get_providers() == ["CPUExecutionProvider"]
+        x = np.array([[-1, 0, 1, 2]], dtype=np.float32)
+        assert loaded.session.run(None, {"x": x})[0].tolist() == [[0, 0, 1, 2]]
+
+
+def test_session_options_from_settings(monkeypatch):
+    monkeypatch.setattr(model, "ORT_INTRA_OP_THREADS", 3)
+    monkeypatch.setattr(model, "ORT_INTER_OP_THREADS", 2)
+    monkeypatch.setattr(model, "ORT_EXECUTION_MODE", "parallel")
+    options = model.session_options()
+    assert options.intra_op_num_threads == 3
+    assert options.inter_op_num_threads == 2
+    assert options.execution_mode == ort.ExecutionMode.ORT_PARALLEL
@@ -0,0 +1,101 @@
+import os
+from typing import List, NamedTuple, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# FACE_TRACKING=1: detect on the keyframes only, track the face into neighbouring frames
+TRACKING_ENABLED = os.getenv("FACE_TRACKING", "0") == "1"
+# Frame sets smaller than this go through plain detection
+TRACKING_MIN_FRAMES = int(os.getenv("FACE_TRACKING_MIN_FRAMES", "3"))
+# Frames embedded per request, keyframe included
+TRACKING_EMBED_FRAMES = int(os.getenv("FACE_TRACKING_EMBED_FRAMES", "4"))
+# Share of landmarks that must pass the forward-backward check to keep tracking
+TRACKING_MIN_CONFIDENCE = float(os.getenv("FACE_TRACKING_MIN_CONFIDENCE", "0.8"))
+# Max forward-backward error (pixels) for a landmark to count as tracked
+TRACKING_MAX_FB_ERROR = float(os.getenv("FACE_TRACKING_MAX_FB_ERROR", "1.5"))
+# Tracked embeddings less similar than this to the keyframe's are treated as drift
+TRACKING_MIN_SIMILARITY = float(os.getenv("FACE_TRACKING_MIN_SIMILARITY", "0.5"))
+
+_LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+)
+
+
+class Track(NamedTuple):
+    index: int            # Frame.index the face was tracked into
+    bbox: np.ndarray      # x1, y1, x2, y2
+    kps: np.ndarray       # 5 x 2 landmarks (what recognition aligns on)
+    det_score: float      # keyframe det_score scaled by the tracking confidence
+
+
+def track_points(prev_gray: np.ndarray, next_gray: np.ndarray, points: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Move points from prev_gray to next_gray with pyramidal Lucas-Kanade flow.
+    Confidence is the share of points that track forward and back to within
+    TRACKING_MAX_FB_ERROR pixels of where they started.
+    """
+    p0 = points.reshape(-1, 1, 2).astype(np.float32)
+    p1, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, next_gray, p0, None, **_LK_PARAMS)
+    if p1 is None:
+        return points, 0.0
+    back, back_status, _ = cv2.calcOpticalFlowPyrLK(next_gray, prev_gray, p1, None, **_LK_PARAMS)
+    if back is None:
+        return points, 0.0
+    fb_error = np.linalg.norm(p0 - back, axis=2).reshape(-1)
+    good = (status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (fb_error < TRACKING_MAX_FB_ERROR)
+    return p1.reshape(-1, 2), float(good.mean())
+
+
+def propagate(frames: Sequence, keyframe_index: int, bbox: np.ndarray, kps: np.ndarray,
+              det_score: float) -> Tuple[List[Track], List[int]]:
+    """
+    Track a keyframe face through the neighbouring frames (by index, in both
+    directions), frame to frame. A direction stops at the first frame whose
+    tracking confidence is below TRACKING_MIN_CONFIDENCE.
+    Returns the tracks and the indices of the frames that were not reached.
+    """
+    ordered = sorted(frames, key=lambda f: f.index)
+    position = next(i for i, f in enumerate(ordered) if f.index == keyframe_index)
+    kps = np.asarray(kps, dtype=np.float32).reshape(-1, 2)
+    bbox = np.asarray(bbox, dtype=np.float32)
+
+    tracks, lost = [], []
+    for step in (1, -1):
+        prev, points, box = ordered[position], kps, bbox
+        i = position + step
+        while 0 <= i < len(ordered):
+            frame = ordered[i]
+            moved, confidence = track_points(prev.gray, frame.gray, points)
+            if confidence < TRACKING_MIN_CONFIDENCE:
+                lost.extend(f.index for f in (ordered[i:] if step == 1 else ordered[:i + 1]))
+                break
+            # The box has no texture of its own; it follows the landmarks
+            dx, dy = np.median(moved - points, axis=0)
+            box = box + np.array([dx, dy, dx, dy], dtype=np.float32)
+            tracks.append(Track(frame.index, box, moved, det_score * confidence))
+            prev, points = frame, moved
+            i += step
+    return tracks, lost
+
+
+def fuse_embeddings(reference: np.ndarray, embeddings: Sequence[np.ndarray]) -> Tuple[np.ndarray, int]:
+    """
+    Mean of the unit-normalized reference embedding and every embedding at least
+    TRACKING_MIN_SIMILARITY to it (others are tracking drift).
+    Returns the fused embedding (scaled to the reference's norm) and how many were used.
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    norm = float(np.linalg.norm(reference)) or 1.0
+    unit = reference / norm
+    kept = [unit]
+    for embedding in embeddings:
+        e = np.asarray(embedding, dtype=np.float32)
+        e = e / (np.linalg.norm(e) or 1.0)
+        if float(e @ unit) >= TRACKING_MIN_SIMILARITY:
+            kept.append(e)
+    fused = np.mean(kept, axis=0)
+    fused = fused / (np.linalg.norm(fused) or 1.0) * norm
+    return fused, len(kept)
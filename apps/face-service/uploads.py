@@ -0,0 +1,119 @@
+import json
+import struct
+from typing import AsyncIterator, List, Tuple, Type, TypeVar
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+from frames import RawFrame
+
+# Length-prefixed body: a sequence of records, each a 4-byte big-endian length
+# followed by that many bytes. The first record is the UTF-8 JSON params object,
+# every following record is one encoded image (JPEG/PNG).
+FRAME_STREAM_CONTENT_TYPE = "application/x-face-frames"
+
+_LENGTH = struct.Struct(">I")
+
+P = TypeVar("P", bound=BaseModel)
+
+
+def split_length_prefixed(body: bytes) -> List[memoryview]:
+    """
+    Split a length-prefixed body into zero-copy views of its records.
+    """
+    view = memoryview(body)
+    records = []
+    offset = 0
+    while offset < len(view):
+        if offset + _LENGTH.size > len(view):
+            raise ValueError("truncated record header")
+        (length,) = _LENGTH.unpack_from(view, offset)
+        offset += _LENGTH.size
+        if offset + length > len(view):
+            raise ValueError("truncated record")
+        records.append(view[offset:offset + length])
+        offset += length
+    return records
+
+
+def _form_value(value: str):
+    # Form fields are strings; list-valued params (stored_vector) are sent as JSON
+    stripped = value.lstrip()
+    if stripped.startswith("[") or stripped.startswith("{"):
+        return json.loads(value)
+    return value
+
+
+def _validate(params_model: Type[P], data: dict) -> P:
+    try:
+        return params_model.model_validate(data)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+async def read_frame_upload(request: Request, params_model: Type[P]) -> Tuple[P, List[RawFrame]]:
+    """
+    Read params and raw frame bytes from a multipart/form-data request (repeated `frames`
+    file parts plus form fields) or a length-prefixed FRAME_STREAM_CONTENT_TYPE body.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        fields, frames = {}, []
+        for key, value in form.multi_items():
+            if isinstance(value, str):
+                try:
+                    fields[key] = _form_value(value)
+                except ValueError:
+                    raise HTTPException(status_code=400, detail=f"Field '{key}' is not valid JSON")
+            elif key == "frames":
+                frames.append(await value.read())
+        return _validate(params_model, fields), frames
+
+    if content_type.startswith(FRAME_STREAM_CONTENT_TYPE) or content_type.startswith("application/octet-stream"):
+        body = await request.body()
+        try:
+            records = split_length_prefixed(body)
+            params = json.loads(bytes(records[0])) if records else {}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid frame stream: {str(e)}")
+        if not isinstance(params, dict):
+            raise HTTPException(status_code=400, detail="Invalid frame stream: params must be a JSON object")
+        return _validate(params_model, params), records[1:]
+
+    raise HTTPException(
+        status_code=415,
+        detail=f"Expected multipart/form-data or {FRAME_STREAM_CONTENT_TYPE}",
+    )
+
+
+async def iter_ndjson(request: Request) -> AsyncIterator[bytes]:
+    """
+    Yield the non-empty lines of a streamed NDJSON body as they arrive.
+    """
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+class IngestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for handlers whose body iterator is still reading the request
+    (e.g. iter_ndjson). StreamingResponse watches for disconnects by consuming
+    receive(), which would swallow request body chunks; here a disconnect surfaces
+    from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
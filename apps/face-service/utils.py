@@ -2,7 +2,20 @@ import base64
 import cv2
 import numpy as np
 
-def decode_base64_frame(base64_string: str) -> np.ndarray:
+from metrics import timed
+
+# Thumbnail used by liveness variance and frame ranking
+THUMBNAIL_SIZE = (100, 100)
+
+# cv2.imread flags that decode straight to grayscale at 1/n scale (JPEG DCT scaling)
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+def decode_base64_frame(base64_string: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
     """
     Decode base64 string to OpenCV image.
     """
@@ -10,19 +23,39 @@ def decode_base64_frame(base64_string: str) -> np.ndarray:
         if "," in base64_string:
             base64_string = base64_string.split(",")[1]
         
-        image_data = base64.b64decode(base64_string)
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        return img
+        with timed("base64_decode"):
+            image_data = base64.b64decode(base64_string)
+        return decode_image_bytes(image_data, flags)
     except Exception as e:
         raise ValueError(f"Invalid base64 string: {str(e)}")
 
+def decode_image_bytes(data, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """
+    Decode encoded image bytes (JPEG/PNG) to OpenCV image.
+    Accepts bytes or memoryview; the buffer is wrapped without copying.
+    """
+    nparr = np.frombuffer(data, np.uint8)
+    with timed("imdecode"):
+        img = cv2.imdecode(nparr, flags)
+    if img is None:
+        raise ValueError("not a decodable image")
+    return img
+
+def make_thumbnail(img: np.ndarray) -> np.ndarray:
+    """
+    Downscaled grayscale view of a BGR or grayscale image (no-op if already a thumbnail).
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    if gray.shape[::-1] == THUMBNAIL_SIZE:
+        return gray
+    return cv2.resize(gray, THUMBNAIL_SIZE)
+
 def calculate_frame_sharpness(img: np.ndarray) -> float:
     """
     Calculate image sharpness using Laplacian variance.
-    Higher value means sharper image.
+    Higher value means sharper image. Accepts BGR or grayscale images.
     """
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
     return cv2.Laplacian(gray, cv2.CV_64F).var()
 
 def cosine_similarity(v1: list[float], v2: list[float]) -> float:
@@ -0,0 +1,286 @@
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import ARRAY, JSON, Float, bindparam, func, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.types import TypeDecorator
+
+from constants import FaceType
+from executor import db_stage
+from face_index import EMBEDDING_DIM, IndexMatch, face_index, normalize_embedding
+
+try:
+    from pgvector.sqlalchemy import Vector
+except ImportError:
+    Vector = None
+
+# 'numpy' keeps the gallery in the in-memory FaceIndex, 'pgvector' searches in Postgres
+VECTOR_BACKEND = os.getenv("FACE_VECTOR_BACKEND", "numpy").lower()
+# ANN index used by the pgvector backend: 'hnsw' or 'ivfflat'
+VECTOR_INDEX = os.getenv("FACE_VECTOR_INDEX", "hnsw").lower()
+HNSW_M = int(os.getenv("FACE_VECTOR_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("FACE_VECTOR_HNSW_EF_CONSTRUCTION", "64"))
+HNSW_EF_SEARCH = int(os.getenv("FACE_VECTOR_HNSW_EF_SEARCH", "40"))
+IVFFLAT_LISTS = int(os.getenv("FACE_VECTOR_IVFFLAT_LISTS", "100"))
+IVFFLAT_PROBES = int(os.getenv("FACE_VECTOR_IVFFLAT_PROBES", "10"))
+# With a float16/int8 FaceIndex: candidates per probe re-scored against the exact
+# embeddings from the database (0 returns the approximate scores as they are)
+RERANK_CANDIDATES = int(os.getenv("FACE_INDEX_RERANK_CANDIDATES", "32"))
+# Bound on the bind parameters of one re-rank query
+_RERANK_FETCH_CHUNK = 500
+
+_pgvector_enabled = False
+
+
+def pgvector_enabled() -> bool:
+    return _pgvector_enabled
+
+
+class EmbeddingType(TypeDecorator):
+    """
+    Face embedding column: vector(512) when pgvector is enabled, ARRAY(Float) otherwise.
+    Non-Postgres databases (SQLite for local runs and benchmarks) store a JSON list.
+    """
+    impl = ARRAY(Float)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name != "postgresql":
+            return dialect.type_descriptor(JSON())
+        if _pgvector_enabled:
+            return dialect.type_descriptor(Vector(EMBEDDING_DIM))
+        return dialect.type_descriptor(ARRAY(Float))
+
+
+class NumpyGallery:
+    """
+    Gallery backed by the in-memory FaceIndex.
+
+    When the index holds quantized embeddings, each probe's shortlist of
+    RERANK_CANDIDATES approximate matches is re-scored in float32 against the
+    stored embeddings, so the returned similarities are exact.
+    """
+    name = "numpy"
+
+    def __init__(self):
+        self.face_model = None
+
+    def load(self, db: Session, face_model) -> int:
+        self.face_model = face_model
+        # Counted first so each segment is allocated once at its final size
+        sizes = dict(db.query(face_model.type, func.count()).group_by(face_model.type).all())
+        rows = db.query(face_model.external_id, face_model.type, face_model.embedding).yield_per(1000)
+        return face_index.load(rows, sizes)
+
+    def upsert(self, external_id: str, face_type: str, embedding: Sequence[float]) -> None:
+        face_index.upsert(external_id, face_type, embedding)
+
+    def remove(self, external_id: str) -> None:
+        face_index.remove(external_id)
+
+    def search(self, db: Session, vector: Sequence[float], k: int = 1,
+               face_type: Optional[str] = None) -> List[IndexMatch]:
+        return self.search_many(db, [vector], k, face_type)[0]
+
+    def search_many(self, db: Session, vectors: Sequence[Sequence[float]], k: int = 1,
+                    face_type: Optional[str] = None) -> List[List[IndexMatch]]:
+        if not self.reranks:
+            return face_index.search_many(vectors, k, face_type)
+        shortlists = face_index.search_many(vectors, max(k, RERANK_CANDIDATES), face_type)
+        return self.rerank(vectors, shortlists, self.exact_embeddings(db, shortlists), k)
+
+    async def search_async(self, db, vector: Sequence[float], k: int = 1,
+                           face_type: Optional[str] = None) -> List[IndexMatch]:
+        """search() for an AsyncSession: scoring runs on the db stage, only the re-rank fetch on the session."""
+        if not self.reranks:
+            return (await db_stage.run(face_index.search_many, [vector], k, face_type))[0]
+        shortlists = await db_stage.run(face_index.search_many, [vector], max(k, RERANK_CANDIDATES), face_type)
+        exact = await db.run_sync(self.exact_embeddings, shortlists)
+        return self.rerank([vector], shortlists, exact, k)[0]
+
+    @property
+    def reranks(self) -> bool:
+        return face_index.quantized and RERANK_CANDIDATES > 0 and self.face_model is not None
+
+    def exact_embeddings(self, db: Session, shortlists: List[List[IndexMatch]]) -> Dict[str, np.ndarray]:
+        """Normalized float32 embeddings from the database of every shortlisted face."""
+        external_ids = list({match.external_id for shortlist in shortlists for match in shortlist})
+        exact: Dict[str, np.ndarray] = {}
+        model = self.face_model
+        for start in range(0, len(external_ids), _RERANK_FETCH_CHUNK):
+            chunk = external_ids[start:start + _RERANK_FETCH_CHUNK]
+            for external_id, embedding in db.query(model.external_id, model.embedding).filter(
+                model.external_id.in_(chunk)
+            ):
+                exact[external_id] = normalize_embedding(embedding)
+        return exact
+
+    def rerank(self, vectors: Sequence[Sequence[float]], shortlists: List[List[IndexMatch]],
+               exact: Dict[str, np.ndarray], k: int) -> List[List[IndexMatch]]:
+        """
+        Re-score the approximate shortlists with the exact embeddings and keep the
+        best k per probe.
+        """
+        results = []
+        for vector, shortlist in zip(vectors, shortlists):
+            probe = normalize_embedding(vector)
+            rescored = [
+                # A face deleted since the index was searched keeps its approximate score
+                match._replace(similarity=float(exact[match.external_id] @ probe))
+                if match.external_id in exact else match
+                for match in shortlist
+            ]
+            rescored.sort(key=lambda match: match.similarity, reverse=True)
+            results.append(rescored[:k])
+        return results
+
+
+_FACE_TYPES = {face_type.value for face_type in FaceType}
+
+
+class PgVectorGallery:
+    """Gallery searched inside Postgres through the pgvector ANN index."""
+    name = "pgvector"
+
+    def load(self, db: Session, face_model) -> int:
+        # Nothing to hold in memory, the rows stay in Postgres
+        return db.query(face_model.id).count()
+
+    def upsert(self, external_id: str, face_type: str, embedding: Sequence[float]) -> None:
+        pass
+
+    def remove(self, external_id: str) -> None:
+        pass
+
+    def search(self, db: Session, vector: Sequence[float], k: int = 1,
+               face_type: Optional[str] = None) -> List[IndexMatch]:
+        if VECTOR_INDEX == "ivfflat":
+            db.execute(text(f"SET LOCAL ivfflat.probes = {IVFFLAT_PROBES}"))
+        else:
+            db.execute(text(f"SET LOCAL hnsw.ef_search = {max(HNSW_EF_SEARCH, k)}"))
+
+        params = {"probe": normalize_embedding(vector), "k": k}
+        where = ""
+        if face_type in _FACE_TYPES:
+            # Inlined, not bound: a prepared statement's generic plan cannot match the
+            # per-type partial index built by migrate_embeddings() (WHERE type = 'ADMIN')
+            where = f"WHERE type = '{FaceType(face_type).value}' "
+        elif face_type is not None:
+            # No partial index for other types; bound, as the value comes from the request
+            where = "WHERE type = :face_type "
+            params["face_type"] = face_type
+        query = text(
+            "SELECT external_id, type, 1 - (embedding <=> :probe) AS similarity "
+            f"FROM faces {where}ORDER BY embedding <=> :probe LIMIT :k"
+        ).bindparams(bindparam("probe", type_=Vector(EMBEDDING_DIM)))
+        rows = db.execute(query, params).all()
+        return [IndexMatch(row.external_id, row.type, float(row.similarity)) for row in rows]
+
+    async def search_async(self, db, vector: Sequence[float], k: int = 1,
+                           face_type: Optional[str] = None) -> List[IndexMatch]:
+        """search() for an AsyncSession (the query runs on its async connection)."""
+        return await db.run_sync(self.search, vector, k, face_type)
+
+    def search_many(self, db: Session, vectors: Sequence[Sequence[float]], k: int = 1,
+                    face_type: Optional[str] = None) -> List[List[IndexMatch]]:
+        # The ANN index answers one probe per query
+        return [self.search(db, vector, k, face_type) for vector in vectors]
+
+
+gallery = NumpyGallery()
+
+
+def configure(engine) -> str:
+    """
+    Pick the gallery backend. Must run before the first query touches the faces table.
+    Falls back to the NumPy index when pgvector (package or extension) is unavailable.
+    """
+    global gallery, _pgvector_enabled
+
+    if VECTOR_BACKEND != "pgvector":
+        return gallery.name
+    if Vector is None:
+        print("⚠️ pgvector package not installed. Using NumPy index.")
+        return gallery.name
+    if engine.dialect.name != "postgresql":
+        print(f"⚠️ pgvector needs PostgreSQL (got {engine.dialect.name}). Using NumPy index.")
+        return gallery.name
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    except SQLAlchemyError as e:
+        print(f"⚠️ pgvector extension unavailable ({e.__class__.__name__}). Using NumPy index.")
+        return gallery.name
+
+    _pgvector_enabled = True
+    gallery = PgVectorGallery()
+    return gallery.name
+
+
+def migrate_embeddings(engine) -> None:
+    """
+    Convert an existing ARRAY(Float) embedding column to vector(512) and build the ANN index.
+    Safe to run repeatedly.
+    """
+    with engine.begin() as conn:
+        data_type = conn.execute(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = 'faces' AND column_name = 'embedding'"
+        )).scalar()
+        if data_type == "ARRAY":
+            print("⏳ Migrating faces.embedding from ARRAY(Float) to vector...")
+            conn.execute(text(
+                f"ALTER TABLE faces ALTER COLUMN embedding TYPE vector({EMBEDDING_DIM}) "
+                f"USING embedding::vector({EMBEDDING_DIM})"
+            ))
+
+        # One index over all faces plus a partial index per type, so a search scoped to
+        # one type only walks that type's graph/lists
+        for suffix, where in [("", "")] + [
+            (f"_{face_type.value.lower()}", f" WHERE type = '{face_type.value}'") for face_type in FaceType
+        ]:
+            if VECTOR_INDEX == "ivfflat":
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_faces_embedding_ivfflat{suffix} ON faces "
+                    f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {IVFFLAT_LISTS}){where}"
+                ))
+            else:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_faces_embedding_hnsw{suffix} ON faces "
+                    "USING hnsw (embedding vector_cosine_ops) "
+                    f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}){where}"
+                ))
+
+
+def rollback_embeddings(engine) -> None:
+    """
+    Convert the vector(512) column back to ARRAY(Float) (drops the ANN indexes).
+    """
+    with engine.begin() as conn:
+        for suffix in [""] + [f"_{face_type.value.lower()}" for face_type in FaceType]:
+            conn.execute(text(f"DROP INDEX IF EXISTS ix_faces_embedding_hnsw{suffix}"))
+            conn.execute(text(f"DROP INDEX IF EXISTS ix_faces_embedding_ivfflat{suffix}"))
+        conn.execute(text(
+            "ALTER TABLE faces ALTER COLUMN embedding TYPE double precision[] "
+            "USING embedding::real[]::double precision[]"
+        ))
+
+
+if __name__ == "__main__":
+    import sys
+    from database import engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "migrate":
+        if configure(engine) != "pgvector":
+            sys.exit("pgvector is not available (set FACE_VECTOR_BACKEND=pgvector)")
+        migrate_embeddings(engine)
+        print("✅ faces.embedding migrated to vector")
+    elif command == "rollback":
+        rollback_embeddings(engine)
+        print("✅ faces.embedding restored to ARRAY(Float)")
+    else:
+        sys.exit(f"Unknown command: {command} (expected 'migrate' or 'rollback')")
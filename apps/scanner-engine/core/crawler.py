@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import posixpath
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from core.http import HTTP_CONCURRENCY, HTTP_PER_HOST, create_session, read_body
+
+logger = logging.getLogger(__name__)
+
+# Pages fetched at the same time, overall and per host
+CRAWLER_CONCURRENCY = int(os.environ.get('CRAWLER_CONCURRENCY', str(HTTP_CONCURRENCY)))
+CRAWLER_PER_HOST = int(os.environ.get('CRAWLER_PER_HOST', str(HTTP_PER_HOST)))
+# Minimum seconds between two requests to the same host
+CRAWLER_DELAY = float(os.environ.get('CRAWLER_DELAY', '0.05'))
+# URLs reported per crawl
+CRAWLER_MAX_PAGES = int(os.environ.get('CRAWLER_MAX_PAGES', '1000'))
+# HTML bodies larger than this are parsed only up to this size
+CRAWLER_MAX_BODY_BYTES = int(os.environ.get('CRAWLER_MAX_BODY_BYTES', str(2 * 1024 * 1024)))
+# Seen-set sizing: expected distinct URLs and acceptable false-positive rate
+CRAWLER_BLOOM_CAPACITY = int(os.environ.get('CRAWLER_BLOOM_CAPACITY', '100000'))
+CRAWLER_BLOOM_ERROR_RATE = float(os.environ.get('CRAWLER_BLOOM_ERROR_RATE', '0.001'))
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Absolute, normalised form of url (resolved against base): lowercase scheme and
+    host, no default port, dot segments resolved, no fragment, sorted query.
+    Returns None for anything that is not http(s).
+    """
+    url = (url or '').strip()
+    if base:
+        url = urljoin(base, url)
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    netloc = parts.hostname.lower()
+    if port and port != _DEFAULT_PORTS[scheme]:
+        netloc = f'{netloc}:{port}'
+
+    path = parts.path or '/'
+    normalized = posixpath.normpath(path)
+    if path.endswith('/') and normalized != '/':
+        normalized += '/'
+    path = '/' + normalized.lstrip('/')
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+class BloomFilter:
+    """
+    Fixed-size probabilistic set: no false negatives, about `error_rate` false
+    positives once `capacity` items are in. Keeps the seen-set of a large crawl
+    at a few hundred KB instead of every URL string.
+    """
+
+    def __init__(self, capacity: int = CRAWLER_BLOOM_CAPACITY, error_rate: float = CRAWLER_BLOOM_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """Add item; returns False if it was (probably) already there."""
+        new = False
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+
+def extract_links(html: str, page_url: str) -> List[str]:
+    """Canonical URLs of the links, frames and GET forms of an HTML page."""
+    soup = BeautifulSoup(html, 'html.parser')
+    base_tag = soup.find('base', href=True)
+    base = urljoin(page_url, base_tag['href']) if base_tag else page_url
+
+    links = []
+    for tag, attr in (('a', 'href'), ('area', 'href'), ('iframe', 'src'), ('frame', 'src')):
+        for element in soup.find_all(tag, **{attr: True}):
+            links.append(canonicalize_url(element[attr], base))
+
+    # GET forms become URLs carrying their fields, so their parameters get scanned too
+    for form in soup.find_all('form'):
+        if (form.get('method') or 'get').lower() != 'get':
+            continue
+        action = canonicalize_url(form.get('action') or page_url, base)
+        if action is None:
+            continue
+        fields = [
+            (field['name'], field.get('value') or '1')
+            for field in form.find_all(['input', 'select', 'textarea'], attrs={'name': True})
+            if (field.get('type') or '').lower() not in ('submit', 'button', 'image', 'reset', 'file')
+        ]
+        parts = urlsplit(action)
+        query = urlencode(parse_qsl(parts.query, keep_blank_values=True) + fields)
+        links.append(canonicalize_url(urlunsplit(parts._replace(query=query))))
+
+    return [link for link in links if link]
+
+
+class Crawler:
+    """
+    Breadth-first asyncio crawler over the start URL's host.
+
+    Pages are fetched by `concurrency` workers over one pooled session, at most
+    `per_host` at a time per host and no closer than `delay` seconds apart per host.
+    URLs are canonicalised and deduplicated with a Bloom filter. Links found at
+    depth `max_depth` are reported but not fetched. If the start URL redirects to
+    another host (http -> https, example.com -> www.example.com), that host is in
+    scope too.
+
+        async for url in Crawler(target_url).crawl(): ...   # streaming
+        urls = Crawler(target_url).crawl_all()              # blocking, all URLs
+    """
+
+    def __init__(self, start_url: str, max_depth: int = 2, max_pages: int = CRAWLER_MAX_PAGES,
+                 concurrency: int = CRAWLER_CONCURRENCY, per_host: int = CRAWLER_PER_HOST,
+                 delay: float = CRAWLER_DELAY, session: Optional[aiohttp.ClientSession] = None):
+        self.start_url = canonicalize_url(start_url)
+        if self.start_url is None:
+            raise ValueError(f'Not an http(s) URL: {start_url!r}')
+        self.hosts = {urlsplit(self.start_url).netloc}
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.delay = delay
+        self.session = session
+        self.seen = BloomFilter()
+        self.pages_fetched = 0
+        self.urls_found = 0
+        self._host_slots = {}
+        self._host_next = {}
+
+    def in_scope(self, url: str) -> bool:
+        return urlsplit(url).netloc in self.hosts
+
+    async def _polite(self, host: str):
+        """Wait for this host's next request slot (requests start `delay` apart)."""
+        now = time.monotonic()
+        start = max(now, self._host_next.get(host, now))
+        self._host_next[host] = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[Tuple[str, str]]:
+        """(final URL, HTML) of a page, or None if it is not HTML or failed."""
+        host = urlsplit(url).netloc
+        slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with slots:
+            await self._polite(host)
+            try:
+                async with session.get(url, allow_redirects=True) as response:
+                    content_type = response.headers.get('Content-Type', '')
+                    if response.status >= 400 or 'html' not in content_type:
+                        return None
+                    body = await read_body(response, CRAWLER_MAX_BODY_BYTES)
+                    self.pages_fetched += 1
+                    return str(response.url), body.decode(response.charset or 'utf-8', errors='replace')
+            except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError, LookupError) as e:
+                logger.debug(f"Fetch failed for {url}: {e}")
+                return None
+
+    def _discover(self, url: str) -> bool:
+        """Whether url is new, in scope and within max_pages (and record it)."""
+        if self.urls_found >= self.max_pages or not self.in_scope(url):
+            return False
+        if not self.seen.add(url):
+            return False
+        self.urls_found += 1
+        return True
+
+    async def _worker(self, session, queue: asyncio.Queue, found: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            url, depth = await queue.get()
+            try:
+                page = await self.fetch(session, url)
+                if page is None:
+                    continue
+                final_url, html = page
+                if depth == 0:
+                    # Where the start URL redirected to is the site being crawled
+                    final_url = canonicalize_url(final_url) or final_url
+                    self.hosts.add(urlsplit(final_url).netloc)
+                # Parsing is CPU-bound; keep it off the event loop
+                links = await loop.run_in_executor(None, extract_links, html, final_url)
+                for link in links:
+                    if self._discover(link):
+                        await found.put(link)
+                        if depth + 1 < self.max_depth:
+                            queue.put_nowait((link, depth + 1))
+            except Exception as e:
+                logger.error(f"Error crawling {url}: {e}")
+            finally:
+                queue.task_done()
+
+    async def _run(self, found: asyncio.Queue):
+        session = self.session or create_session(self.concurrency, self.per_host)
+        queue = asyncio.Queue()
+        workers = []
+        try:
+            if self._discover(self.start_url):
+                await found.put(self.start_url)
+                if self.max_depth > 0:
+                    queue.put_nowait((self.start_url, 0))
+            workers = [
+                asyncio.create_task(self._worker(session, queue, found))
+                for _ in range(self.concurrency)
+            ]
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self.session is None:
+                await session.close()
+            await found.put(None)
+
+    async def crawl(self) -> AsyncIterator[str]:
+        """Yield in-scope URLs (start URL first) as they are discovered."""
+        found = asyncio.Queue()
+        runner = asyncio.create_task(self._run(found))
+        try:
+            while True:
+                url = await found.get()
+                if url is None:
+                    break
+                yield url
+            await runner
+        finally:
+            if not runner.done():
+                runner.cancel()
+                await asyncio.gather(runner, return_exceptions=True)
+        logger.info(f"Crawl of {self.start_url} done: {self.urls_found} URLs, {self.pages_fetched} pages fetched")
+
+    async def crawl_list(self) -> List[str]:
+        return [url async for url in self.crawl()]
+
+    def crawl_all(self) -> List[str]:
+        """Run a whole crawl from synchronous code and return every URL found."""
+        return asyncio.run(self.crawl_list())
@@ -0,0 +1,40 @@
+import os
+
+import aiohttp
+
+# Connection pool shared by the crawler and the vulnerability modules
+HTTP_CONCURRENCY = int(os.environ.get('SCANNER_HTTP_CONCURRENCY', '20'))
+HTTP_PER_HOST = int(os.environ.get('SCANNER_HTTP_PER_HOST', '4'))
+HTTP_TIMEOUT = float(os.environ.get('SCANNER_HTTP_TIMEOUT', '10'))
+USER_AGENT = os.environ.get('SCANNER_USER_AGENT', 'res-iot-scanner/1.0')
+
+
+async def read_body(response: aiohttp.ClientResponse, limit: int) -> bytes:
+    """
+    Body of response up to `limit` bytes. content.read(n) only returns what has
+    arrived so far, so chunks are accumulated until EOF or the limit.
+    """
+    chunks, size = [], 0
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        chunks.append(chunk[:limit - size])
+        size += len(chunks[-1])
+        if size >= limit:
+            break
+    return b''.join(chunks)
+
+
+def create_session(concurrency=None, per_host=None, timeout=None):
+    """
+    aiohttp session with a bounded keep-alive pool: at most `concurrency`
+    connections overall and `per_host` to any one host.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=concurrency or HTTP_CONCURRENCY,
+        limit_per_host=per_host or HTTP_PER_HOST,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout or HTTP_TIMEOUT),
+        headers={'User-Agent': USER_AGENT},
+    )
@@ -0,0 +1,106 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from core.crawler import canonicalize_url
+
+# Sample URLs kept (and reported with findings) per group; the rest are only counted
+NORMALIZER_MAX_SAMPLES = int(os.environ.get('NORMALIZER_MAX_SAMPLES', '20'))
+
+_SEGMENT_PATTERNS = [
+    (re.compile(r'^\d+$'), '{int}'),
+    (re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.I), '{uuid}'),
+    (re.compile(r'^[0-9a-f]{16,}$', re.I), '{hash}'),
+]
+
+
+def path_template(path: str) -> str:
+    """Path with its identifier-like segments (numbers, UUIDs, hashes) replaced by placeholders."""
+    segments = []
+    for segment in path.split('/'):
+        for pattern, placeholder in _SEGMENT_PATTERNS:
+            if pattern.match(segment):
+                segment = placeholder
+                break
+        segments.append(segment)
+    return '/'.join(segments)
+
+
+def group_key(url: str) -> Tuple[str, str, str, Tuple[str, ...]]:
+    """
+    (scheme, host, path template, sorted parameter names): URLs sharing it have the
+    same injection points. Spellings of one URL (host case, default port, fragment,
+    dot segments, trailing slash) share a key.
+    """
+    parts = urlsplit(canonicalize_url(url) or url)
+    names = tuple(sorted({name for name, _ in parse_qsl(parts.query, keep_blank_values=True)}))
+    return parts.scheme, parts.netloc, path_template(parts.path.rstrip('/') or '/'), names
+
+
+class UrlGroup:
+    """URLs of one route template and parameter-name set, probed through `representative`."""
+
+    def __init__(self, key: tuple, representative: str):
+        self.key = key
+        self.representative = representative
+        self.samples = [representative]
+        self.count = 1
+
+    @property
+    def template(self) -> str:
+        scheme, host, path, names = self.key
+        query = '&'.join(f'{name}=*' for name in names)
+        return f"{scheme}://{host}{path}" + (f"?{query}" if query else '')
+
+    def add(self, url: str):
+        self.count += 1
+        if len(self.samples) < NORMALIZER_MAX_SAMPLES:
+            self.samples.append(url)
+
+
+class UrlNormalizer:
+    """
+    Groups crawled URLs by route template and parameter names so each distinct
+    injection point is probed once (through the group's first URL), then maps
+    the findings back to every URL of the group.
+    """
+
+    def __init__(self):
+        self.groups: Dict[tuple, UrlGroup] = {}
+        self.urls = 0
+
+    def add(self, url: str) -> Optional[UrlGroup]:
+        """Add a URL; returns its group if the URL started a new one (i.e. needs probing)."""
+        self.urls += 1
+        key = group_key(url)
+        group = self.groups.get(key)
+        if group is not None:
+            group.add(url)
+            return None
+        group = self.groups[key] = UrlGroup(key, url)
+        return group
+
+    def add_all(self, urls: Iterable[str]) -> List[str]:
+        """Add URLs; returns the representatives of the groups they started."""
+        return [group.representative for group in map(self.add, urls) if group is not None]
+
+    def representatives(self) -> List[str]:
+        return [group.representative for group in self.groups.values()]
+
+    def attribute(self, findings: Iterable[dict]) -> List[dict]:
+        """Findings of representatives with the route and the URLs of their group added to the evidence."""
+        attributed = []
+        for finding in findings:
+            evidence = finding.get('evidence') or {}
+            group = self.groups.get(group_key(evidence['url'])) if 'url' in evidence else None
+            if group is not None:
+                evidence = {
+                    **evidence,
+                    'route': group.template,
+                    'affected_urls': group.samples,
+                    'affected_count': group.count,
+                }
+                finding = {**finding, 'evidence': evidence}
+            attributed.append(finding)
+        return attributed
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Findings per scan.results message, and the size a message of findings stays under
+RESULTS_BATCH_SIZE = int(os.environ.get('RESULTS_BATCH_SIZE', '50'))
+RESULTS_MAX_MESSAGE_BYTES = int(os.environ.get('RESULTS_MAX_MESSAGE_BYTES', str(512 * 1024)))
+# Buffered findings are sent at least this often; progress events at most this often
+RESULTS_INTERVAL_SECONDS = float(os.environ.get('RESULTS_INTERVAL_SECONDS', '2'))
+# Producer batching for the result messages
+RESULTS_COMPRESSION = os.environ.get('RESULTS_COMPRESSION', 'gzip')
+RESULTS_LINGER_MS = int(os.environ.get('RESULTS_LINGER_MS', '50'))
+RESULTS_PRODUCER_BATCH_BYTES = int(os.environ.get('RESULTS_PRODUCER_BATCH_BYTES', str(64 * 1024)))
+# How long the summary waits for the scan's earlier messages to be acknowledged
+RESULTS_ACK_TIMEOUT = float(os.environ.get('RESULTS_ACK_TIMEOUT', '30'))
+
+
+def producer_config() -> dict:
+    """KafkaProducer settings for streaming results: compressed, batched with a short linger."""
+    return {
+        'compression_type': RESULTS_COMPRESSION or None,
+        'linger_ms': RESULTS_LINGER_MS,
+        'batch_size': RESULTS_PRODUCER_BATCH_BYTES,
+        'key_serializer': lambda key: key.encode('utf-8') if key is not None else None,
+    }
+
+
+class ResultPublisher:
+    """
+    Streams the results of one scan to `topic` while it runs, keyed by scan id
+    (so a scan's messages stay ordered on one partition):
+
+        {"type": "findings", "vulnerabilities": [...]}   batched findings
+        {"type": "progress", "phase": ..., "urls_crawled": ..., "eta_seconds": ...}
+        {"type": "summary", "status": "COMPLETED", ...}  last, see summary()
+
+    Every message carries scanId, status ("RUNNING" until the summary) and a
+    per-scan seq. Only the current batch of findings is held in memory.
+    `send(topic, value, key=..., wait=...)` is the transport's send.
+    """
+
+    def __init__(self, send: Callable, scan_id: str, topic: str, batch_size: int = RESULTS_BATCH_SIZE,
+                 interval: float = RESULTS_INTERVAL_SECONDS):
+        self.send = send
+        self.scan_id = scan_id
+        self.topic = topic
+        self.batch_size = batch_size
+        self.interval = interval
+        self.seq = 0
+        self.started = time.monotonic()
+        self.phase = 'crawling'
+        self.urls_crawled = 0
+        self.targets_total = 0
+        self.targets_scanned = 0
+        self.findings = 0
+        self._scan_started: Optional[float] = None
+        self._batch: List[dict] = []
+        self._batch_bytes = 0
+        self._batch_started = 0.0
+        self._last_progress = 0.0
+        self._pending = []  # sends not acknowledged yet
+
+    def _message(self, kind: str, **fields) -> dict:
+        self.seq += 1
+        return {'scanId': self.scan_id, 'type': kind, 'status': 'RUNNING', 'seq': self.seq, **fields}
+
+    def _publish(self, message: dict):
+        future = self.send(self.topic, message, key=self.scan_id, wait=False)
+        if future is not None:
+            self._pending = [f for f in self._pending if not f.is_done] + [future]
+
+    def add_findings(self, findings: List[dict]):
+        """Buffer findings; a batch is sent once full, too large or older than `interval`."""
+        for finding in findings:
+            size = len(json.dumps(finding, default=str))
+            if self._batch and self._batch_bytes + size > RESULTS_MAX_MESSAGE_BYTES:
+                self.flush()
+            if not self._batch:
+                self._batch_started = time.monotonic()
+            self._batch.append(finding)
+            self._batch_bytes += size
+            self.findings += 1
+            if len(self._batch) >= self.batch_size:
+                self.flush()
+        if self._batch and time.monotonic() - self._batch_started >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            self._publish(self._message('findings', vulnerabilities=self._batch))
+            self._batch, self._batch_bytes = [], 0
+
+    def eta_seconds(self) -> Optional[float]:
+        """Remaining scan time at the current target rate (None while crawling)."""
+        if self._scan_started is None or not self.targets_scanned:
+            return None
+        rate = self.targets_scanned / max(time.monotonic() - self._scan_started, 1e-6)
+        return round((self.targets_total - self.targets_scanned) / rate, 1)
+
+    def progress(self, force: bool = False, **counts):
+        """Update counters (urls_crawled, targets_total, targets_scanned); sent at most every `interval`."""
+        for name, value in counts.items():
+            setattr(self, name, value)
+        if self._batch and time.monotonic() - self._batch_started >= self.interval:
+            self.flush()
+        now = time.monotonic()
+        if not force and now - self._last_progress < self.interval:
+            return
+        self._last_progress = now
+        self._publish(self._message(
+            'progress',
+            phase=self.phase,
+            urls_crawled=self.urls_crawled,
+            targets_total=self.targets_total,
+            targets_scanned=self.targets_scanned,
+            findings=self.findings,
+            elapsed_seconds=round(now - self.started, 1),
+            eta_seconds=self.eta_seconds(),
+        ))
+
+    def start_scanning(self, targets_total: int):
+        self.phase = 'scanning'
+        self._scan_started = time.monotonic()
+        self.progress(force=True, targets_total=targets_total)
+
+    def summary(self, status: str = 'COMPLETED', **fields) -> dict:
+        """
+        Flush the last findings, wait until every message of the scan was
+        acknowledged, and return the summary message (the caller produces it,
+        so the job is only committed once everything before it is delivered).
+        """
+        self.flush()
+        for future in self._pending:
+            future.get(timeout=RESULTS_ACK_TIMEOUT)
+        self._pending = []
+        message = self._message(
+            'summary',
+            urls_crawled=self.urls_crawled,
+            urls_scanned=self.urls_crawled,
+            targets_scanned=self.targets_scanned,
+            vulnerabilities_count=self.findings,
+            elapsed_seconds=round(time.monotonic() - self.started, 1),
+            partial_messages=self.seq,
+            **fields,
+        )
+        message['status'] = status
+        logger.info(f"Scan {self.scan_id}: {self.findings} findings streamed in {self.seq - 1} messages")
+        return message
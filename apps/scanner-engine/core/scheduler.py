@@ -0,0 +1,327 @@
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Scan jobs running at once
+SCANNER_MAX_CONCURRENT_JOBS = int(os.environ.get('SCANNER_MAX_CONCURRENT_JOBS', '4'))
+# How long one poll waits for new jobs (polling continues while paused, to stay in the group)
+SCANNER_POLL_TIMEOUT_MS = int(os.environ.get('SCANNER_POLL_TIMEOUT_MS', '1000'))
+# Attempts at producing a job's result before the scheduler stops (leaving it uncommitted)
+SCANNER_SEND_RETRIES = int(os.environ.get('SCANNER_SEND_RETRIES', '3'))
+SCANNER_SEND_TIMEOUT = float(os.environ.get('SCANNER_SEND_TIMEOUT', '30'))
+
+Partition = Tuple[str, int]  # (topic, partition)
+
+
+class SchedulerStalled(RuntimeError):
+    """A job's result could not be produced, so its partition can no longer commit."""
+
+
+class Record(NamedTuple):
+    partition: Partition
+    offset: int
+    value: Any
+
+
+class PartitionOffsets:
+    """
+    Offsets of one partition's jobs in the order they were started. Jobs finish
+    out of order, but only the end of the finished prefix may be committed, so a
+    crash never skips a job that was still running.
+    """
+
+    def __init__(self):
+        self.started = deque()
+        self.finished = set()
+
+    def start(self, offset: int):
+        self.started.append(offset)
+
+    def finish(self, offset: int) -> Optional[int]:
+        """Mark a job done; returns the offset to commit if the finished prefix grew."""
+        self.finished.add(offset)
+        commit = None
+        while self.started and self.started[0] in self.finished:
+            done = self.started.popleft()
+            self.finished.discard(done)
+            commit = done + 1
+        return commit
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.started)
+
+
+class KafkaTransport:
+    """Jobs from a Kafka topic (manual commits), results to Kafka topics."""
+
+    def __init__(self, bootstrap_servers: str, topic: str, group_id: str,
+                 deserializer: Callable = None, serializer: Callable = None, **producer_config):
+        from kafka import ConsumerRebalanceListener, KafkaConsumer, KafkaProducer
+
+        self.consumer = KafkaConsumer(
+            bootstrap_servers=bootstrap_servers,
+            auto_offset_reset='earliest',
+            enable_auto_commit=False,
+            group_id=group_id,
+            value_deserializer=deserializer,
+        )
+        self.producer = KafkaProducer(
+            bootstrap_servers=bootstrap_servers,
+            value_serializer=serializer,
+            **producer_config,
+        )
+        self.on_revoked = None
+        self.paused = False
+        transport = self
+
+        class Listener(ConsumerRebalanceListener):
+            def on_partitions_revoked(self, revoked):
+                if transport.on_revoked is not None:
+                    transport.on_revoked([(tp.topic, tp.partition) for tp in revoked])
+
+            def on_partitions_assigned(self, assigned):
+                # New partitions must not start flowing while the scheduler is saturated
+                if transport.paused and assigned:
+                    transport.consumer.pause(*assigned)
+
+        self.consumer.subscribe([topic], listener=Listener())
+
+    def poll(self, timeout_ms: int, max_records: int) -> List[Record]:
+        batches = self.consumer.poll(timeout_ms=timeout_ms, max_records=max_records)
+        return [
+            Record((tp.topic, tp.partition), message.offset, message.value)
+            for tp, messages in batches.items()
+            for message in messages
+        ]
+
+    def commit(self, offsets: Dict[Partition, int]):
+        from kafka.structs import OffsetAndMetadata, TopicPartition
+
+        def position(offset):
+            try:
+                return OffsetAndMetadata(offset, '', -1)
+            except TypeError:  # kafka-python < 2.1 has no leader_epoch
+                return OffsetAndMetadata(offset, '')
+
+        self.consumer.commit({TopicPartition(*p): position(o) for p, o in offsets.items()})
+
+    def pause(self):
+        self.paused = True
+        self.consumer.pause(*self.consumer.assignment())
+
+    def resume(self):
+        self.paused = False
+        self.consumer.resume(*self.consumer.assignment())
+
+    def send(self, topic: str, value, key=None, wait: bool = True):
+        future = self.producer.send(topic, value=value, key=key)
+        if wait:
+            future.get(timeout=SCANNER_SEND_TIMEOUT)
+        return future
+
+    def flush(self):
+        self.producer.flush()
+
+    def close(self):
+        self.producer.close()
+        self.consumer.close()
+
+
+class InMemoryTransport:
+    """
+    Transport over in-process lists, for running the scheduler without a broker:
+    `records` maps partition -> list of job values; sent results are appended to
+    `sent` and commits recorded in `committed` (where a restart would resume).
+    """
+
+    def __init__(self, records: Dict[Partition, List[Any]], committed: Dict[Partition, int] = None):
+        self.records = {p: list(values) for p, values in records.items()}
+        self.committed = dict(committed or {})
+        self.positions = {p: self.committed.get(p, 0) for p in self.records}
+        self.sent: List[Tuple[str, Any]] = []
+        self.paused = False
+        self.pauses = 0
+        self.on_revoked = None
+        self._lock = threading.Lock()
+
+    def poll(self, timeout_ms: int, max_records: int) -> List[Record]:
+        if self.paused:
+            return []
+        batch = []
+        for p, values in self.records.items():
+            while self.positions[p] < len(values) and len(batch) < max_records:
+                batch.append(Record(p, self.positions[p], values[self.positions[p]]))
+                self.positions[p] += 1
+        if not batch:
+            threading.Event().wait(timeout_ms / 1000)
+        return batch
+
+    def commit(self, offsets: Dict[Partition, int]):
+        self.committed.update(offsets)
+
+    def pause(self):
+        self.paused = True
+        self.pauses += 1
+
+    def resume(self):
+        self.paused = False
+
+    def send(self, topic: str, value, key=None, wait: bool = True):
+        with self._lock:
+            self.sent.append((topic, value))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def drained(self) -> bool:
+        return all(self.positions[p] >= len(v) for p, v in self.records.items())
+
+
+class JobScheduler:
+    """
+    Runs up to `max_jobs` jobs at once from a transport, each in a worker thread
+    (`handler(job)` returns the result to produce). A job's offset is committed
+    only after its result was produced, and only once every earlier job of its
+    partition has been too. While all slots are busy the transport is paused
+    (polling continues, so the consumer keeps its group membership) and resumed
+    as soon as a job finishes. `result_key(result)` is the message key of a result.
+
+    If a result cannot be produced, that offset can never be committed, so the
+    scheduler stops taking jobs, drains the running ones (committing what it can)
+    and run() raises SchedulerStalled; the job is redelivered after a restart.
+    """
+
+    def __init__(self, transport, handler: Callable[[Any], Optional[dict]], results_topic: Optional[str],
+                 max_jobs: int = SCANNER_MAX_CONCURRENT_JOBS, on_error: Callable[[Any, Exception], dict] = None,
+                 result_key: Callable[[dict], Optional[str]] = None):
+        self.transport = transport
+        self.handler = handler
+        self.results_topic = results_topic
+        self.max_jobs = max_jobs
+        self.on_error = on_error
+        self.result_key = result_key
+        self.offsets: Dict[Partition, PartitionOffsets] = {}
+        self.completed = queue.Queue()
+        self.running = 0
+        self.paused = False
+        self.backlog = deque()  # polled, not started yet
+        self.stalled: Optional[Record] = None  # first job whose result was not produced
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='scan-job')
+        transport.on_revoked = self._on_revoked
+
+    def stop(self):
+        self._stop.set()
+
+    def _produce(self, result: dict) -> bool:
+        for attempt in range(1, SCANNER_SEND_RETRIES + 1):
+            try:
+                key = self.result_key(result) if self.result_key else None
+                self.transport.send(self.results_topic, result, key=key)
+                return True
+            except Exception as e:
+                logger.warning(f"Producing result failed (attempt {attempt}/{SCANNER_SEND_RETRIES}): {e}")
+        return False
+
+    def _run_job(self, record: Record):
+        ok = False
+        try:
+            try:
+                result = self.handler(record.value)
+            except Exception as e:
+                logger.error(f"Job at {record.partition}@{record.offset} failed: {e}")
+                result = self.on_error(record.value, e) if self.on_error else None
+            ok = result is None or self.results_topic is None or self._produce(result)
+        finally:
+            self.completed.put((record, ok))
+
+    def _start(self, record: Record):
+        self.offsets.setdefault(record.partition, PartitionOffsets()).start(record.offset)
+        self.running += 1
+        self._pool.submit(self._run_job, record)
+
+    def _collect(self, block_seconds: float = 0.0):
+        """Account for finished jobs and commit the partitions whose finished prefix grew."""
+        commits = {}
+        try:
+            item = self.completed.get(timeout=block_seconds) if block_seconds else self.completed.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            record, ok = item
+            self.running -= 1
+            tracker = self.offsets.get(record.partition)
+            if not ok:
+                # Left in flight: nothing after it in the partition may be committed, so
+                # stop instead of piling up finished offsets that can never commit
+                logger.error(f"Result of {record.partition}@{record.offset} was not produced; offset not committed")
+                if self.stalled is None:
+                    self.stalled = record
+                    self._stop.set()
+            elif tracker is not None:
+                commit = tracker.finish(record.offset)
+                if commit is not None:
+                    commits[record.partition] = commit
+            try:
+                item = self.completed.get_nowait()
+            except queue.Empty:
+                break
+        if commits:
+            try:
+                self.transport.commit(commits)
+            except Exception as e:
+                logger.error(f"Offset commit failed: {e}")
+
+    def _on_revoked(self, partitions: List[Partition]):
+        # Commit what is finished; jobs still running finish and produce, but their
+        # offsets belong to the new owner (which may run them again)
+        self._collect()
+        for partition in partitions:
+            self.offsets.pop(partition, None)
+        self.backlog = deque(r for r in self.backlog if r.partition not in partitions)
+
+    def _apply_backpressure(self):
+        if self.running >= self.max_jobs and not self.paused:
+            self.transport.pause()
+            self.paused = True
+        elif self.running < self.max_jobs and self.paused:
+            self.transport.resume()
+            self.paused = False
+
+    def run(self, until: Callable[[], bool] = None):
+        """
+        Poll and run jobs until stop() (or `until()` returns True), then drain the
+        running jobs. Raises SchedulerStalled if a result could not be produced.
+        """
+        try:
+            while not self._stop.is_set() and not (until and until() and not self.backlog and not self.running):
+                self._collect()
+                while self.backlog and self.running < self.max_jobs:
+                    self._start(self.backlog.popleft())
+                self._apply_backpressure()
+
+                free = self.max_jobs - self.running - len(self.backlog)
+                records = self.transport.poll(SCANNER_POLL_TIMEOUT_MS if free > 0 else 0, max(free, 1))
+                self.backlog.extend(records)
+                if not records and free <= 0:
+                    # Saturated: wait for a job to finish instead of spinning
+                    self._collect(block_seconds=SCANNER_POLL_TIMEOUT_MS / 1000)
+        finally:
+            self._pool.shutdown(wait=True)
+            self._collect()
+            self.transport.flush()
+        if self.stalled is not None:
+            raise SchedulerStalled(
+                f"Result of {self.stalled.partition}@{self.stalled.offset} was not produced; "
+                f"stopped so it is redelivered"
+            )
@@ -1,7 +1,11 @@
 import os
 import json
+import asyncio
 import logging
-from kafka import KafkaConsumer, KafkaProducer
+import signal
+
+from core.results import ResultPublisher, producer_config
+from core.scheduler import SCANNER_MAX_CONCURRENT_JOBS, JobScheduler, KafkaTransport
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,63 +16,87 @@ KAFKA_BOOTSTRAP_SERVERS = os.environ.get('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9
 TOPIC_SCAN_REQUESTS = 'scan.requests'
 TOPIC_SCAN_RESULTS = 'scan.results'
 
+async def scan_target(scan_job, publisher):
+    """
+    Crawl and scan one target, streaming progress and findings through the
+    publisher; returns the summary scan.results message.
+    """
+    from core.crawler import Crawler
+    from core.normalizer import UrlNormalizer
+    from modules.sqli import SqliScanner
+
+    target_url = scan_job.get('targetUrl')
+    logger.info(f"Starting crawl for scan {publisher.scan_id} on {target_url}")
+
+    # Probe one URL per route template and parameter set
+    normalizer = UrlNormalizer()
+    targets = []
+    async for url in Crawler(target_url, max_depth=2).crawl():
+        group = normalizer.add(url)
+        if group is not None:
+            targets.append(group.representative)
+        publisher.progress(urls_crawled=normalizer.urls)
+    logger.info(f"Crawled {normalizer.urls} URLs, {len(targets)} distinct injection targets")
+
+    publisher.start_scanning(len(targets))
+    scanned = 0
+    async for _, findings in SqliScanner().scan_each(targets):
+        scanned += 1
+        publisher.add_findings(normalizer.attribute(findings))
+        publisher.progress(targets_scanned=scanned)
+
+    return publisher.summary('COMPLETED')
+
+def run_scan(scan_job, transport):
+    """Run one scan job (in a scheduler worker thread) with its own event loop."""
+    logger.info(f"Received scan job: {scan_job}")
+    publisher = ResultPublisher(transport.send, scan_job.get('scanId'), TOPIC_SCAN_RESULTS)
+    result = asyncio.run(scan_target(scan_job, publisher))
+    logger.info(f"Scan {result['scanId']} done with {result['vulnerabilities_count']} vulns")
+    return result
+
+def scan_failed(scan_job, error):
+    """Summary scan.results message for a job that raised."""
+    return {
+        'scanId': scan_job.get('scanId') if isinstance(scan_job, dict) else None,
+        'type': 'summary',
+        'status': 'FAILED',
+        'error': str(error),
+        'urls_scanned': 0,
+        'vulnerabilities_count': 0
+    }
+
 def main():
     logger.info("Starting Scanner Engine...")
     
-    # Initialize Kafka Consumer
-    consumer = KafkaConsumer(
+    # Offsets are committed by the scheduler once a job's summary is produced
+    transport = KafkaTransport(
+        KAFKA_BOOTSTRAP_SERVERS,
         TOPIC_SCAN_REQUESTS,
-        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        auto_offset_reset='earliest',
-        enable_auto_commit=True,
         group_id='scanner-engine-group',
-        value_deserializer=lambda x: json.loads(x.decode('utf-8'))
+        deserializer=lambda x: json.loads(x.decode('utf-8')),
+        serializer=lambda x: json.dumps(x).encode('utf-8'),
+        **producer_config()
     )
-
-    # Initialize Kafka Producer
-    producer = KafkaProducer(
-        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-        value_serializer=lambda x: json.dumps(x).encode('utf-8')
+    scheduler = JobScheduler(
+        transport,
+        lambda scan_job: run_scan(scan_job, transport),
+        TOPIC_SCAN_RESULTS,
+        on_error=scan_failed,
+        result_key=lambda result: result.get('scanId')
     )
+    # Finish (and commit) the running scans before exiting
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
 
-    logger.info(f"Listening for messages on {TOPIC_SCAN_REQUESTS}...")
-
-    for message in consumer:
-        try:
-            scan_job = message.value
-            logger.info(f"Received scan job: {scan_job}")
-            
-            # Actual scanning logic
-            scan_id = scan_job.get('scanId')
-            target_url = scan_job.get('targetUrl')
-            
-            logger.info(f"Starting crawl for scan {scan_id} on {target_url}")
-            from core.crawler import Crawler
-            from modules.sqli import check_sqli
-            
-            crawler = Crawler(target_url, max_depth=2)
-            urls = crawler.crawl()
-            logger.info(f"Crawled {len(urls)} URLs")
-            
-            all_vulnerabilities = []
-            for url in urls:
-                logger.info(f"Scanning {url}...")
-                vulns = check_sqli(url)
-                all_vulnerabilities.extend(vulns)
-            
-            # Send result back
-            result = {
-                'scanId': scan_id,
-                'status': 'COMPLETED',
-                'vulnerabilities': all_vulnerabilities,
-                'urls_scanned': len(urls)
-            }
-            
-            producer.send(TOPIC_SCAN_RESULTS, value=result)
-            logger.info(f"Sent result for scan {scan_id} with {len(all_vulnerabilities)} vulns")
-
-        except Exception as e:
-            logger.error(f"Error processing message: {e}")
+    logger.info(f"Listening for messages on {TOPIC_SCAN_REQUESTS} ({SCANNER_MAX_CONCURRENT_JOBS} concurrent scans)...")
+    try:
+        # Raises SchedulerStalled if a summary cannot be produced: exiting (and being
+        # restarted) gets the scan redelivered
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        transport.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,304 @@
+import asyncio
+import difflib
+import html
+import logging
+import os
+import re
+import statistics
+import time
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+
+from core.http import HTTP_CONCURRENCY, HTTP_PER_HOST, create_session, read_body
+
+logger = logging.getLogger(__name__)
+
+# Probe requests in flight at once (all URLs and payloads share this cap)
+SQLI_CONCURRENCY = int(os.environ.get('SQLI_CONCURRENCY', str(HTTP_CONCURRENCY)))
+# Time-based probes in flight at once (each holds a connection for the whole delay)
+SQLI_TIME_CONCURRENCY = int(os.environ.get('SQLI_TIME_CONCURRENCY', '4'))
+# Seconds the time-based payloads ask the database to sleep
+SQLI_TIME_DELAY = float(os.environ.get('SQLI_TIME_DELAY', '3'))
+# Extra requests of the unmodified URL used to calibrate its normal latency
+SQLI_TIME_SAMPLES = int(os.environ.get('SQLI_TIME_SAMPLES', '3'))
+# Boolean checks: the "true" response must be at least this similar to the baseline,
+# the "false" one less similar than SQLI_BOOLEAN_DIFF
+SQLI_BOOLEAN_MATCH = float(os.environ.get('SQLI_BOOLEAN_MATCH', '0.98'))
+SQLI_BOOLEAN_DIFF = float(os.environ.get('SQLI_BOOLEAN_DIFF', '0.90'))
+# Response text kept per probe (and compared)
+SQLI_MAX_BODY_BYTES = int(os.environ.get('SQLI_MAX_BODY_BYTES', str(256 * 1024)))
+
+ERROR_PAYLOADS = ["'", '"', "')", "1'\""]
+
+# (true, false) conditions per quoting context; {n}/{m} vary between the check and its confirmation
+BOOLEAN_PAYLOADS = [
+    (" AND {n}={n}", " AND {n}={m}"),
+    ("' AND '{n}'='{n}", "' AND '{n}'='{m}"),
+    ("' AND {n}={n}-- -", "' AND {n}={m}-- -"),
+    ('" AND "{n}"="{n}', '" AND "{n}"="{m}'),
+]
+
+TIME_PAYLOADS = [
+    " AND SLEEP({d})",
+    "' AND SLEEP({d})-- -",
+    "' AND 1=(SELECT 1 FROM pg_sleep({d}))-- -",
+    "'; SELECT pg_sleep({d})-- -",
+    "'; WAITFOR DELAY '0:0:{d}'-- -",
+]
+
+DBMS_ERRORS = {
+    'MySQL': re.compile(r"SQL syntax.*?MySQL|Warning.*?\Wmysqli?_|MySQLSyntaxErrorException|check the manual that corresponds to your (MySQL|MariaDB)", re.I),
+    'PostgreSQL': re.compile(r"PostgreSQL.*?ERROR|Warning.*?\Wpg_|PG::SyntaxError|unterminated quoted string at or near|syntax error at or near", re.I),
+    'Microsoft SQL Server': re.compile(r"Unclosed quotation mark after the character string|Microsoft SQL Native Client|ODBC SQL Server Driver|SQLServer JDBC Driver", re.I),
+    'Oracle': re.compile(r"\bORA-\d{5}|Oracle error|quoted string not properly terminated", re.I),
+    'SQLite': re.compile(r"SQLite/JDBCDriver|SQLITE_ERROR|sqlite3\.OperationalError|unrecognized token:|near \".*?\": syntax error", re.I),
+}
+
+SOLUTION = "Use parameterised queries (prepared statements) and never build SQL from request input."
+
+
+class Response(NamedTuple):
+    status: int      # 0 when the request failed
+    text: str
+    elapsed: float   # seconds, from sending the request to reading the body
+
+
+class InjectionPoint(NamedTuple):
+    url: str
+    params: list     # (name, value) pairs of the query, in order
+    index: int       # position of the parameter under test
+
+    @property
+    def name(self) -> str:
+        return self.params[self.index][0]
+
+    def inject(self, payload: str) -> str:
+        params = list(self.params)
+        name, value = params[self.index]
+        params[self.index] = (name, value + payload)
+        parts = urlsplit(self.url)
+        return urlunsplit(parts._replace(query=urlencode(params, quote_via=quote)))
+
+
+def injection_points(url: str) -> List[InjectionPoint]:
+    """One injection point per query parameter of url."""
+    params = parse_qsl(urlsplit(url).query, keep_blank_values=True)
+    return [InjectionPoint(url, params, i) for i in range(len(params))]
+
+
+def similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, a.splitlines(), b.splitlines(), autojunk=False).ratio()
+
+
+def strip_reflection(text: str, payload: str) -> str:
+    """Remove echoes of the payload so a reflected value doesn't look like a content change."""
+    for form in {payload, html.escape(payload), html.escape(payload, quote=False), quote(payload)}:
+        text = text.replace(form, '')
+    return text
+
+
+def finding(point: InjectionPoint, technique: str, payload: str, severity: str, **evidence) -> dict:
+    return {
+        'name': 'SQL Injection',
+        'title': f"SQL Injection ({technique}) in parameter '{point.name}'",
+        'severity': severity,
+        'description': f"Parameter '{point.name}' of {point.url} is injectable ({technique}-based).",
+        'evidence': {
+            'url': point.url,
+            'parameter': point.name,
+            'technique': technique,
+            'payload': payload,
+            **evidence,
+        },
+        'solution': SOLUTION,
+    }
+
+
+class SqliScanner:
+    """
+    SQL injection prober for many URLs at once. Every query parameter is an
+    injection point; points are probed concurrently (error-based, then boolean,
+    then time-based until one confirms) over one pooled session, with at most
+    `concurrency` requests in flight. The unmodified response of each URL is
+    fetched once and shared by all its points.
+    """
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, concurrency: int = SQLI_CONCURRENCY,
+                 time_concurrency: int = SQLI_TIME_CONCURRENCY, time_delay: float = SQLI_TIME_DELAY):
+        self.session = session
+        self.concurrency = concurrency
+        self.time_concurrency = time_concurrency
+        self.time_delay = time_delay
+        self._slots = None
+        self._time_slots = None
+        self._baselines: Dict[str, asyncio.Future] = {}
+        self._latencies: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+
+    async def request(self, session: aiohttp.ClientSession, url: str) -> Response:
+        async with self._slots:
+            self.requests += 1
+            started = time.monotonic()
+            try:
+                async with session.get(url, allow_redirects=True) as response:
+                    body = await read_body(response, SQLI_MAX_BODY_BYTES)
+                    text = body.decode(response.charset or 'utf-8', errors='replace')
+                    return Response(response.status, text, time.monotonic() - started)
+            except (aiohttp.ClientError, asyncio.TimeoutError, LookupError) as e:
+                logger.debug(f"Probe failed for {url}: {e}")
+                return Response(0, '', time.monotonic() - started)
+
+    def _cached(self, cache: Dict[str, asyncio.Future], url: str, make) -> asyncio.Future:
+        # Concurrent points of the same URL await one shared fetch
+        if url not in cache:
+            cache[url] = asyncio.ensure_future(make())
+        return cache[url]
+
+    async def baseline(self, session, url: str) -> Response:
+        return await self._cached(self._baselines, url, lambda: self.request(session, url))
+
+    async def latency(self, session, url: str) -> List[float]:
+        """
+        Normal response times of url, sampled through the same pool as the probes,
+        so they include the queueing the current concurrency causes.
+        """
+        async def sample():
+            base = await self.baseline(session, url)
+            extra = await asyncio.gather(*(self.request(session, url) for _ in range(SQLI_TIME_SAMPLES)))
+            return [base.elapsed] + [r.elapsed for r in extra]
+        return await self._cached(self._latencies, url, sample)
+
+    async def check_error(self, session, point: InjectionPoint, base: Response) -> Optional[dict]:
+        responses = await asyncio.gather(*(self.request(session, point.inject(p)) for p in ERROR_PAYLOADS))
+        for payload, response in zip(ERROR_PAYLOADS, responses):
+            for dbms, pattern in DBMS_ERRORS.items():
+                match = pattern.search(response.text)
+                if match and not pattern.search(base.text):
+                    return finding(point, 'error', payload, 'HIGH', dbms=dbms, error=match.group(0)[:200])
+        return None
+
+    async def _boolean_pair(self, session, point, true_payload: str, false_payload: str, base: Response) -> bool:
+        true, false = await asyncio.gather(
+            self.request(session, point.inject(true_payload)),
+            self.request(session, point.inject(false_payload)),
+        )
+        if true.status == 0 or true.status != base.status:
+            return False
+        # Diffing bodies of up to SQLI_MAX_BODY_BYTES is CPU-bound; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        true_similarity = await loop.run_in_executor(
+            None, similarity, strip_reflection(true.text, true_payload), base.text)
+        if true_similarity < SQLI_BOOLEAN_MATCH:
+            return False
+        if false.status != true.status:
+            return True
+        false_similarity = await loop.run_in_executor(
+            None, similarity, strip_reflection(false.text, false_payload), base.text)
+        return false_similarity < SQLI_BOOLEAN_DIFF
+
+    async def check_boolean(self, session, point: InjectionPoint, base: Response) -> Optional[dict]:
+        if base.status == 0:
+            return None
+        for true_template, false_template in BOOLEAN_PAYLOADS:
+            if not await self._boolean_pair(session, point, true_template.format(n=1, m=2),
+                                            false_template.format(n=1, m=2), base):
+                continue
+            # Confirm with other values so page noise doesn't pass as a condition
+            confirm = (true_template.format(n=7, m=8), false_template.format(n=7, m=8))
+            if await self._boolean_pair(session, point, *confirm, base):
+                return finding(point, 'boolean', true_template.format(n=1, m=2), 'HIGH',
+                               false_payload=false_template.format(n=1, m=2))
+        return None
+
+    async def _timed(self, session, url: str) -> float:
+        async with self._time_slots:
+            return (await self.request(session, url)).elapsed
+
+    async def check_time(self, session, point: InjectionPoint) -> Optional[dict]:
+        """
+        Calibrated time-based check. A payload counts only if, against the URL's
+        normal latency (sampled under the same load): sleep(d) is slow by at least
+        ~d, the same payload with sleep(0) is not, and sleep(d) is slow again.
+        Load-induced slowness hits the sleep(0) control as well, so it can't confirm.
+        """
+        samples = await self.latency(session, point.url)
+        normal, worst = statistics.median(samples), max(samples)
+        delay = self.time_delay
+
+        def slow(elapsed):
+            return elapsed >= max(normal + 0.8 * delay, worst + 0.5 * delay)
+
+        def fast(elapsed):
+            return elapsed < normal + 0.5 * delay
+
+        for template in TIME_PAYLOADS:
+            payload = template.format(d=f'{delay:g}')
+            if not slow(await self._timed(session, point.inject(payload))):
+                continue
+            control = await self._timed(session, point.inject(template.format(d=0)))
+            if not fast(control):
+                continue
+            repeat = await self._timed(session, point.inject(payload))
+            if slow(repeat):
+                return finding(point, 'time', payload, 'HIGH', delay=delay,
+                               normal_seconds=round(normal, 3), control_seconds=round(control, 3),
+                               delayed_seconds=round(repeat, 3))
+        return None
+
+    async def check_point(self, session, point: InjectionPoint) -> Optional[dict]:
+        base = await self.baseline(session, point.url)
+        return (
+            await self.check_error(session, point, base)
+            or await self.check_boolean(session, point, base)
+            or await self.check_time(session, point)
+        )
+
+    async def _check_url(self, session, url: str) -> Tuple[str, List[dict]]:
+        points = injection_points(url)
+        results = await asyncio.gather(*(self.check_point(session, point) for point in points), return_exceptions=True)
+        findings = []
+        for point, result in zip(points, results):
+            if isinstance(result, Exception):
+                logger.error(f"SQLi check failed for {point.url} ({point.name}): {result}")
+            elif result:
+                findings.append(result)
+        return url, findings
+
+    async def scan_each(self, urls: Iterable[str]) -> AsyncIterator[Tuple[str, List[dict]]]:
+        """(url, findings) for each of urls as its injection points finish, in completion order."""
+        urls = list(urls)
+        if not urls:
+            return
+        # Created here so they belong to the running loop (Python 3.9)
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._time_slots = asyncio.Semaphore(self.time_concurrency)
+        session = self.session or create_session(self.concurrency, max(HTTP_PER_HOST, self.concurrency))
+        tasks = [asyncio.ensure_future(self._check_url(session, url)) for url in urls]
+        found = 0
+        try:
+            for done in asyncio.as_completed(tasks):
+                url, findings = await done
+                found += len(findings)
+                yield url, findings
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.session is None:
+                await session.close()
+        logger.info(f"SQLi scan: {len(urls)} URLs, {self.requests} requests, {found} findings")
+
+    async def scan(self, urls: Iterable[str]) -> List[dict]:
+        """Findings (at most one per injection point) for all urls."""
+        return [finding async for _, findings in self.scan_each(urls) for finding in findings]
+
+
+def check_sqli_all(urls: Iterable[str]) -> List[dict]:
+    """Scan many URLs concurrently from synchronous code."""
+    return asyncio.run(SqliScanner().scan(list(urls)))
+
+
+def check_sqli(url: str) -> List[dict]:
+    return check_sqli_all([url])
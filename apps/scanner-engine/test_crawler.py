@@ -0,0 +1,134 @@
+"""
+Crawler tests against a local aiohttp site:
+
+    cd apps/scanner-engine && python -m pytest test_crawler.py
+"""
+import asyncio
+
+from aiohttp import web
+
+from core.crawler import BloomFilter, Crawler, canonicalize_url
+
+BIG_PAGE_BYTES = 416 * 1024
+
+
+def html(*links):
+    return web.Response(
+        text='<html><body>' + ''.join(f'<a href="{link}">x</a>' for link in links) + '</body></html>',
+        content_type='text/html',
+    )
+
+
+def make_site(hits):
+    async def index(request):
+        return html(
+            '/a', '/a#section', '/./x/../a',                # one page, three spellings
+            '/b?y=2&x=1', '/b?x=1&y=2',                     # same query, other order
+            'http://other.test/page', 'mailto:me@example.com',
+            '/deep1', '/big',
+        )
+
+    async def big(request):
+        # Streamed in pieces, so the body arrives over several reads
+        response = web.StreamResponse(headers={'Content-Type': 'text/html'})
+        await response.prepare(request)
+        filler = b'<p>' + b'x' * 1020 + b'</p>'
+        for _ in range(BIG_PAGE_BYTES // len(filler)):
+            await response.write(filler)
+        await response.write(b'<a href="/after-big">end</a></html>')
+        await response.write_eof()
+        return response
+
+    async def moved(request):
+        # The site's canonical host differs from the one crawled
+        raise web.HTTPFound(f'http://localhost:{request.url.port}/')
+
+    pages = {
+        '/': index,
+        '/moved': moved,
+        '/a': lambda request: html('/'),
+        '/b': lambda request: html(),
+        '/deep1': lambda request: html('/deep2'),
+        '/deep2': lambda request: html('/deep3'),
+        '/big': big,
+    }
+
+    def counted(path, handler):
+        async def wrapper(request):
+            hits.append(request.path_qs)
+            result = handler(request)
+            return await result if asyncio.iscoroutine(result) else result
+        return wrapper
+
+    app = web.Application()
+    for path, handler in pages.items():
+        app.router.add_get(path, counted(path, handler))
+    return app
+
+
+async def crawl_site(start='/', **crawler_args):
+    hits = []
+    runner = web.AppRunner(make_site(hits))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    try:
+        urls = [url async for url in Crawler(base + start, delay=0, **crawler_args).crawl()]
+    finally:
+        await runner.cleanup()
+    return base, urls, hits
+
+
+def test_crawl_discovers_deduplicated_in_scope_urls():
+    base, urls, hits = asyncio.run(crawl_site(max_depth=2))
+
+    assert urls[0] == base + '/'
+    assert len(urls) == len(set(urls))
+    assert set(urls) == {base + path for path in ('/', '/a', '/b?x=1&y=2', '/deep1', '/deep2', '/big', '/after-big')}
+    # Every page fetched once, whatever spelling linked to it
+    assert len(hits) == len(set(hits))
+
+
+def test_crawl_respects_depth_limit():
+    _, urls, hits = asyncio.run(crawl_site(max_depth=2))
+    # deep2 is at depth 2: reported, not fetched, so deep3 is never seen
+    assert '/deep2' not in hits
+    assert not any(url.endswith('/deep3') for url in urls)
+
+    _, urls, hits = asyncio.run(crawl_site(max_depth=0))
+    assert len(urls) == 1 and hits == []
+
+
+def test_crawl_reads_pages_larger_than_one_chunk():
+    base, urls, hits = asyncio.run(crawl_site(max_depth=2))
+    assert '/big' in hits
+    assert base + '/after-big' in urls
+
+
+def test_crawl_follows_start_url_redirect_to_another_host():
+    base, urls, hits = asyncio.run(crawl_site('/moved', max_depth=2))
+    moved_to = base.replace('127.0.0.1', 'localhost')
+
+    assert urls[0] == base + '/moved'
+    # Links of the redirected start page are on the new host and stay in scope
+    assert {moved_to + path for path in ('/a', '/b?x=1&y=2', '/deep1', '/big')} <= set(urls)
+    assert '/deep1' in hits and '/a' in hits
+
+
+def test_canonicalize_url():
+    assert canonicalize_url('HTTP://Example.COM:80/a/./b/../c?z=1&a=2#frag') == 'http://example.com/a/c?a=2&z=1'
+    assert canonicalize_url('https://example.com:443') == 'https://example.com/'
+    assert canonicalize_url('http://example.com:8080/x/') == 'http://example.com:8080/x/'
+    assert canonicalize_url('../up', 'http://example.com/a/b/') == 'http://example.com/a/up'
+    assert canonicalize_url('javascript:void(0)') is None
+    assert canonicalize_url('mailto:me@example.com') is None
+
+
+def test_bloom_filter():
+    seen = BloomFilter(capacity=1000, error_rate=0.01)
+    assert seen.add('http://example.com/')
+    assert not seen.add('http://example.com/')
+    assert 'http://example.com/' in seen
+    false_positives = sum(f'http://example.com/{i}' in seen for i in range(1000))
+    assert false_positives < 30
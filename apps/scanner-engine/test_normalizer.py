@@ -0,0 +1,63 @@
+"""
+URL grouping tests:
+
+    cd apps/scanner-engine && python -m pytest test_normalizer.py
+"""
+from core import normalizer as normalizer_module
+from core.normalizer import UrlNormalizer, group_key, path_template
+
+
+def test_query_parameter_order_and_values_do_not_matter():
+    assert group_key('http://example.com/p?a=1&b=2') == group_key('http://example.com/p?b=9&a=8')
+    assert group_key('http://example.com/p?a=1&a=2') == group_key('http://example.com/p?a=3')
+    assert group_key('http://example.com/p?a=1') != group_key('http://example.com/p?a=1&b=2')
+    assert group_key('http://example.com/p?a=1')[3] == ('a',)
+
+
+def test_fragments_are_stripped():
+    assert group_key('http://example.com/p?a=1#top') == group_key('http://example.com/p?a=1')
+    assert group_key('http://example.com/p#a=1') == group_key('http://example.com/p')
+
+
+def test_default_ports_and_host_case():
+    assert group_key('http://Example.COM:80/p') == group_key('http://example.com/p')
+    assert group_key('https://example.com:443/p') == group_key('https://example.com/p')
+    assert group_key('http://example.com:8080/p') != group_key('http://example.com/p')
+    assert group_key('https://example.com/p') != group_key('http://example.com/p')
+
+
+def test_trailing_slashes():
+    assert group_key('http://example.com/users/1/') == group_key('http://example.com/users/2')
+    assert group_key('http://example.com') == group_key('http://example.com/')
+    assert group_key('http://example.com/a/./b/../c/') == group_key('http://example.com/a/c')
+
+
+def test_path_template():
+    assert path_template('/users/42/orders/7') == '/users/{int}/orders/{int}'
+    assert path_template('/files/0f8fad5b-d9cb-469f-a165-70867728950e') == '/files/{uuid}'
+    assert path_template('/blob/9e107d9d372bb6826bd81d3542a419d6') == '/blob/{hash}'
+    assert path_template('/v2/users') == '/v2/users'
+
+
+def test_groups_probe_first_url_and_attribute_findings(monkeypatch):
+    monkeypatch.setattr(normalizer_module, 'NORMALIZER_MAX_SAMPLES', 2)
+    normalizer = UrlNormalizer()
+    urls = [
+        'http://example.com/item/1?id=1&sort=a',
+        'http://example.com:80/item/2/?sort=b&id=2#reviews',
+        'http://example.com/item/3?id=3&sort=c',
+        'http://example.com/search?q=x',
+    ]
+    assert normalizer.add_all(urls) == [urls[0], urls[3]]
+    assert normalizer.urls == 4
+    assert normalizer.representatives() == [urls[0], urls[3]]
+
+    finding = {'name': 'SQL Injection', 'evidence': {'url': urls[0], 'parameter': 'id'}}
+    other = {'name': 'Other', 'evidence': {}}
+    attributed, untouched = normalizer.attribute([finding, other])
+    assert attributed['evidence']['route'] == 'http://example.com/item/{int}?id=*&sort=*'
+    assert attributed['evidence']['affected_urls'] == urls[:2]
+    assert attributed['evidence']['affected_count'] == 3
+    assert attributed['evidence']['parameter'] == 'id'
+    assert 'route' not in finding['evidence']
+    assert untouched is other
@@ -0,0 +1,144 @@
+"""
+JobScheduler tests over InMemoryTransport:
+
+    cd apps/scanner-engine && python -m pytest test_scheduler.py
+"""
+import threading
+
+import pytest
+
+from core import scheduler as scheduler_module
+from core.scheduler import InMemoryTransport, JobScheduler, PartitionOffsets, SchedulerStalled
+
+P0 = ('scan.requests', 0)
+P1 = ('scan.requests', 1)
+
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(scheduler_module, 'SCANNER_POLL_TIMEOUT_MS', 10)
+
+
+class RecordingTransport(InMemoryTransport):
+    """InMemoryTransport that keeps every commit, and every pause/resume with the scheduler's running jobs."""
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.scheduler = None
+        self.commits = []
+        self.events = []
+
+    def commit(self, offsets):
+        self.commits.append(dict(offsets))
+        super().commit(offsets)
+
+    def pause(self):
+        self.events.append(('pause', self.scheduler.running))
+        super().pause()
+
+    def resume(self):
+        self.events.append(('resume', self.scheduler.running))
+        super().resume()
+
+
+def run_until_drained(scheduler, transport, timeout=10):
+    done = threading.Event()
+    thread = threading.Thread(target=lambda: (scheduler.run(until=transport.drained), done.set()))
+    thread.start()
+    thread.join(timeout)
+    assert done.is_set(), 'scheduler did not finish'
+
+
+def test_partition_offsets_commit_finished_prefix():
+    offsets = PartitionOffsets()
+    for offset in (5, 6, 7):
+        offsets.start(offset)
+    assert offsets.finish(7) is None
+    assert offsets.finish(6) is None
+    assert offsets.finish(5) == 8
+    assert offsets.in_flight == 0 and not offsets.finished
+
+
+def test_offsets_committed_in_order_when_jobs_finish_out_of_order():
+    # Job 0 of each partition only finishes once jobs 1 and 2 have
+    later_done = {P0: threading.Semaphore(0), P1: threading.Semaphore(0)}
+
+    def handler(job):
+        partition, offset = job
+        if offset == 0:
+            for _ in range(2):
+                assert later_done[partition].acquire(timeout=5)
+        else:
+            later_done[partition].release()
+        return {'job': job}
+
+    transport = RecordingTransport({P0: [(P0, i) for i in range(3)], P1: [(P1, i) for i in range(3)]})
+    transport.scheduler = JobScheduler(transport, handler, 'scan.results', max_jobs=6)
+    run_until_drained(transport.scheduler, transport)
+
+    assert transport.committed == {P0: 3, P1: 3}
+    assert len(transport.sent) == 6
+    for partition in (P0, P1):
+        # Nothing is committed past job 0 before it finishes, and commits never go back
+        history = [commit[partition] for commit in transport.commits if partition in commit]
+        assert history == [3]
+
+
+def test_failed_send_is_not_committed_and_stops_the_scheduler(monkeypatch):
+    transport = InMemoryTransport({P0: list(range(4))})
+    send = transport.send
+
+    def flaky_send(topic, value, key=None, wait=True):
+        if value['job'] == 1:
+            raise ConnectionError('broker unavailable')
+        send(topic, value, key=key, wait=wait)
+
+    monkeypatch.setattr(transport, 'send', flaky_send)
+    scheduler = JobScheduler(transport, lambda job: {'job': job}, 'scan.results', max_jobs=1)
+    with pytest.raises(SchedulerStalled):
+        scheduler.run(until=transport.drained)
+
+    # Job 0 is committed; job 1 (and everything after it) will be redelivered
+    assert transport.committed == {P0: 1}
+    assert [value['job'] for _, value in transport.sent] == [0]
+    assert scheduler.stalled.offset == 1
+    assert len(scheduler.offsets[P0].finished) == 0
+
+
+def test_transport_paused_at_max_in_flight_and_resumed():
+    running, most_running = set(), []
+    lock = threading.Lock()
+    release = threading.Semaphore(0)
+
+    def handler(job):
+        with lock:
+            running.add(job)
+            most_running.append(len(running))
+        assert release.acquire(timeout=5)
+        with lock:
+            running.discard(job)
+        return {'job': job}
+
+    transport = RecordingTransport({P0: list(range(6))})
+    transport.scheduler = scheduler = JobScheduler(transport, handler, 'scan.results', max_jobs=2)
+
+    def release_jobs():
+        # Let one job finish at a time, once the transport is paused
+        for _ in range(6):
+            while not transport.paused and transport.positions[P0] < 6:
+                threading.Event().wait(0.01)
+            threading.Event().wait(0.05)
+            release.release()
+
+    releaser = threading.Thread(target=release_jobs)
+    releaser.start()
+    run_until_drained(scheduler, transport)
+    releaser.join(5)
+
+    assert max(most_running) == 2
+    assert transport.pauses >= 2
+    # Paused exactly when both slots are busy, resumed as soon as one frees up
+    assert [event for event, _ in transport.events][:2] == ['pause', 'resume']
+    assert all(running == 2 for event, running in transport.events if event == 'pause')
+    assert all(running < 2 for event, running in transport.events if event == 'resume')
+    assert transport.committed == {P0: 6}
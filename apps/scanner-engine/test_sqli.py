@@ -0,0 +1,125 @@
+"""
+SQL injection module tests against a local, deliberately injectable aiohttp app
+backed by an in-memory SQLite database:
+
+    cd apps/scanner-engine && python -m pytest test_sqli.py
+"""
+import asyncio
+import re
+import sqlite3
+import threading
+
+from aiohttp import web
+
+from modules import sqli
+from modules.sqli import SqliScanner, injection_points, similarity, strip_reflection
+
+TIME_DELAY = 0.5
+
+
+def make_app():
+    db = sqlite3.connect(':memory:')
+    db.execute('CREATE TABLE items (id INTEGER, name TEXT)')
+    db.executemany('INSERT INTO items VALUES (?, ?)', [(i, f'item{i}') for i in range(1, 20)])
+
+    def query(sql):
+        try:
+            return db.execute(sql).fetchall(), ''
+        except sqlite3.Error as e:
+            return [], f'<p>sqlite3.OperationalError: {e}</p>'
+
+    def page(rows, extra=''):
+        body = ''.join(f'<p>{row[0]}</p>' for row in rows)
+        return web.Response(text=f'<html><body>{body}{extra}</body></html>', content_type='text/html')
+
+    async def item(request):
+        # Numeric context, database errors shown
+        return page(*query(f"SELECT name FROM items WHERE id = {request.query.get('id', '1')}"))
+
+    async def search(request):
+        # String context, errors hidden and the input echoed back
+        name = request.query.get('name', '')
+        rows, _ = query(f"SELECT name FROM items WHERE name = '{name}'")
+        return page(rows, f'<p>You searched: {name}</p>')
+
+    async def slow(request):
+        # Blind: same page whatever the query, but MySQL's SLEEP() takes effect
+        value = request.query.get('id', '1')
+        match = re.search(r'SLEEP\((\d+(?:\.\d+)?)\)', value)
+        if match and value.startswith('1 AND'):
+            await asyncio.sleep(float(match.group(1)))
+        return page([('ok',)])
+
+    async def safe(request):
+        # Parameterised: input never reaches the SQL text
+        rows = db.execute('SELECT name FROM items WHERE id = ?', (request.query.get('id', ''),)).fetchall()
+        return page(rows)
+
+    app = web.Application()
+    for path, handler in (('/item', item), ('/search', search), ('/slow', slow), ('/safe', safe)):
+        app.router.add_get(path, handler)
+    return app
+
+
+async def scan_site(*paths):
+    runner = web.AppRunner(make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    try:
+        findings = await SqliScanner(time_delay=TIME_DELAY).scan([base + path for path in paths])
+    finally:
+        await runner.cleanup()
+    return {finding['evidence']['url'][len(base):]: finding for finding in findings}
+
+
+def test_error_based():
+    findings = asyncio.run(scan_site('/item?id=1'))
+    evidence = findings['/item?id=1']['evidence']
+    assert evidence['technique'] == 'error'
+    assert evidence['dbms'] == 'SQLite' and evidence['parameter'] == 'id'
+
+
+def test_boolean_based():
+    findings = asyncio.run(scan_site('/search?name=item1'))
+    evidence = findings['/search?name=item1']['evidence']
+    assert evidence['technique'] == 'boolean'
+    assert evidence['payload'].startswith("'")
+
+
+def test_time_based():
+    findings = asyncio.run(scan_site('/slow?id=1'))
+    evidence = findings['/slow?id=1']['evidence']
+    assert evidence['technique'] == 'time'
+    assert evidence['delayed_seconds'] >= TIME_DELAY > evidence['control_seconds']
+
+
+def test_parameterised_query_is_not_reported():
+    assert asyncio.run(scan_site('/safe?id=1')) == {}
+
+
+def test_one_finding_per_vulnerable_url():
+    findings = asyncio.run(scan_site('/item?id=1', '/search?name=item1', '/safe?id=1'))
+    assert sorted(findings) == ['/item?id=1', '/search?name=item1']
+
+
+def test_similarity_runs_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def recording_similarity(a, b):
+        threads.append(threading.current_thread())
+        return similarity(a, b)
+
+    monkeypatch.setattr(sqli, 'similarity', recording_similarity)
+    asyncio.run(scan_site('/search?name=item1'))
+    assert threads and threading.main_thread() not in threads
+
+
+def test_helpers():
+    points = injection_points('http://example.com/p?a=1&b=x')
+    assert [point.name for point in points] == ['a', 'b']
+    assert points[1].inject("'") == 'http://example.com/p?a=1&b=x%27'
+    assert strip_reflection("<p>You searched: x' AND '1'='1</p>", "' AND '1'='1") == '<p>You searched: x</p>'
+    assert similarity('a\nb\nc', 'a\nb\nc') == 1.0
+    assert similarity('a\nb\nc', 'x\ny\nz') == 0.0